@@ -1,64 +1,137 @@
-import math
+import os
+import json
+import warnings
+import numpy as np
 
 ### TPC Geometry [mm] - x: drift, y: vertical, z: beam ###
+# Read from the TPC map which dunendggd writes next to a geometry, <output>.tpcmap.json
+# (duneggd/LocalTools/tpcmap.py), so that any array of modules works, the 2x2 as the
+# N_ModuleX x N_ModuleZ of ND-LAr.  The map is read from $TPCMAP or with Load(), else the
+# map of the bundled Detector_2x2.gdml is used with a warning: that file was built with
+# older builders and cfgs, and is not where the current builders put the 2x2.  The Get*
+# functions take a point or a module and half detector copy number as before, or arrays
+# of them (N,3 for the points).
 
-n_mod = [2,1,2]
-n_tpc = [2,1,1]
-
-ModuleDimension = [670.,2022.414,670.]
-
-TPCActiveDimension = [302.723,1241.1,620.3]
-
-TPCActiveCenter = {
-        '00':[-487.949,-218.236,-335.],
-        '01':[-182.051,-218.236,-335.],
-        '10':[182.051,-218.236,-335.],
-        '11':[487.949,-218.236,-335.],
-        '20':[-487.949,-218.236,335.],
-        '21':[-182.051,-218.236,335.],
-        '30':[182.051,-218.236,335.],
-        '31':[487.949,-218.236,335.],
-        }
-
-TPCActiveID = {
-        '00':0,
-        '01':1,
-        '10':2,
-        '11':3,
-        '20':4,
-        '21':5,
-        '30':6,
-        '31':7
-        }
-
-PixelPlaneCenter = {
-        '00':[-639.311,-218.236,-335.],
-        '01':[-30.690,-218.236,-335.],
-        '10':[30.690,-218.236,-335.],
-        '11':[639.311,-218.236,-335.],
-        '20':[-639.311,-218.236,335.],
-        '21':[-30.690,-218.236,335.],
-        '30':[30.690,-218.236,335.],
-        '31':[639.311,-218.236,335.],
-        }
-
-# (key/value)-swapped version of TPCActiveID
-TPCActiveCopyNo = {value:key for key, value in TPCActiveID.items()}
+default = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Detector_2x2.gdml.tpcmap.json')
+
+def Load(filename=None, array=0):
+    """ use the map of a geometry, array is the index of the array of modules in it """
+    if filename is None:
+        warnings.warn('No TPC map given ($TPCMAP or Load()), using %s, the map of the bundled '
+                      'Detector_2x2.gdml which does not match the current builders: use the '
+                      '<output>.tpcmap.json of your geometry' % default, stacklevel=2)
+        filename = default
+    global n_mod, n_tpc, ModuleDimension, TPCActiveDimension
+    global TPCActiveCenter, TPCActiveID, PixelPlaneCenter, TPCActiveCopyNo
+    global _rotation, _translation, _origin, _pitch, _copy, _module_center
+    global _id, _center, _pixel, _drift, _split, _axis
+    with open(filename) as f:
+        amap = json.load(f)['arrays'][array]
+
+    tpcs = amap['tpcs']
+    per_module = max(t['halfdetector'] for t in tpcs)+1
+    n_mod = [amap['n_module'][0], 1, amap['n_module'][1]]
+    n_tpc = [per_module, 1, 1]
+    ModuleDimension = amap['module_dimension']
+    TPCActiveDimension = [round(hi-lo, 6) for lo, hi in zip(tpcs[0]['active_min'], tpcs[0]['active_max'])]
+
+    key = lambda t: str(t['module'])+str(t['halfdetector'])
+    TPCActiveCenter = {key(t): t['active_center'] for t in tpcs}
+    TPCActiveID = {key(t): t['id'] for t in tpcs}
+    PixelPlaneCenter = {key(t): t['pixel_plane_center'] for t in tpcs}
+    # (key/value)-swapped version of TPCActiveID
+    TPCActiveCopyNo = {value:key for key, value in TPCActiveID.items()}
+
+    # the world point p is rotation*q+translation in the array
+    _rotation = np.array(amap.get('rotation', np.identity(3)), dtype=float)
+    _translation = np.array(amap.get('translation', np.zeros(3)), dtype=float)
+    modules = amap['modules']
+    centers = _array_frame(np.array([m['center'] for m in modules]))
+    index = np.array([m['index'] for m in modules])
+    _pitch = np.array(amap['module_pitch'], dtype=float)
+    _origin = centers[:, [0, 2]].min(axis=0) - _pitch/2
+    _copy = np.full(amap['n_module'], -1)
+    _copy[index[:, 0], index[:, 1]] = [m['copy'] for m in modules]
+    n_copy = max(m['copy'] for m in modules)+1
+    _module_center = np.zeros((n_copy, 3))
+    _module_center[[m['copy'] for m in modules]] = centers
+
+    # the TPCs by id, and by module and half detector
+    n_id = max(t['id'] for t in tpcs)+1
+    _id = np.full((n_copy, per_module), -1)
+    _center, _pixel, _drift = np.full((n_id, 3), np.nan), np.full((n_id, 3), np.nan), np.full((n_id, 3), np.nan)
+    for t in tpcs:
+        _id[t['module'], t['halfdetector']] = t['id']
+        _center[t['id']] = t['active_center']
+        _pixel[t['id']] = t['pixel_plane_center']
+        _drift[t['id']] = t['drift_direction']
+    # the half detector 0 of a module is on the side of its drift from the middle of its TPCs
+    _split = np.array([_center[ids].mean(axis=0) if (ids >= 0).all() else np.zeros(3) for ids in _id])
+    _axis = np.array([_drift[ids[0]] if ids[0] >= 0 else np.zeros(3) for ids in _id])
+
+def _array_frame(p):
+    return (p - _translation) @ _rotation
+
+def _points(pos):
+    p = np.asarray(pos, dtype=float)
+    return np.atleast_2d(p), p.ndim == 1
+
+def _scalar(a, scalar):
+    if not scalar:
+        return a
+    return a[0].tolist() if a.ndim > 1 else a[0].item()
+
+def _tpc(module_copynumber, halfDetector_copynumber):
+    mod, hd = np.broadcast_arrays(np.asarray(module_copynumber), np.asarray(halfDetector_copynumber))
+    scalar = mod.ndim == 0
+    mod, hd = np.atleast_1d(mod).astype(int), np.atleast_1d(hd).astype(int)
+    ok = (mod >= 0) & (mod < _id.shape[0]) & (hd >= 0) & (hd < _id.shape[1])
+    ids = np.full(mod.shape, -1)
+    ids[ok] = _id[mod[ok], hd[ok]]
+    return ids, scalar
+
+def _by_id(table, module_copynumber, halfDetector_copynumber):
+    ids, scalar = _tpc(module_copynumber, halfDetector_copynumber)
+    ret = np.full(ids.shape+(3,), np.nan)
+    ret[ids >= 0] = table[ids[ids >= 0]]
+    return _scalar(ret, scalar)
 
 def GetTPCActiveCenter(module_copynumber,halfDetector_copynumber):
-    return TPCActiveCenter[str(module_copynumber)+str(halfDetector_copynumber)]
+    return _by_id(_center, module_copynumber, halfDetector_copynumber)
+
+def GetPixelPlaneCenter(module_copynumber,halfDetector_copynumber):
+    return _by_id(_pixel, module_copynumber, halfDetector_copynumber)
+
+def GetDriftDirection(module_copynumber,halfDetector_copynumber):
+    return _by_id(_drift, module_copynumber, halfDetector_copynumber)
 
 def GetTPCActiveID(module_copynumber,halfDetector_copynumber):
-    return TPCActiveID[str(module_copynumber)+str(halfDetector_copynumber)]
+    ids, scalar = _tpc(module_copynumber, halfDetector_copynumber)
+    return _scalar(ids, scalar)
 
-def GetModuleCopy(pos):
-    mod_x = (math.floor(pos[0]/(ModuleDimension[0]))+n_mod[0]/2)
-    mod_z = (math.floor(pos[2]/(ModuleDimension[2]))+n_mod[2]/2)
+def _module_copy(p):
+    q = _array_frame(p)
+    ik = np.floor((q[:, [0, 2]] - _origin)/_pitch).astype(int)
+    ok = ((ik >= 0) & (ik < _copy.shape)).all(axis=1)
+    mod = np.full(len(p), -1)
+    mod[ok] = _copy[ik[ok, 0], ik[ok, 1]]
+    ok = mod >= 0
+    ok[ok] = np.abs(q[ok, 1] - _module_center[mod[ok], 1]) <= ModuleDimension[1]/2.
+    mod[~ok] = -1
+    return mod
 
-    return int(mod_x+mod_z*n_mod[0])
+def GetModuleCopy(pos):
+    """ -1 out of the modules """
+    p, scalar = _points(pos)
+    return _scalar(_module_copy(p), scalar)
 
 def GetHalfDetCopy(pos):
-    tpc_x = math.floor(pos[0]/(ModuleDimension[0]/2.))+n_mod[0]/2*n_tpc[0]
-
-    return int(tpc_x)%2
+    """ -1 out of the modules """
+    p, scalar = _points(pos)
+    mod = _module_copy(p)
+    ok = mod >= 0
+    hd = np.full(len(p), -1)
+    hd[ok] = np.where(((p[ok] - _split[mod[ok]])*_axis[mod[ok]]).sum(axis=1) >= 0, 0, 1)
+    return _scalar(hd, scalar)
 
+Load(os.environ.get('TPCMAP'))
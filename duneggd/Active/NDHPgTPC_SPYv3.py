@@ -5,6 +5,7 @@ Builds compontents for the MPD
 
 import gegede.builder
 from duneggd.SubDetector import NDHPgTPC as NDHPgTPC
+from duneggd.LocalTools import localtools as ltools
 from gegede import Quantity as Q
 from math import *
 
@@ -24,7 +25,8 @@ class NDHPgTPCLayerBuilder(gegede.builder.Builder):
                 nsides = 8,
                 rmin = Q("0mm"),
                 rmax = Q("0mm"),
-                quadr = Q("0mm")
+                quadr = Q("0mm"),
+                lod = 'full'
                 )
 
     def depth(self):
@@ -33,6 +35,14 @@ class NDHPgTPCLayerBuilder(gegede.builder.Builder):
             dzm += dz + lspace
         return dzm
 
+    def layerMaterial(self, geom):
+        # the slices and the spacing after them, per unit of layer area
+        parts = []
+        for dz, lspace, mat in zip(self.dz, self.lspacing, self.mat):
+            parts.append((mat, dz * Q("1cm**2")))
+            parts.append((self.material, lspace * Q("1cm**2")))
+        return ltools.homogenisedMaterial(geom, self.name + "_lod", parts)
+
     def BarrelConfigurationLayer(self, dx = None, dy = None, name = None, sensname = None, type = None):
         # print "---- Barrel ----"
         # print "Layer parameters dx=", dx, "dy=", dy, "layername=", name, "type=", type
@@ -63,21 +73,32 @@ class NDHPgTPCLayerBuilder(gegede.builder.Builder):
         # make the mother volume
         name = self.output_name
 
+        # medium and coarse: the layer is one volume of the homogenised slices
+        material = self.material
+        if ltools.checkLOD(self, self.lod) != 'full':
+            material = self.layerMaterial(geom)
+
         if self.type == "Box":
             layer_shape = geom.shapes.Box(name, dx=(self.dx)/ 2.0, dy=(self.dy)/2.0, dz=(self.depth()) /2.0)
-            layer_lv = geom.structure.Volume(name + "_vol", shape=layer_shape, material=self.material)
+            layer_lv = geom.structure.Volume(name + "_vol", shape=layer_shape, material=material)
         elif self.type == "Intersection":
             layer_shape_full = geom.shapes.PolyhedraRegular(name+"_full", numsides=self.nsides, sphi=pi/8, rmin=self.rmin, rmax=self.rmax, dz=(self.depth()))
             layer_quadrant = geom.shapes.Box(name+"_quadrant", dx=self.quadr, dy=self.quadr, dz=(self.depth()) /2.0)
             layer_quad_pos = geom.structure.Position(name+"_quadrant_pos", x=self.quadr, y=self.quadr)
             layer_shape = geom.shapes.Boolean(name, type='intersection', first=layer_shape_full, second=layer_quadrant, pos=layer_quad_pos)
-            layer_lv = geom.structure.Volume(name +"_vol", shape=layer_shape, material=self.material)
+            layer_lv = geom.structure.Volume(name +"_vol", shape=layer_shape, material=material)
         elif self.type == "IntersectionInside":
             layer_shape_full = geom.shapes.Tubs(name+"_full", sphi=Q("0deg"), dphi=Q("360deg"), rmin=self.rmin, rmax=self.rmax, dz=(self.depth()))
             layer_quadrant = geom.shapes.Box(name+"_quadrant", dx=self.quadr, dy=self.quadr, dz=(self.depth()) /2.0)
             layer_quad_pos = geom.structure.Position(name+"_quadrant_pos", x=self.quadr, y=self.quadr)
             layer_shape = geom.shapes.Boolean(name, type='intersection', first=layer_shape_full, second=layer_quadrant, pos=layer_quad_pos)
-            layer_lv = geom.structure.Volume(name +"_vol", shape=layer_shape, material=self.material)
+            layer_lv = geom.structure.Volume(name +"_vol", shape=layer_shape, material=material)
+
+        if self.lod != 'full':
+            if any(self.active):
+                layer_lv.params.append(("SensDet", self.sensdet_name))
+            self.add_volume(layer_lv)
+            return
 
         # no skipped space before the first layer
         skip = Q("0mm")
@@ -156,6 +177,7 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
                     CoilMaterial = "Aluminum",
                     PRYMaterial = "Iron",
                     buildThinUpstream = False,
+                    internStaves = True,
                     nLayers_Upstream = [8, 0],
                     nsides_yoke = 8,
                     IntegratedMuID = False,
@@ -320,6 +342,82 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
         self.add_volume(cryostat_endcap_vol)
 
  
+    def construct_ecal_barrel_stave(self, geom, stave_name, nLoopLayers, min_dim_stave, max_dim_stave, module_dim, module_thickness, sensname):
+        ''' construct an ECAL Barrel stave with its layers '''
+
+        safety = Q("0.1mm")
+        nsides = self.nsides
+
+        stave_shape = geom.shapes.Trapezoid(stave_name, dx1=min_dim_stave/2.0, dx2=max_dim_stave/2.0,
+        dy1=(module_dim-safety)/2.0, dy2=(module_dim-safety)/2.0,
+        dz=module_thickness/2.0)
+
+        stave_lv = geom.structure.Volume(stave_name + "_vol", shape=stave_shape, material=self.material)
+
+        zPos = Q("0mm")
+        layer_id = 1
+
+        for nlayer, type in zip(nLoopLayers, self.layer_builder_name):
+            for ilayer in range(nlayer):
+
+                layername = stave_name + "_layer_%02i" % (layer_id)
+
+                #Configure the layer length based on the zPos in the stave
+                Layer_builder = self.get_builder(type)
+                layer_thickness = NDHPgTPCLayerBuilder.depth(Layer_builder)
+                l_dim_x = min_dim_stave + 2 * zPos * tan( pi/nsides )
+                l_dim_y = module_dim - safety
+
+                NDHPgTPCLayerBuilder.BarrelConfigurationLayer(Layer_builder, l_dim_x, l_dim_y, layername, sensname, "Box")
+                NDHPgTPCLayerBuilder.construct(Layer_builder, geom)
+                layer_lv = Layer_builder.get_volume(layername+"_vol")
+
+                #Placement layer in stave
+                layer_pos = geom.structure.Position(layername+"_pos", z=zPos + layer_thickness/2.0 - module_thickness/2.0)
+                layer_pla = geom.structure.Placement(layername+"_pla", volume=layer_lv, pos=layer_pos)
+
+                stave_lv.placements.append(layer_pla.name)
+
+                zPos += layer_thickness;
+                layer_id += 1
+
+        return stave_lv
+
+    def construct_ecal_endcap_stave(self, geom, stave_name, rmin, rmax, module_thickness, sensname):
+        ''' construct an ECAL Endcap stave (a quadrant) with its layers '''
+
+        endcap_stave_full = geom.shapes.Tubs(stave_name+"_full", sphi=Q("0deg"), dphi=Q("360deg"), rmin=rmin, rmax=rmax, dz=module_thickness)
+        quadr = rmax
+        quadrant = geom.shapes.Box(stave_name+"_quadrant", dx=quadr, dy=quadr, dz=module_thickness/2)
+
+        endcap_stave_pos = geom.structure.Position(stave_name+"_pos", x=quadr, y=quadr, z=Q("0mm"))
+        endcap_stave_shape = geom.shapes.Boolean(stave_name, type='intersection', first=endcap_stave_full, second=quadrant, pos=endcap_stave_pos)
+        endcap_stave_lv = geom.structure.Volume(stave_name + "_vol", shape=endcap_stave_shape, material=self.material)
+
+        zPos = Q("0mm")
+        layer_id = 1
+
+        for nlayer, type in zip(self.nLayers_Endcap, self.layer_builder_name):
+            for ilayer in range(nlayer):
+                layername = stave_name + "_layer_%02i" % (layer_id)
+
+                Layer_builder = self.get_builder(type)
+                layer_thickness = NDHPgTPCLayerBuilder.depth(Layer_builder)
+                NDHPgTPCLayerBuilder.EndcapConfigurationLayer(Layer_builder, 0, rmin, rmax, quadr, layername, sensname, "IntersectionInside")
+                NDHPgTPCLayerBuilder.construct(Layer_builder, geom)
+                layer_lv = Layer_builder.get_volume(layername+"_vol")
+
+                # Placement layer in stave
+                layer_pos = geom.structure.Position(layername+"_pos", z=zPos + layer_thickness/2.0 - module_thickness/2.0)
+                layer_pla = geom.structure.Placement(layername+"_pla", volume=layer_lv, pos=layer_pos)
+
+                endcap_stave_lv.placements.append(layer_pla.name)
+
+                zPos += layer_thickness;
+                layer_id += 1
+
+        return endcap_stave_lv
+
     def construct_ecal_barrel_staves(self, geom):
         ''' construct a set of ECAL staves for the Barrel '''
 
@@ -392,6 +490,7 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
         barrel_lv = geom.structure.Volume("vol"+self.output_name, shape=barrel_shape, material=self.material)
 
         sensname = self.output_name + "_vol"
+        staves = {}
         for istave in range(nsides):
             stave_id = istave+1
             dstave = int( nsides/4.0 )
@@ -405,6 +504,13 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
 
             print("Placing stave ", stave_id, " at angle ", placing_angle, " deg")
 
+            # check if angle is below -90/90 deg for full modules, otherwise thinner upstream ECAL
+            nLoopLayers = self.nLayers_Barrel
+            stave_kind = "_stave"
+            if not (placing_angle < 315 and placing_angle > 45) and self.buildThinUpstream:
+                nLoopLayers = self.nLayers_Upstream
+                stave_kind = "_upstream_stave"
+
             for imodule in range(Ecal_Barrel_n_modules):
                 module_id = imodule+1
                 print("Placing stave ", stave_id, " and module ", module_id)
@@ -412,78 +518,28 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
                 stave_name = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id)
                 stave_volname = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id) + "_vol"
 
-                stave_shape = geom.shapes.Trapezoid(stave_name, dx1=min_dim_stave/2.0, dx2=max_dim_stave/2.0,
-                dy1=(Ecal_Barrel_module_dim-safety)/2.0, dy2=(Ecal_Barrel_module_dim-safety)/2.0,
-                dz=ecal_barrel_module_thickness/2.0)
-
-                stave_lv = geom.structure.Volume(stave_volname, shape=stave_shape, material=self.material)
-
-                zPos = Q("0mm")
-                layer_id = 1
-
-                # check if angle is below -90/90 deg for full modules, otherwise thinner upstream ECAL
-                if placing_angle < 315 and placing_angle > 45:
-                    for nlayer, type in zip(self.nLayers_Barrel, self.layer_builder_name):
-                        for ilayer in range(nlayer):
-
-                            layername = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id) + "_layer_%02i" % (layer_id)
-
-                            #Configure the layer length based on the zPos in the stave
-                            Layer_builder = self.get_builder(type)
-                            layer_thickness = NDHPgTPCLayerBuilder.depth(Layer_builder)
-                            l_dim_x = min_dim_stave + 2 * zPos * tan( pi/nsides )
-                            l_dim_y = Ecal_Barrel_module_dim - safety
-
-                            NDHPgTPCLayerBuilder.BarrelConfigurationLayer(Layer_builder, l_dim_x, l_dim_y, layername, sensname, "Box")
-                            NDHPgTPCLayerBuilder.construct(Layer_builder, geom)
-                            layer_lv = Layer_builder.get_volume(layername+"_vol")
-
-                            #Placement layer in stave
-                            layer_pos = geom.structure.Position(layername+"_pos", z=zPos + layer_thickness/2.0 - ecal_barrel_module_thickness/2.0)
-                            layer_pla = geom.structure.Placement(layername+"_pla", volume=layer_lv, pos=layer_pos)
-
-                            stave_lv.placements.append(layer_pla.name)
-
-                            zPos += layer_thickness;
-                            layer_id += 1
+                copynumber = 0
+                if self.internStaves:
+                    # the staves with the same layers are all the same volume,
+                    # the copy number of the placement gives stave and module
+                    if stave_kind not in staves:
+                        staves[stave_kind] = self.construct_ecal_barrel_stave(geom, self.output_name + stave_kind, nLoopLayers, min_dim_stave, max_dim_stave,
+                                                                              Ecal_Barrel_module_dim, ecal_barrel_module_thickness, sensname)
+                    stave_lv = staves[stave_kind]
+                    copynumber = 100*stave_id + module_id
                 else:
-                    nLoopLayers = self.nLayers_Barrel
-                    if self.buildThinUpstream:
-                        nLoopLayers = self.nLayers_Upstream
-
-                    for nlayer, type in zip(nLoopLayers, self.layer_builder_name):
-                        for ilayer in range(nlayer):
-
-                            layername = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id) + "_layer_%02i" % (layer_id)
-
-                            #Configure the layer length based on the zPos in the stave
-                            Layer_builder = self.get_builder(type)
-                            layer_thickness = NDHPgTPCLayerBuilder.depth(Layer_builder)
-                            l_dim_x = min_dim_stave + 2 * zPos * tan( pi/nsides )
-                            l_dim_y = Ecal_Barrel_module_dim - safety
-
-                            NDHPgTPCLayerBuilder.BarrelConfigurationLayer(Layer_builder, l_dim_x, l_dim_y, layername, sensname, "Box")
-                            NDHPgTPCLayerBuilder.construct(Layer_builder, geom)
-                            layer_lv = Layer_builder.get_volume(layername+"_vol")
-
-                            #Placement layer in stave
-                            layer_pos = geom.structure.Position(layername+"_pos", z=zPos + layer_thickness/2.0 - ecal_barrel_module_thickness/2.0)
-                            layer_pla = geom.structure.Placement(layername+"_pla", volume=layer_lv, pos=layer_pos)
-
-                            stave_lv.placements.append(layer_pla.name)
-
-                            zPos += layer_thickness;
-                            layer_id += 1
+                    stave_lv = self.construct_ecal_barrel_stave(geom, stave_name, nLoopLayers, min_dim_stave, max_dim_stave,
+                                                                Ecal_Barrel_module_dim, ecal_barrel_module_thickness, sensname)
 
                 #Placement staves in Barrel
-                name = stave_lv.name
+                name = stave_volname
 
                 #print "Placing stave at x= ", (X*cos(phirot2)-Y*sin(phirot2))
                 #print "Placing stave at y= ", (X*sin(phirot2)+Y*cos(phirot2))
 
                 pos = geom.structure.Position(name + "_pos", x=(X*cos(phirot2)-Y*sin(phirot2)), y=(X*sin(phirot2)+Y*cos(phirot2)), z=( imodule+0.5 )*Ecal_Barrel_module_dim - Barrel_halfZ )
                 rot = geom.structure.Rotation(name + "_rot", x=pi/2.0, y=phirot+pi, z=Q("0deg"))
-                pla = geom.structure.Placement(name + "_pla", volume=stave_lv, pos=pos, rot=rot)
+                pla = geom.structure.Placement(name + "_pla", volume=stave_lv, pos=pos, rot=rot, copynumber=copynumber)
 
                 barrel_lv.placements.append(pla.name)
 
@@ -519,6 +575,7 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
 
         # Place staves in the Endcap Volume
         sensname = self.output_name + "_vol"
+        stave_lv = None
         module_id = -1
         for iend in range(2):
             if iend == 0:
@@ -554,41 +611,22 @@ class NDHPgTPC_SPYv3_DetElementBuilder(gegede.builder.Builder):
                 stave_name = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id)
                 stave_volname = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id) + "_vol"
 
-                endcap_stave_full = geom.shapes.Tubs(stave_name+"_full", sphi=Q("0deg"), dphi=Q("360deg"), rmin=rmin, rmax=rmax, dz=ecal_endcap_module_thickness)
-                quadr = rmax
-                quadrant = geom.shapes.Box(stave_name+"_quadrant", dx=quadr, dy=quadr, dz=ecal_endcap_module_thickness/2)
-
-                endcap_stave_pos = geom.structure.Position(stave_name+"_pos", x=quadr, y=quadr, z=Q("0mm"))
-                endcap_stave_shape = geom.shapes.Boolean(stave_name, type='intersection', first=endcap_stave_full, second=quadrant, pos=endcap_stave_pos)
-                endcap_stave_lv = geom.structure.Volume(stave_volname, shape=endcap_stave_shape, material=self.material)
-
-                zPos = Q("0mm")
-                layer_id = 1
-
-                for nlayer, type in zip(self.nLayers_Endcap, self.layer_builder_name):
-                    for ilayer in range(nlayer):
-                        layername = self.output_name + "_stave%02i" % (stave_id) + "_module%02i" % (module_id) + "_layer_%02i" % (layer_id)
-
-                        Layer_builder = self.get_builder(type)
-                        layer_thickness = NDHPgTPCLayerBuilder.depth(Layer_builder)
-                        NDHPgTPCLayerBuilder.EndcapConfigurationLayer(Layer_builder, 0, rmin, rmax, quadr, layername, sensname, "IntersectionInside")
-                        NDHPgTPCLayerBuilder.construct(Layer_builder, geom)
-                        layer_lv = Layer_builder.get_volume(layername+"_vol")
-
-                        # Placement layer in stave
-                        layer_pos = geom.structure.Position(layername+"_pos", z=zPos + layer_thickness/2.0 - ecal_endcap_module_thickness/2.0)
-                        layer_pla = geom.structure.Placement(layername+"_pla", volume=layer_lv, pos=layer_pos)
-
-                        endcap_stave_lv.placements.append(layer_pla.name)
-
-                        zPos += layer_thickness;
-                        layer_id += 1
+                copynumber = 0
+                if self.internStaves:
+                    # the quadrants are all the same volume, the copy number of
+                    # the placement gives stave and module
+                    if stave_lv is None:
+                        stave_lv = self.construct_ecal_endcap_stave(geom, self.output_name + "_stave", rmin, rmax, ecal_endcap_module_thickness, sensname)
+                    endcap_stave_lv = stave_lv
+                    copynumber = 100*stave_id + module_id
+                else:
+                    endcap_stave_lv = self.construct_ecal_endcap_stave(geom, stave_name, rmin, rmax, ecal_endcap_module_thickness, sensname)
 
                 #Placement staves in Endcap
-                name = endcap_stave_lv.name
+                name = stave_volname
                 endcap_stave_pos = geom.structure.Position(name + "_pos", z=this_module_z_offset )
                 endcap_stave_rot = geom.structure.Rotation(name + "_rot", x=Q("0deg"), y=this_module_rotY, z=this_module_rotZ+pi/4)
-                endcap_stave_pla = geom.structure.Placement(name + "_pla", volume=endcap_stave_lv, pos=endcap_stave_pos, rot=endcap_stave_rot)
+                endcap_stave_pla = geom.structure.Placement(name + "_pla", volume=endcap_stave_lv, pos=endcap_stave_pos, rot=endcap_stave_rot, copynumber=copynumber)
                 endcap_lv.placements.append(endcap_stave_pla.name)
 
         self.add_volume(endcap_lv)
@@ -14,7 +14,7 @@ class ArCLightBuilder(gegede.builder.Builder):
 
     """
 
-    def configure(self,WLS_dimension,SiPM_dimension,SiPM_Mask,SiPM_PCB,N_SiPM,N_Mask,**kwargs):
+    def configure(self,WLS_dimension,SiPM_dimension,SiPM_Mask,SiPM_PCB,N_SiPM,N_Mask,lod='full',**kwargs):
 
         # Read dimensions form config file
         self.WLS_dx             = WLS_dimension['dx']
@@ -44,6 +44,9 @@ class ArCLightBuilder(gegede.builder.Builder):
         self.N_SiPM             = int(N_SiPM)
         self.N_Mask             = int(N_Mask)
 
+        # medium and coarse: no SiPMs, the masks are homogenised with them
+        self.lod                = ltools.checkLOD(self,lod)
+
         # Material definitons
         self.WLS_Material       = 'EJ280WLS'
         self.DCM_Material       = 'PSA'
@@ -160,19 +163,24 @@ class ArCLightBuilder(gegede.builder.Builder):
                                        dy = self.SiPM_Mask_dy,
                                        dz = self.SiPM_Mask_dz)
 
+        SiPM_Mask_Material = self.SiPM_Mask_Material
+        if self.lod != 'full':
+            SiPM_Mask_Material = self.maskMaterial(geom)
+
         SiPM_Mask_lv = geom.structure.Volume('volSiPM_Mask',
-                                            material=self.SiPM_Mask_Material,
+                                            material=SiPM_Mask_Material,
                                             shape=SiPM_Mask_shape)
 
-        # Construct SiPM Sens LV
-        SiPM_Sens_shape = geom.shapes.Box('SiPM_Sens_shape',
-                                       dx = self.Sens_dd,
-                                       dy = self.SiPM_dy,
-                                       dz = self.SiPM_dz)
+        if self.lod == 'full':
+            # Construct SiPM Sens LV
+            SiPM_Sens_shape = geom.shapes.Box('SiPM_Sens_shape',
+                                           dx = self.Sens_dd,
+                                           dy = self.SiPM_dy,
+                                           dz = self.SiPM_dz)
 
-        SiPM_Sens_lv = geom.structure.Volume('volSiPM_Sens',
-                                            material=self.SiPM_Material,
-                                            shape=SiPM_Sens_shape)
+            SiPM_Sens_lv = geom.structure.Volume('volSiPM_Sens',
+                                                material=self.SiPM_Material,
+                                                shape=SiPM_Sens_shape)
 
         # Place Mask LV next to WLS plane
         for n in range(self.N_Mask):
@@ -188,6 +196,9 @@ class ArCLightBuilder(gegede.builder.Builder):
 
             main_lv.placements.append(SiPM_Mask_pla.name)
 
+            if self.lod != 'full':
+                continue
+
             # Place SiPM Sens LV next to WLS plane
             for m in range(int(self.N_SiPM/self.N_Mask)):
                 posipm = [-self.WLS_dx+self.Sens_dd,-(self.N_Mask-1)*self.SiPM_Mask_pitch+(2*n)*self.SiPM_Mask_pitch-(self.N_SiPM/self.N_Mask-1)*self.SiPM_pitch+(2*m)*self.SiPM_pitch,Q('0cm')]
@@ -202,28 +213,22 @@ class ArCLightBuilder(gegede.builder.Builder):
 
                 WLS_lv.placements.append(SiPM_Sens_pla.name)
 
-        # Construct SiPM LV
-        SiPM_shape = geom.shapes.Box('SiPM_shape',
-                                       dx = self.SiPM_dx,
-                                       dy = self.SiPM_dy,
-                                       dz = self.SiPM_dz)
-
-        SiPM_lv = geom.structure.Volume('volSiPM',
-                                            material=self.SiPM_Material,
-                                            shape=SiPM_shape)
-
-        # Place SiPMs next to WLS plane
-        for n in range(int(self.N_SiPM/self.N_Mask)):
-            posipm = [self.SiPM_Mask_dx-self.SiPM_dx,-(self.N_SiPM/self.N_Mask-1)*self.SiPM_pitch+(2*n)*self.SiPM_pitch,Q('0cm')]
+        if self.lod == 'full':
+            # Construct SiPM LV
+            SiPM_shape = geom.shapes.Box('SiPM_shape',
+                                           dx = self.SiPM_dx,
+                                           dy = self.SiPM_dy,
+                                           dz = self.SiPM_dz)
 
-            SiPM_pos = geom.structure.Position('SiPM_pos_'+str(n),
-                                                    posipm[0],posipm[1],posipm[2])
+            SiPM_lv = geom.structure.Volume('volSiPM',
+                                                material=self.SiPM_Material,
+                                                shape=SiPM_shape)
 
-            SiPM_pla = geom.structure.Placement('SiPM_pla_'+str(n),
-                                                    volume=SiPM_lv,
-                                                    pos=SiPM_pos)
-
-            SiPM_Mask_lv.placements.append(SiPM_pla.name)
+            # Place SiPMs next to WLS plane
+            ltools.placeGrid(geom, SiPM_Mask_lv, SiPM_lv,
+                             [self.SiPM_Mask_dx-self.SiPM_dx,-(self.N_SiPM/self.N_Mask-1)*self.SiPM_pitch,Q('0cm')],
+                             [Q('0cm'),2*self.SiPM_pitch,Q('0cm')], [1,int(self.N_SiPM/self.N_Mask),1],
+                             name='SiPM', copynumber=False)
 
         # Construct and place SiPM PCBs
         SiPM_PCB_shape = geom.shapes.Box('SiPM_PCB_shape',
@@ -235,15 +240,19 @@ class ArCLightBuilder(gegede.builder.Builder):
                                             material=self.SiPM_PCB_Material,
                                             shape=SiPM_PCB_shape)
 
-        for n in range(self.N_Mask):
-            # Place SiPM PCBs next to SiPM Masks
-            pos = [-self.WLS_dx-self.SiPM_Mask_dx,-(self.N_Mask-1)*self.SiPM_PCB_pitch+(2*n)*self.SiPM_PCB_pitch,-self.TPB_dd]
+        # Place SiPM PCBs next to SiPM Masks
+        ltools.placeGrid(geom, main_lv, SiPM_PCB_lv,
+                         [-self.WLS_dx-self.SiPM_Mask_dx,-(self.N_Mask-1)*self.SiPM_PCB_pitch,-self.TPB_dd],
+                         [Q('0cm'),2*self.SiPM_PCB_pitch,Q('0cm')], [1,self.N_Mask,1],
+                         name='SiPM_PCB', copynumber=False)
 
-            SiPM_PCB_pos = geom.structure.Position('SiPM_PCB_pos_'+str(n),
-                                                    pos[0],pos[1],pos[2])
+    def maskMaterial(self,geom):
+        """ Homogenised material of a SiPM mask with its SiPMs.
 
-            SiPM_PCB_pla = geom.structure.Placement('SiPM_PCB_pla_'+str(n),
-                                                    volume=SiPM_PCB_lv,
-                                                    pos=SiPM_PCB_pos)
+        """
+        mask_volume = 8*self.SiPM_Mask_dx*self.SiPM_Mask_dy*self.SiPM_Mask_dz
+        sipm_volume = int(self.N_SiPM/self.N_Mask)*8*self.SiPM_dx*self.SiPM_dy*self.SiPM_dz
 
-            main_lv.placements.append(SiPM_PCB_pla.name)
+        return ltools.homogenisedMaterial(geom,self.name+'_SiPM_Mask_lod',
+                                          [(self.SiPM_Mask_Material,mask_volume-sipm_volume),
+                                           (self.SiPM_Material,sipm_volume)])
@@ -6,6 +6,7 @@ Original Author: P. Koller, University of Bern
 
 import gegede.builder
 from duneggd.LocalTools import localtools as ltools
+from duneggd.LocalTools import tpcmap
 from gegede import Quantity as Q
 
 
@@ -42,19 +43,15 @@ class DetectorBuilder(gegede.builder.Builder):
         self.add_volume(main_lv)
 
         # Build Module
-        for i in range(self.N_ModuleX):
-            for j in range(self.N_ModuleZ):
-                pos = [-self.halfDimension['dx']+(2*i+1)*self.Module_builder.halfDimension['dx'],Q('0cm'),-self.halfDimension['dz']+(2*j+1)*self.Module_builder.halfDimension['dz']]
-
-                Module_lv = self.Module_builder.get_volume()
-
-                Module_pos = geom.structure.Position(self.Module_builder.name+'_pos_'+str(i)+'.'+str(j),
-                                                        pos[0],pos[1],pos[2])
-
-                Module_pla = geom.structure.Placement(self.Module_builder.name+'_pla_'+str(i)+'.'+str(j),
-                                                        volume=Module_lv,
-                                                        pos=Module_pos,
-                                                        copynumber=2*j+i)
-
-                main_lv.placements.append(Module_pla.name)
+        Module_lv = self.Module_builder.get_volume()
+        Module_hDim = self.Module_builder.halfDimension
+        Module_pla = ltools.placeGrid(geom, main_lv, Module_lv,
+                         [-self.halfDimension['dx']+Module_hDim['dx'],Q('0cm'),-self.halfDimension['dz']+Module_hDim['dz']],
+                         [2*Module_hDim['dx'],Q('0cm'),2*Module_hDim['dz']],
+                         [self.N_ModuleX,1,self.N_ModuleZ],
+                         name=self.Module_builder.name)
+
+        # Map of the TPCs, written next to the output
+        indices = [(i,k) for i in range(self.N_ModuleX) for k in range(self.N_ModuleZ)]
+        self.TPCMap = tpcmap.arrayMap(geom, self, main_lv, Module_pla, indices, Module_hDim)
 
@@ -113,6 +113,10 @@ class HalfDetectorBuilder(gegede.builder.Builder):
 
         LAr_lv.placements.append(TPC_pla.name)
 
+        # for the TPC maps of the module arrays (LocalTools/tpcmap.py), the
+        # copy number of the half detector numbers the TPCs of a module
+        self.TPCMapRoles = {'halfdetector': main_lv.name, 'tpc': TPC_lv.name}
+
         # Build OpticalDets and Brackets
         OpticalDet_lv = self.OpticalDet_builder.get_volume()
         OpticalDet_rot_R = geom.structure.Rotation(self.OpticalDet_builder.name+'_rot',
@@ -14,7 +14,7 @@ class LCMBuilder(gegede.builder.Builder):
 
     """
 
-    def configure(self,Fiber_dimension,SiPM_LCM_dimension,SiPM_LCM_Mask,SiPM_LCM_PCB,N_Fiber_LCM,N_SiPM_LCM,**kwargs):
+    def configure(self,Fiber_dimension,SiPM_LCM_dimension,SiPM_LCM_Mask,SiPM_LCM_PCB,N_Fiber_LCM,N_SiPM_LCM,lod='full',**kwargs):
 
         # Read dimensions form config file
         self.Fiber_rmin             = Fiber_dimension['rmin']
@@ -44,6 +44,9 @@ class LCMBuilder(gegede.builder.Builder):
         self.N_Fiber_LCM            = int(N_Fiber_LCM)
         self.N_SiPM_LCM             = int(N_SiPM_LCM)
 
+        # medium and coarse: no SiPMs, the mask is homogenised with them
+        self.lod                    = ltools.checkLOD(self,lod)
+
         # Material definitons
         self.TPB_Material           = 'TPB'
         self.Fiber_Material         = 'Y11'
@@ -171,8 +174,12 @@ class LCMBuilder(gegede.builder.Builder):
                                        dy = self.SiPM_LCM_Mask_dy,
                                        dz = self.SiPM_LCM_Mask_dz)
 
+        SiPM_LCM_Mask_Material = self.SiPM_LCM_Mask_Material
+        if self.lod != 'full':
+            SiPM_LCM_Mask_Material = self.maskMaterial(geom)
+
         SiPM_LCM_Mask_lv = geom.structure.Volume('volSiPM_LCM_Mask',
-                                            material=self.SiPM_LCM_Mask_Material,
+                                            material=SiPM_LCM_Mask_Material,
                                             shape=SiPM_LCM_Mask_shape)
 
         # Place SiPM Mask LV next to Fiber plane
@@ -187,29 +194,30 @@ class LCMBuilder(gegede.builder.Builder):
 
         main_lv.placements.append(SiPM_LCM_Mask_pla.name)
 
-        # Construct SiPM LV
-        SiPM_LCM_shape = geom.shapes.Box('SiPM_LCM_shape',
-                                       dx = self.SiPM_LCM_dx,
-                                       dy = self.SiPM_LCM_dy,
-                                       dz = self.SiPM_LCM_dz)
+        if self.lod == 'full':
+            # Construct SiPM LV
+            SiPM_LCM_shape = geom.shapes.Box('SiPM_LCM_shape',
+                                           dx = self.SiPM_LCM_dx,
+                                           dy = self.SiPM_LCM_dy,
+                                           dz = self.SiPM_LCM_dz)
 
-        SiPM_LCM_lv = geom.structure.Volume('volSiPM_LCM',
-                                            material=self.SiPM_LCM_Material,
-                                            shape=SiPM_LCM_shape)
+            SiPM_LCM_lv = geom.structure.Volume('volSiPM_LCM',
+                                                material=self.SiPM_LCM_Material,
+                                                shape=SiPM_LCM_shape)
 
-        # Place SiPMs next to Fiber plane
-        for n in range(self.N_SiPM_LCM):
-            posipm = [self.SiPM_LCM_Mask_dx-self.SiPM_LCM_dx,-(self.N_SiPM_LCM-1)*self.SiPM_LCM_pitch+(2*n)*self.SiPM_LCM_pitch,Q('0cm')]
+            # Place SiPMs next to Fiber plane
+            for n in range(self.N_SiPM_LCM):
+                posipm = [self.SiPM_LCM_Mask_dx-self.SiPM_LCM_dx,-(self.N_SiPM_LCM-1)*self.SiPM_LCM_pitch+(2*n)*self.SiPM_LCM_pitch,Q('0cm')]
 
-            SiPM_LCM_pos = geom.structure.Position('SiPM_LCM_pos_'+str(n),
-                                                    posipm[0],posipm[1],posipm[2])
+                SiPM_LCM_pos = geom.structure.Position('SiPM_LCM_pos_'+str(n),
+                                                        posipm[0],posipm[1],posipm[2])
 
-            SiPM_LCM_pla = geom.structure.Placement('SiPM_LCM_pla_'+str(n),
-                                                    volume=SiPM_LCM_lv,
-                                                    pos=SiPM_LCM_pos,
-                                                    copynumber=n)
+                SiPM_LCM_pla = geom.structure.Placement('SiPM_LCM_pla_'+str(n),
+                                                        volume=SiPM_LCM_lv,
+                                                        pos=SiPM_LCM_pos,
+                                                        copynumber=n)
 
-            SiPM_LCM_Mask_lv.placements.append(SiPM_LCM_pla.name)
+                SiPM_LCM_Mask_lv.placements.append(SiPM_LCM_pla.name)
 
         # Construct and place SiPM PCBs
         SiPM_LCM_PCB_shape = geom.shapes.Box('SiPM_LCM_PCB_shape',
@@ -232,3 +240,14 @@ class LCMBuilder(gegede.builder.Builder):
                                                 pos=SiPM_LCM_PCB_pos)
 
         main_lv.placements.append(SiPM_LCM_PCB_pla.name)
+
+    def maskMaterial(self,geom):
+        """ Homogenised material of the SiPM mask with its SiPMs.
+
+        """
+        mask_volume = 8*self.SiPM_LCM_Mask_dx*self.SiPM_LCM_Mask_dy*self.SiPM_LCM_Mask_dz
+        sipm_volume = self.N_SiPM_LCM*8*self.SiPM_LCM_dx*self.SiPM_LCM_dy*self.SiPM_LCM_dz
+
+        return ltools.homogenisedMaterial(geom,self.name+'_SiPM_Mask_lod',
+                                          [(self.SiPM_LCM_Mask_Material,mask_volume-sipm_volume),
+                                           (self.SiPM_LCM_Material,sipm_volume)])
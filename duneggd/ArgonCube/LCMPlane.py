@@ -43,18 +43,10 @@ class LCMPlaneBuilder(gegede.builder.Builder):
         self.add_volume(main_lv)
 
         # Build ArCLight Array
-        for i in range(self.N_LCM):
-                pos = [Q('0cm'),-self.halfDimension['dy']+self.LCM_builder.halfDimension['dy']+i*2*self.LCM_pitch,Q('0cm')]
-
-                LCM_lv = self.LCM_builder.get_volume()
-
-                LCM_pos = geom.structure.Position(self.LCM_builder.name+'_pos_'+str(i),
-                                                    pos[0],pos[1],pos[2])
-
-                LCM_pla = geom.structure.Placement(self.LCM_builder.name+'_pla_'+str(i),
-                                                        volume=LCM_lv,
-                                                        pos=LCM_pos,
-                                                        copynumber=i)
-
-                main_lv.placements.append(LCM_pla.name)
+        LCM_lv = self.LCM_builder.get_volume()
+        ltools.placeGrid(geom, main_lv, LCM_lv,
+                         [Q('0cm'),-self.halfDimension['dy']+self.LCM_builder.halfDimension['dy'],Q('0cm')],
+                         [Q('0cm'),2*self.LCM_pitch,Q('0cm')],
+                         [1,self.N_LCM,1],
+                         name=self.LCM_builder.name)
 
@@ -7,6 +7,7 @@ A bank of ND modules (NDBuckets)
 
 import gegede.builder
 from duneggd.LocalTools import localtools as ltools
+from duneggd.LocalTools import tpcmap
 from gegede import Quantity as Q
 
 class ModuleArrayBuilder(gegede.builder.Builder):
@@ -39,6 +40,7 @@ class ModuleArrayBuilder(gegede.builder.Builder):
         self.add_volume(main_lv)
 
         # Build Array
+        Module_plas, indices = [], []
         for i in range(self.N_ModuleX):
             # Place an array of modules
             for j in range(self.N_ModuleZ):
@@ -56,9 +58,11 @@ class ModuleArrayBuilder(gegede.builder.Builder):
                 Module_pla = geom.structure.Placement(self.NDBucket_builder.name+'_pla_'+str(i)+'.'+str(j),
                                                         volume=Module_lv,
                                                         pos=Module_pos,
-                                                        copynumber=2*j+i)
+                                                        copynumber=j*self.N_ModuleX+i)
 
                 main_lv.placements.append(Module_pla.name)
+                Module_plas.append(Module_pla.name)
+                indices.append((i,j))
 
             # Add grating
             Grating_lv = self.Grating_builder.get_volume()
@@ -72,3 +76,6 @@ class ModuleArrayBuilder(gegede.builder.Builder):
             Grating_pla = geom.structure.Placement('Grating_pla_'+str(i),volume=Grating_lv,pos=Grating_pos,rot=Grating_rot,copynumber=i)
             main_lv.placements.append(Grating_pla.name)
 
+        # Map of the TPCs, written next to the output
+        self.TPCMap = tpcmap.arrayMap(geom, self, main_lv, Module_plas, indices, self.NDBucket_builder.halfDimension)
+
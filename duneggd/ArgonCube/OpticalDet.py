@@ -47,19 +47,12 @@ class OpticalDetBuilder(gegede.builder.Builder):
         self.add_volume(main_lv)
 
         # Build ArCLight Array
-        for i in range(self.N_TilesY):
-                pos = [self.TPCPlane_builder.halfDimension['dx']+self.Gap_LightTile_PixelPlane,(-self.N_TilesY+1+2*i)*(self.ArCLight_builder.halfDimension['dy']+self.Gap_LightTile),Q('0cm')]
-
-                ArCLight_lv = self.ArCLight_builder.get_volume()
-
-                ArCLight_pos = geom.structure.Position(self.ArCLight_builder.name+'_pos_'+str(i),
-                                                    pos[0],pos[1],pos[2])
-
-                ArCLight_pla = geom.structure.Placement(self.ArCLight_builder.name+'_pla_'+str(i),
-                                                        volume=ArCLight_lv,
-                                                        pos=ArCLight_pos)
-
-                main_lv.placements.append(ArCLight_pla.name)
+        ArCLight_lv = self.ArCLight_builder.get_volume()
+        pitch = self.ArCLight_builder.halfDimension['dy']+self.Gap_LightTile
+        ltools.placeGrid(geom, main_lv, ArCLight_lv,
+                         [self.TPCPlane_builder.halfDimension['dx']+self.Gap_LightTile_PixelPlane,(-self.N_TilesY+1)*pitch,Q('0cm')],
+                         [Q('0cm'),2*pitch,Q('0cm')], [1,self.N_TilesY,1],
+                         name=self.ArCLight_builder.name, copynumber=False)
 
         # Construct PCB Bar
         PCBBar_shape = geom.shapes.Box('PCBBar_shape',
@@ -72,14 +65,7 @@ class OpticalDetBuilder(gegede.builder.Builder):
                                         shape=PCBBar_shape)
 
         # Place PCB Bar
-        for i in range(self.TPCPlane_builder.N_UnitsY):
-            pos = [-self.ArCLight_builder.halfDimension['dx']-self.Gap_LightTile_PixelPlane-self.PixelPlane_builder.Pixel_dx+self.PixelPlane_builder.Asic_dx,(-self.N_TilesY+1+2*i)*(self.ArCLight_builder.halfDimension['dy']+self.Gap_LightTile),Q('0cm')]
-
-            PCBBar_pos = geom.structure.Position('PCBBar_pos_'+str(i),
-                                                    pos[0],pos[1],pos[2])
-
-            PCBBar_pla = geom.structure.Placement('PCBBar_pla_'+str(i),
-                                                    volume=PCBBar_lv,
-                                                    pos=PCBBar_pos)
-
-            main_lv.placements.append(PCBBar_pla.name)
+        ltools.placeGrid(geom, main_lv, PCBBar_lv,
+                         [-self.ArCLight_builder.halfDimension['dx']-self.Gap_LightTile_PixelPlane-self.PixelPlane_builder.Pixel_dx+self.PixelPlane_builder.Asic_dx,(-self.N_TilesY+1)*pitch,Q('0cm')],
+                         [Q('0cm'),2*pitch,Q('0cm')], [1,self.TPCPlane_builder.N_UnitsY,1],
+                         name='PCBBar', copynumber=False)
@@ -14,7 +14,7 @@ class PixelPlaneBuilder(gegede.builder.Builder):
 
     """
 
-    def configure(self,PCB_dimension,Pixel_dimension,Asic_dimension,N_Pixel,N_Asic,**kwargs):
+    def configure(self,PCB_dimension,Pixel_dimension,Asic_dimension,N_Pixel,N_Asic,lod='full',Grid_rows=False,**kwargs):
 
         # Read dimensions form config file
         self.PCB_dx             = PCB_dimension['dx']
@@ -32,6 +32,17 @@ class PixelPlaneBuilder(gegede.builder.Builder):
         self.N_Pixel            = int(N_Pixel)
         self.N_Asic             = int(N_Asic)
 
+        # medium: pixels and ASICs as homogenised layers
+        # coarse: the whole plane is one homogenised box
+        self.lod                = ltools.checkLOD(self,lod)
+
+        # place the pixels and ASICs by rows: one row volume with N elements,
+        # placed N times, instead of N*N placements in the plane.  Off by
+        # default, since it changes the paths and copy numbers: the row n gets
+        # n*N and the pixel m in it m, the copy number of the flat layout is
+        # their sum n*N+m
+        self.Grid_rows          = Grid_rows
+
         # Material definitons
         self.PCB_Material       = 'FR4'
         self.Pixel_Material     = 'Gold'
@@ -52,11 +63,17 @@ class PixelPlaneBuilder(gegede.builder.Builder):
 
                                 'dz':   self.PCB_dz}
 
+        if self.lod == 'coarse':
+            self.Material = self.planeMaterial(geom)
+
         main_lv, main_hDim = ltools.main_lv(self,geom,'Box')
         print('PixelPlaneBuilder::construct()')
         print('main_lv = '+main_lv.name)
         self.add_volume(main_lv)
 
+        if self.lod == 'coarse':
+            return
+
         # Construct PCB panel
         PCB_shape = geom.shapes.Box('PCB_shape',
                                        dx = self.PCB_dx,
@@ -79,6 +96,10 @@ class PixelPlaneBuilder(gegede.builder.Builder):
 
         main_lv.placements.append(PCB_pla.name)
 
+        if self.lod == 'medium':
+            self.construct_layers(geom,main_lv)
+            return
+
         # Construct Pixel
         Pixel_shape = geom.shapes.Box('Pixel_shape',
                                        dx = self.Pixel_dx,
@@ -89,20 +110,11 @@ class PixelPlaneBuilder(gegede.builder.Builder):
                                             material=self.Pixel_Material,
                                             shape=Pixel_shape)
 
-        for n in range(self.N_Pixel):
-            for m in range(self.N_Pixel):
-                # Place Pixel into PCB board
-                pos = [self.PCB_dx+self.Asic_dx,-self.PCB_dy+self.Pixel_dy+(self.PCB_dy-self.Pixel_dy)/(self.N_Pixel-1)*(2*n),-self.PCB_dz+self.Pixel_dz+(self.PCB_dz-self.Pixel_dz)/(self.N_Pixel-1)*(2*m)]
-
-                Pixel_pos = geom.structure.Position('Pixel_pos_'+str(n)+'.'+str(m),
-                                                        pos[0],pos[1],pos[2])
-
-                Pixel_pla = geom.structure.Placement('Pixel_pla_'+str(n)+'.'+str(m),
-                                                        volume=Pixel_lv,
-                                                        pos=Pixel_pos,
-                                                        copynumber=(n*self.N_Pixel)+m)
-
-                main_lv.placements.append(Pixel_pla.name)
+        if self.N_Pixel > 0:
+            x = self.PCB_dx+self.Asic_dx
+            y = [-self.PCB_dy+self.Pixel_dy+(self.PCB_dy-self.Pixel_dy)/(self.N_Pixel-1)*(2*n) for n in range(self.N_Pixel)]
+            z = [-self.PCB_dz+self.Pixel_dz+(self.PCB_dz-self.Pixel_dz)/(self.N_Pixel-1)*(2*m) for m in range(self.N_Pixel)]
+            self.construct_grid(geom,main_lv,'Pixel',Pixel_lv,x,y,z,copynumbers=True)
 
         # Construct ASIC
         Asic_shape = geom.shapes.Box('Asic_shape',
@@ -114,17 +126,121 @@ class PixelPlaneBuilder(gegede.builder.Builder):
                                             material=self.Asic_Material,
                                             shape=Asic_shape)
 
-        for n in range(self.N_Asic):
-            for m in range(self.N_Asic):
-                # Place ASICs into PCB board
-                pos = [-self.PCB_dx-self.Pixel_dx,-self.PCB_dy+self.PCB_dy/self.N_Asic*(1+2*n),-self.PCB_dz+self.PCB_dz/self.N_Asic*(1+2*m)]
+        x = -self.PCB_dx-self.Pixel_dx
+        y = [-self.PCB_dy+self.PCB_dy/self.N_Asic*(1+2*n) for n in range(self.N_Asic)]
+        z = [-self.PCB_dz+self.PCB_dz/self.N_Asic*(1+2*m) for m in range(self.N_Asic)]
+        self.construct_grid(geom,main_lv,'Asic',Asic_lv,x,y,z)
+
+    def construct_grid(self,geom,main_lv,name,element_lv,x,y,z,copynumbers=False):
+        """ Place the element at (x,y[n],z[m]) for every n and m.
+
+        With Grid_rows, a row volume of the plane material spanning the PCB
+        along z holds the elements of one row and is placed at every y[n].
+        Otherwise every element is placed in the plane.  With copynumbers,
+        element (n,m) gets the copy number n*len(z)+m, with the rows it is
+        the sum of the copy numbers of the row (n*len(z)) and of the element
+        in the row (m).
+
+        """
+        if not y or not z:
+            return
+
+        if not self.Grid_rows:
+            for n in range(len(y)):
+                for m in range(len(z)):
+                    # Place element into PCB board
+                    pos = geom.structure.Position(name+'_pos_'+str(n)+'.'+str(m),
+                                                      x,y[n],z[m])
+
+                    pla = geom.structure.Placement(name+'_pla_'+str(n)+'.'+str(m),
+                                                       volume=element_lv,
+                                                       pos=pos,
+                                                       copynumber=(n*len(z))+m if copynumbers else 0)
+
+                    main_lv.placements.append(pla.name)
+            return
+
+        element_shape = geom.get_shape(element_lv)
+        row_shape = geom.shapes.Box(name+'_row_shape',
+                                       dx = element_shape.dx,
+                                       dy = element_shape.dy,
+                                       dz = self.PCB_dz)
+
+        row_lv = geom.structure.Volume('volTPC'+name+'Row',
+                                            material=self.Material,
+                                            shape=row_shape)
+
+        for m in range(len(z)):
+            pos = geom.structure.Position(name+'_pos_'+str(m),
+                                              Q('0m'),Q('0m'),z[m])
+
+            pla = geom.structure.Placement(name+'_pla_'+str(m),
+                                               volume=element_lv,
+                                               pos=pos,
+                                               copynumber=m if copynumbers else 0)
+
+            row_lv.placements.append(pla.name)
 
-                Asic_pos = geom.structure.Position('Asic_pos_'+str(n)+'.'+str(m),
-                                                        pos[0],pos[1],pos[2])
+        for n in range(len(y)):
+            pos = geom.structure.Position(name+'_row_pos_'+str(n),
+                                              x,y[n],Q('0m'))
 
-                Asic_pla = geom.structure.Placement('Asic_pla_'+str(n)+'.'+str(m),
-                                                        volume=Asic_lv,
-                                                        pos=Asic_pos)
+            pla = geom.structure.Placement(name+'_row_pla_'+str(n),
+                                               volume=row_lv,
+                                               pos=pos,
+                                               copynumber=n*len(z) if copynumbers else 0)
 
-                main_lv.placements.append(Asic_pla.name)
+            main_lv.placements.append(pla.name)
+
+    def parts(self):
+        """ (material, volume) of the PCB, the pixels and the ASICs.
+
+        """
+        return [(self.PCB_Material,8*self.PCB_dx*self.PCB_dy*self.PCB_dz),
+                (self.Pixel_Material,self.N_Pixel**2*8*self.Pixel_dx*self.Pixel_dy*self.Pixel_dz),
+                (self.Asic_Material,self.N_Asic**2*8*self.Asic_dx*self.Asic_dy*self.Asic_dz)]
 
+    def planeMaterial(self,geom):
+        """ Homogenised material of the whole plane.
+
+        """
+        parts = self.parts()
+        volume = 8*self.halfDimension['dx']*self.halfDimension['dy']*self.halfDimension['dz']
+        for material, part_volume in parts:
+            volume = volume-part_volume
+        parts.append((self.Material,volume))
+
+        return ltools.homogenisedMaterial(geom,self.name+'_lod',parts)
+
+    def construct_layers(self,geom,main_lv):
+        """ Construct the pixels and the ASICs as one homogenised layer each.
+
+        """
+        PCB, pixels, asics = self.parts()
+        layers = [('Pixel',self.Pixel_dx,pixels,self.PCB_dx+self.Asic_dx),
+                  ('Asic',self.Asic_dx,asics,-self.PCB_dx-self.Pixel_dx)]
+
+        for name, dx, (material, volume), x in layers:
+            if volume == Q('0m**3'):
+                continue
+            layer_volume = 8*dx*self.PCB_dy*self.PCB_dz
+            layer_material = ltools.homogenisedMaterial(geom,self.name+'_'+name+'_lod',
+                                                        [(material,volume),(self.Material,layer_volume-volume)])
+
+            layer_shape = geom.shapes.Box(name+'_layer_shape',
+                                           dx = dx,
+                                           dy = self.PCB_dy,
+                                           dz = self.PCB_dz)
+
+            layer_lv = geom.structure.Volume('volTPC'+name+'Layer',
+                                                material=layer_material,
+                                                shape=layer_shape)
+
+            layer_pos = geom.structure.Position(name+'_layer_pos',
+                                                    x,Q('0m'),Q('0m'))
+
+            layer_pla = geom.structure.Placement(name+'_layer_pla',
+                                                    volume=layer_lv,
+                                                    pos=layer_pos)
+
+            main_lv.placements.append(layer_pla.name)
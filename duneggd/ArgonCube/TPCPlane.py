@@ -42,39 +42,26 @@ class TPCPlaneBuilder(gegede.builder.Builder):
         self.add_volume(main_lv)
 
         # Build TPC Array
-        for i in range(self.N_UnitsY):
-            pos = [Q('0cm'),(-self.N_UnitsY+1+2*i)*(self.PixelPlane_builder.halfDimension['dy']+self.Gap_PixelTile),-self.PixelPlane_builder.halfDimension['dz']-self.Gap_PixelTile]
+        PixelPlane_lv = self.PixelPlane_builder.get_volume()
+        pitch = self.PixelPlane_builder.halfDimension['dy']+self.Gap_PixelTile
+        dz = self.PixelPlane_builder.halfDimension['dz']+self.Gap_PixelTile
 
-            PixelPlane_lv = self.PixelPlane_builder.get_volume()
+        ltools.placeGrid(geom, main_lv, PixelPlane_lv,
+                         [Q('0cm'),(-self.N_UnitsY+1)*pitch,-dz], [Q('0cm'),2*pitch,Q('0cm')], [1,self.N_UnitsY,1],
+                         name=self.PixelPlane_builder.name, suffix='_R',
+                         copynumber=lambda i,j,k: 2*j)
 
-            PixelPlane_pos = geom.structure.Position(self.PixelPlane_builder.name+'_pos_'+str(i)+'_R',
-                                                pos[0],pos[1],pos[2])
+        rot =[Q('180.0deg'),Q('0.0deg'),Q('0.0deg')]
 
-            PixelPlane_pla = geom.structure.Placement(self.PixelPlane_builder.name+'_pla_'+str(i)+'_R',
-                                                    volume=PixelPlane_lv,
-                                                    pos=PixelPlane_pos,
-                                                    copynumber=2*i)
+        # for the TPC maps of the module arrays (LocalTools/tpcmap.py), the
+        # pixels are on the +x face of the plane, on both sides
+        self.TPCMapRoles = {'anode': main_lv.name, 'normal': [1, 0, 0]}
 
-            main_lv.placements.append(PixelPlane_pla.name)
+        PixelPlane_rot = geom.structure.Rotation(self.PixelPlane_builder.name+'_rot_L',
+                                            rot[0],rot[1],rot[2])
 
-        for i in range(self.N_UnitsY):
-            pos = [Q('0cm'),(-self.N_UnitsY+1+2*i)*(self.PixelPlane_builder.halfDimension['dy']+self.Gap_PixelTile),+self.PixelPlane_builder.halfDimension['dz']+self.Gap_PixelTile]
-
-            PixelPlane_lv = self.PixelPlane_builder.get_volume()
-
-            PixelPlane_pos = geom.structure.Position(self.PixelPlane_builder.name+'_pos_'+str(i)+'_L',
-                                                pos[0],pos[1],pos[2])
-
-            rot =[Q('180.0deg'),Q('0.0deg'),Q('0.0deg')]
-
-            PixelPlane_rot = geom.structure.Rotation(self.PixelPlane_builder.name+'_rot_'+str(i)+'_L',
-                                                rot[0],rot[1],rot[2])
-
-            PixelPlane_pla = geom.structure.Placement(self.PixelPlane_builder.name+'_pla_'+str(i)+'_L',
-                                                    volume=PixelPlane_lv,
-                                                    pos=PixelPlane_pos,
-                                                    rot=PixelPlane_rot,
-                                                    copynumber=(2*i)+1)
-
-            main_lv.placements.append(PixelPlane_pla.name)
+        ltools.placeGrid(geom, main_lv, PixelPlane_lv,
+                         [Q('0cm'),(-self.N_UnitsY+1)*pitch,+dz], [Q('0cm'),2*pitch,Q('0cm')], [1,self.N_UnitsY,1],
+                         name=self.PixelPlane_builder.name, suffix='_L', rot=PixelPlane_rot,
+                         copynumber=lambda i,j,k: 2*j+1)
 
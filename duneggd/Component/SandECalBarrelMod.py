@@ -15,6 +15,7 @@ class SandECalBarrelModBuilder(gegede.builder.Builder):
 		  PasSlabThickness=None,
 		  ActiveSlabThickness=None,
 		  nSlabs=None,
+		  lod='full',
 		  **kwds):
         self.trapezoidDim = trapezoidDim
         self.ScintMat = ScintMat
@@ -22,6 +23,8 @@ class SandECalBarrelModBuilder(gegede.builder.Builder):
         self.PasSlabThickness = PasSlabThickness
         self.ActiveSlabThickness = ActiveSlabThickness
         self.nSlabs = nSlabs
+        # coarse: the module is one volume of the homogenised slabs
+        self.lod = ltools.checkLOD(self, lod)
     #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
     def construct(self, geom):
 
@@ -32,6 +35,12 @@ class SandECalBarrelModBuilder(gegede.builder.Builder):
 					   dy2=self.trapezoidDim[2],
 					   dz=self.trapezoidDim[3])
 
+        if self.lod == 'coarse':
+            ECAL_lv = geom.structure.Volume('ECAL_lv', material=self.moduleMaterial(geom), shape=ECAL_shape)
+            ECAL_lv.params.append(("SensDet","EMCalSci"))
+            self.add_volume(ECAL_lv)
+            return
+
         ECAL_lv = geom.structure.Volume('ECAL_lv', material='Air', shape=ECAL_shape)
         self.add_volume(ECAL_lv)
 #       ECAL_position = geom.structure.Position('ECAL_position', Position[0], Position[1], Position[2])
@@ -106,3 +115,22 @@ class SandECalBarrelModBuilder(gegede.builder.Builder):
 							     pos = aECALPassiveSlabPos)
 
             ECAL_lv.placements.append( aECALPassiveSlabPlace.name )
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def moduleMaterial(self, geom):
+        """
+        Homogenised material of the slabs and the air around them in the module.
+        """
+        # volume of a trapezoid slab of half widths b and B and thickness t
+        def slab(b, B, t):
+            return (b+B) * 2*self.trapezoidDim[2] * t
+        tan = 0.5*(self.trapezoidDim[1] - self.trapezoidDim[0])/self.trapezoidDim[3]
+        active, passive = Q('0cm**3'), Q('0cm**3')
+        for i in range(self.nSlabs):
+            bhalfActive = self.trapezoidDim[0] + i*(self.ActiveSlabThickness + self.PasSlabThickness)*tan
+            BhalfActive = bhalfActive + self.ActiveSlabThickness*tan
+            active += slab(bhalfActive, BhalfActive, self.ActiveSlabThickness)
+            passive += slab(BhalfActive, BhalfActive + self.PasSlabThickness*tan, self.PasSlabThickness)
+        total = slab(self.trapezoidDim[0], self.trapezoidDim[1], 2*self.trapezoidDim[3])
+        return ltools.homogenisedMaterial(geom, self.name+'_lod',
+                                          [(self.ScintMat, active), (self.PasMat, passive), ('Air', total - active - passive)])
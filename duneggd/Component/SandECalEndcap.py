@@ -15,6 +15,7 @@ class SandECalEndcapBuilder(gegede.builder.Builder):
 		  PasSlabThickness=None, 
 		  ActiveSlabThickness=None, 
 		  nSlabs=None, 
+		  lod='full',
 		  **kwds):
         self.EndcapSize = EndcapSize
         self.ActiveMat = ActiveMat
@@ -22,6 +23,8 @@ class SandECalEndcapBuilder(gegede.builder.Builder):
         self.PasSlabThickness = PasSlabThickness
         self.ActiveSlabThickness = ActiveSlabThickness
         self.nSlabs = nSlabs
+        # coarse: the slabs are one homogenised disk
+        self.lod = ltools.checkLOD(self, lod)
     #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
     def construct(self, geom):
         
@@ -36,6 +39,21 @@ class SandECalEndcapBuilder(gegede.builder.Builder):
 
         ECAL_end_lv = geom.structure.Volume('ECAL_end_lv', material='Air', shape=ECAL_end_shape)
         self.add_volume(ECAL_end_lv)
+
+        if self.lod == 'coarse':
+            stackThickness = self.nSlabs * (self.ActiveSlabThickness + self.PasSlabThickness)
+            material = ltools.homogenisedMaterial(geom, self.name+'_lod',
+                                                  [(self.ActiveMat, self.nSlabs * self.ActiveSlabThickness * Q('1cm**2')),
+                                                   (self.PasMat, self.nSlabs * self.PasSlabThickness * Q('1cm**2'))])
+            endECALSlabs = geom.shapes.Tubs('endECALSlabs', rmin=KLOEEndcapECALRmin,
+                                            rmax=KLOEEndcapECALRmax, dz=0.5 * stackThickness)
+            endECALSlabs_lv = geom.structure.Volume('endvolECALSlabs', material=material, shape=endECALSlabs)
+            endECALSlabs_lv.params.append(("SensDet","EMCalSci"))
+            endECALSlabsPos = geom.structure.Position('endecalslabspos', Q('0cm'), Q('0cm'),
+                                                      -KLOEEndcapECALDepth * 0.5 + 0.5 * stackThickness)
+            endECALSlabsPlace = geom.structure.Placement('endecalslabspla', volume=endECALSlabs_lv, pos=endECALSlabsPos)
+            ECAL_end_lv.placements.append( endECALSlabsPlace.name )
+            return
 #	print(self.name)
 #       ECAL_position = geom.structure.Position('ECAL_position', Position[0], Position[1], Position[2])
 #       ECAL_place = geom.structure.Placement('ECAL_place', volume = ECAL_lv, pos=ECAL_position)
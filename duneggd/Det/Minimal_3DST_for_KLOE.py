@@ -2,11 +2,12 @@
 
 import gegede.builder
 #from duneggd.LocalTools import materialdefinition as materials
+from duneggd.LocalTools import localtools as ltools
 from gegede import Quantity as Q
 
 class Minimal_3DST_Builder(gegede.builder.Builder):
 
-    def configure(self, cubeDim=None, nCubeX=None, nCubeY=None, nCubeZ=None, nScinLayer=None, ecalModDim = None, stripxDim = None, stripyDim = None, radiatorDim = None, ecalModDimTop=None, stripxDimTop=None, stripyDimTop=None, radiatorDimTop=None, nScinBar = None, ecalPos=None, ecalPosTop=None, ecalPosBot=None, ecalScinMat=None, radiatorMat=None, a3dstPos=None, ScinMat=None, tpcDim=None, tpcTopDim=None, tpcPos=None, tpcTopPos=None, tpcBotDim=None, tpcBotPos=None, tpcMat=None, magOutDim=None, magInDim=None, magPos=None, magMat=None, fullDetDim=None, rpcModDim=None, resistplateDim=None, gas_gap=None, nRPCLayer=None, rpcModMat=None, gasMat=None, resistplateMat=None, rpcPos=None, cylinderDim=None, cylinderMat=None, cylinderPos=None, **kwds):
+    def configure(self, cubeDim=None, nCubeX=None, nCubeY=None, nCubeZ=None, nScinLayer=None, ecalModDim = None, stripxDim = None, stripyDim = None, radiatorDim = None, ecalModDimTop=None, stripxDimTop=None, stripyDimTop=None, radiatorDimTop=None, nScinBar = None, ecalPos=None, ecalPosTop=None, ecalPosBot=None, ecalScinMat=None, radiatorMat=None, a3dstPos=None, ScinMat=None, tpcDim=None, tpcTopDim=None, tpcPos=None, tpcTopPos=None, tpcBotDim=None, tpcBotPos=None, tpcMat=None, magOutDim=None, magInDim=None, magPos=None, magMat=None, fullDetDim=None, rpcModDim=None, resistplateDim=None, gas_gap=None, nRPCLayer=None, rpcModMat=None, gasMat=None, resistplateMat=None, rpcPos=None, cylinderDim=None, cylinderMat=None, cylinderPos=None, lod='full', **kwds):
 
         self.fullDetDim = fullDetDim
         self.tpcDim = tpcDim
@@ -59,6 +60,10 @@ class Minimal_3DST_Builder(gegede.builder.Builder):
         self.cylinderMat = cylinderMat
         self.cylinderPos = cylinderPos
 
+        # medium: solid scintillator bars without cubes
+        # coarse: the 3DST is one solid scintillator box
+        self.lod = ltools.checkLOD(self, lod)
+
     def construct(self, geom):
 
         ########## logv volume of rpc
@@ -120,6 +125,13 @@ class Minimal_3DST_Builder(gegede.builder.Builder):
 
         a3dstBox = geom.shapes.Box( '3dst',                 dx=0.5*self.cubeDim[0]*nCubeX,
                               dy=0.5*self.cubeDim[1]*nCubeY, dz=0.5*self.cubeDim[2]*nCubeZ)
+        if self.lod == 'coarse':
+            # the cubes fill the whole 3DST
+            a3dst_lv = geom.structure.Volume('vol3DST', material='Scintillator', shape=a3dstBox)
+            a3dst_lv.params.append(("SensDet", 'volCube'))
+            self.placeA3dst(full3dst_lv, a3dst_lv, a3dstPos, geom)
+            return
+
         a3dst_lv = geom.structure.Volume('vol3DST', material='Air', shape=a3dstBox)
 
         a3dstPlane = geom.shapes.Box( '3dstplane',                 dx=0.5*self.cubeDim[0]*nCubeX,
@@ -128,24 +140,32 @@ class Minimal_3DST_Builder(gegede.builder.Builder):
 
         a3dstBar = geom.shapes.Box( '3dstBar',                 dx=0.5*self.cubeDim[0]*nCubeX,
                               dy=0.5*self.cubeDim[1], dz=0.5*self.cubeDim[2])
-        a3dstBar_lv = geom.structure.Volume('vol3DSTBar', material='Air', shape=a3dstBar)
-
-        a3dstCube = geom.shapes.Box( '3dstCube',                 dx=0.5*self.cubeDim[0],
-                              dy=0.5*self.cubeDim[1], dz=0.5*self.cubeDim[2])
-        a3dstCube_lv = geom.structure.Volume('volcube', material='Scintillator', shape=a3dstCube)
-        a3dstCube_lv.params.append(("SensDet", 'volCube'))
-
-        for i in range(nCubeX):
-
-            xposCube=-0.5*self.cubeDim[0]*nCubeX +(i+0.5)*self.cubeDim[0]
-            yposCube=Q('0cm')
-            zposCube=Q('0cm')
-
-            a3dstBar_lv.placements.append( geom.structure.Placement( 'a3dstBar'+'_'+str(i),
-                                               volume = a3dstCube_lv, pos = geom.structure.Position('a3dstCubevol'+'_'+str(i),
-                                                xposCube,
-                                                yposCube,
-                                                zposCube)).name )
+        if self.lod == 'medium':
+            # the cubes fill the bar
+            a3dstBar_lv = geom.structure.Volume('vol3DSTBar', material='Scintillator', shape=a3dstBar)
+            a3dstBar_lv.params.append(("SensDet", 'volCube'))
+        else:
+            a3dstBar_lv = geom.structure.Volume('vol3DSTBar', material='Air', shape=a3dstBar)
+
+        if self.lod == 'full':
+            a3dstCube = geom.shapes.Box( '3dstCube',                 dx=0.5*self.cubeDim[0],
+                                  dy=0.5*self.cubeDim[1], dz=0.5*self.cubeDim[2])
+            a3dstCube_lv = geom.structure.Volume('volcube', material='Scintillator', shape=a3dstCube)
+            a3dstCube_lv.params.append(("SensDet", 'volCube'))
+
+            for i in range(nCubeX):
+
+                xposCube=-0.5*self.cubeDim[0]*nCubeX +(i+0.5)*self.cubeDim[0]
+                yposCube=Q('0cm')
+                zposCube=Q('0cm')
+
+                a3dstBar_lv.placements.append( geom.structure.Placement( 'a3dstBar'+'_'+str(i),
+                                                   volume = a3dstCube_lv, pos = geom.structure.Position('a3dstCubevol'+'_'+str(i),
+                                                    xposCube,
+                                                    yposCube,
+                                                    zposCube)).name )
+        else:
+            i = nCubeX-1    # the names below carry the last cube index
 
         for j in range(nCubeY):
 
@@ -176,6 +196,10 @@ class Minimal_3DST_Builder(gegede.builder.Builder):
                                                    volume = a3dstPlane_lv,pos = f3dstPos) #,rot = "r90aboutX" )
             a3dst_lv.placements.append( place3dst.name )
 
+        self.placeA3dst(full3dst_lv, a3dst_lv, a3dstPos, geom)
+
+    def placeA3dst(self, full3dst_lv, a3dst_lv, a3dstPos, geom):
+
         #########################################
         a3dstPosition = geom.structure.Position('a3dstPosition', a3dstPos[0], a3dstPos[1], a3dstPos[2])
         placeA3dst = geom.structure.Placement('placeA3dstName', volume = a3dst_lv, pos=a3dstPosition, rot="r90aboutY")
@@ -30,14 +30,8 @@ class PrimaryBuilder(gegede.builder.Builder):
 
         for i,sb in enumerate(self.get_builders()):
             sb_lv = sb.get_volume()
-            sb_dim = ltools.getShapeDimensions( sb_lv, geom )
             step = [Q('0cm'),Q('0cm'),Q('0cm')]
-            #assert ( sb_dim != None ), " fail"
-            if sb_dim != None:
-                step[2] = sb_dim[2]
-            else:
-                assert( sb.halfDimension != None ), " No volumen defined on %s " % sb
-                step[2] = sb.halfDimension['dz']
+            step[2] = ltools.getBuilderDimensions( sb, geom )[2]
             pos[2] = pos[2] + step[2] + self.InsideGap[i]
             # defining position, placement, and finally insert into main logic volume.
             sb_pos = geom.structure.Position(self.name+sb_lv.name+'_pos_'+str(i),
@@ -0,0 +1,466 @@
+'''
+Homogenisation of built subtrees.
+
+subtreeMaterials() integrates the volume of every material in a logical volume
+and all its daughters, each volume counting its shape minus the shapes of its
+daughters, and homogeniseSubtree() defines the Mixture of the same mass and
+volume, so that a level of detail can replace a subtree by a single volume
+without a hand maintained material like straw_avg_ArXe:
+
+    lv = self.construct_module(geom, ...)
+    mat = homogenise.homogeniseSubtree(geom, "module_lod", lv)
+
+homogeniseBuilt() does the same for a subtree built on purpose in a scratch
+Geometry, e.g. the full detail version of what the builder puts in its place.
+
+The volumes of the shapes are exact, but for the Boolean shapes whose parts are
+neither disjoint nor one inside the other (convex) one: their common volume is
+integrated on a grid of gridPoints points, to a few 1e-3 relative precision.
+'''
+
+import math
+from collections import OrderedDict
+
+import gegede.construct
+from gegede import Quantity as Q
+from duneggd.LocalTools import localtools as ltools
+from duneggd.LocalTools import materialdefinition as materials
+
+# points of the grid the common volume of overlapping Boolean parts is
+# integrated on
+gridPoints = 100000
+
+twopi = 2*math.pi
+booleans = {'Union': 'union', 'Subtraction': 'subtraction', 'Intersection': 'intersection'}
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def rotationMatrix( rot ):
+    """
+    Matrix R = Rz*Ry*Rx of a Rotation, None is the identity.
+    """
+    if rot is None:
+        return ((1.,0.,0.), (0.,1.,0.), (0.,0.,1.))
+    ax, ay, az = [rot.x.to('radian').magnitude, rot.y.to('radian').magnitude, rot.z.to('radian').magnitude]
+    cx, sx = math.cos(ax), math.sin(ax)
+    cy, sy = math.cos(ay), math.sin(ay)
+    cz, sz = math.cos(az), math.sin(az)
+    return ((cz*cy, cz*sy*sx - sz*cx, cz*sy*cx + sz*sx),
+            (sz*cy, sz*sy*sx + cz*cx, sz*sy*cx - cz*sx),
+            (-sy,   cy*sx,            cy*cx))
+
+def toSecond( R, t, p ):
+    """ a point of the first shape of a Boolean in the frame of the second """
+    d = (p[0]-t[0], p[1]-t[1], p[2]-t[2])
+    return (R[0][0]*d[0] + R[0][1]*d[1] + R[0][2]*d[2],
+            R[1][0]*d[0] + R[1][1]*d[1] + R[1][2]*d[2],
+            R[2][0]*d[0] + R[2][1]*d[1] + R[2][2]*d[2])
+
+def toFirst( R, t, p ):
+    return tuple(R[0][i]*p[0] + R[1][i]*p[1] + R[2][i]*p[2] + t[i] for i in range(3))
+
+def inPhi( x, y, sphi, dphi ):
+    if dphi >= twopi:
+        return True
+    return (math.atan2(y, x) - sphi) % twopi <= dphi
+
+def corners( lo, hi ):
+    return [(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Solids(object):
+    """
+    The shapes of a geometry store as numbers (cm and radian), with their
+    volume, bounding box and point inside test.  The dimensions are the
+    ones the GDML exporter writes.
+    """
+
+    def __init__( self, geom ):
+        self.geom = geom
+        self.dims = {}          # shape name -> (kind, dict of numbers)
+        self.keys = {}          # shape name -> key
+        self.volumes = {}       # key -> volume
+        self.boxes = {}
+
+    def get( self, name ):
+        """
+        Return (kind, dims) of a shape, the dims of a Boolean are its type, its
+        parts and the transformation (R, t) of the second one: the point p of
+        the first part is the point R*(p-t) of the second.
+        """
+        ret = self.dims.get(name)
+        if ret is not None:
+            return ret
+        shape = self.geom.store.shapes[name]
+        kind = type(shape).__name__
+        dims = {}
+        if kind == 'Boolean' or kind in booleans:
+            kind = booleans.get(kind, getattr(shape, 'type', None))
+            if kind not in booleans.values():
+                raise ValueError('%s: unknown boolean type "%s"' % (name, kind))
+            t, rot = (0., 0., 0.), None
+            if shape.pos is not None:
+                pos = self.geom.store.structure[shape.pos]
+                t = (pos.x.to('cm').magnitude, pos.y.to('cm').magnitude, pos.z.to('cm').magnitude)
+            if shape.rot is not None:
+                rot = self.geom.store.structure[shape.rot]
+            dims = dict(first=shape.first, second=shape.second, R=rotationMatrix(rot), t=t)
+        else:
+            for k, v in zip(shape._fields, shape):
+                if hasattr(v, 'dimensionality'):
+                    dims[k] = v.to('cm').magnitude if v.check('[length]') else v.to('radian').magnitude
+                else:
+                    dims[k] = v
+        self.dims[name] = (kind, dims)
+        return kind, dims
+
+    def key( self, name ):
+        """
+        Return the kind and dimensions of a shape as a key, the same for the
+        same solid under different names.
+        """
+        ret = self.keys.get(name)
+        if ret is None:
+            kind, d = self.get(name)
+            if kind in ('union', 'subtraction', 'intersection'):
+                ret = (kind, self.key(d['first']), self.key(d['second']), d['R'], d['t'])
+            else:
+                ret = (kind,) + tuple(sorted((k, repr(v)) for k, v in d.items() if k != 'name'))
+            self.keys[name] = ret
+        return ret
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def inside( self, name, p ):
+        """
+        Return True if the point p (in cm) is inside the shape.
+        """
+        kind, d = self.get(name)
+        x, y, z = p
+        if kind in ('union', 'subtraction', 'intersection'):
+            a = self.inside(d['first'], p)
+            if kind == 'union':
+                return a or self.inside(d['second'], toSecond(d['R'], d['t'], p))
+            if not a:
+                return False
+            b = self.inside(d['second'], toSecond(d['R'], d['t'], p))
+            return b if kind == 'intersection' else not b
+
+        if kind in ('TwistedBox', 'TwistedTrd'):
+            # untwist the point, the twist goes from -phitws/2 to +phitws/2
+            a = -d['phitws'] * z / (2*d['dz'])
+            x, y = x*math.cos(a) - y*math.sin(a), x*math.sin(a) + y*math.cos(a)
+            kind = kind[7:].replace('Trd', 'Trapezoid')
+
+        if kind == 'Box':
+            return abs(x) <= d['dx'] and abs(y) <= d['dy'] and abs(z) <= d['dz']
+        if kind == 'Tubs':
+            return (abs(z) <= d['dz'] and d['rmin']**2 <= x*x + y*y <= d['rmax']**2
+                    and inPhi(x, y, d['sphi'], d['dphi']))
+        if kind == 'Cone':
+            if abs(z) > d['dz']:
+                return False
+            f = (z + d['dz']) / (2*d['dz'])
+            rmin = d['rmin1'] + (d['rmin2'] - d['rmin1'])*f
+            rmax = d['rmax1'] + (d['rmax2'] - d['rmax1'])*f
+            return rmin**2 <= x*x + y*y <= rmax**2 and inPhi(x, y, d['sphi'], d['dphi'])
+        if kind == 'Sphere':
+            r = math.sqrt(x*x + y*y + z*z)
+            if not d['rmin'] <= r <= d['rmax']:
+                return False
+            theta = math.acos(z/r) if r > 0 else 0.
+            return (d['stheta'] <= theta <= d['stheta'] + d['dtheta']
+                    and inPhi(x, y, d['sphi'], d['dphi']))
+        if kind == 'Trapezoid':
+            if abs(z) > d['dz']:
+                return False
+            f = (z + d['dz']) / (2*d['dz'])
+            return (abs(x) <= d['dx1'] + (d['dx2'] - d['dx1'])*f and
+                    abs(y) <= d['dy1'] + (d['dy2'] - d['dy1'])*f)
+        if kind == 'PolyhedraRegular':
+            # rmin and rmax are the distances of the sides to the axis
+            if abs(z) > d['dz'] or not inPhi(x, y, d['sphi'], d['dphi']):
+                return False
+            n = int(d['numsides'])
+            side = min(int(((math.atan2(y, x) - d['sphi']) % twopi) / (d['dphi']/n)), n-1)
+            c = d['sphi'] + (side + 0.5)*d['dphi']/n
+            return d['rmin'] <= x*math.cos(c) + y*math.sin(c) <= d['rmax']
+        if kind == 'EllipticalTube':
+            return abs(z) <= d['dz'] and (x/d['dx'])**2 + (y/d['dy'])**2 <= 1
+        if kind == 'Ellipsoid':
+            zlo, zhi = self.ellipsoidCuts(d)
+            return zlo <= z <= zhi and (x/(2*d['dax']))**2 + (y/(2*d['dby']))**2 + (z/(2*d['dcz']))**2 <= 1
+        if kind == 'Torus':
+            r2 = (math.sqrt(x*x + y*y) - d['rtor'])**2 + z*z
+            return d['rmin']**2 <= r2 <= d['rmax']**2 and inPhi(x, y, d['startphi'], d['deltaphi'])
+        if kind == 'Paraboloid':
+            r1, r2, dz = 2*d['drlo'], 2*d['drhi'], 2*d['ddz']
+            return abs(z) <= dz and x*x + y*y <= (r2*r2 - r1*r1)/(2*dz)*z + (r2*r2 + r1*r1)/2
+        raise ValueError('%s: no point inside test for %s shapes' % (name, kind))
+
+    def ellipsoidCuts( self, d ):
+        """ z range of an Ellipsoid, a 0 cut is no cut """
+        c = 2*d['dcz']
+        zlo = 2*d['dzcut1'] if d['dzcut1'] != 0 else -c
+        zhi = 2*d['dzcut2'] if d['dzcut2'] != 0 else c
+        return max(zlo, -c), min(zhi, c)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def boundingBox( self, name ):
+        """
+        Return the (lo, hi) corners in cm of a box around the shape, in its frame.
+        """
+        ret = self.boxes.get(name)
+        if ret is not None:
+            return ret
+        kind, d = self.get(name)
+        if kind in ('union', 'subtraction', 'intersection'):
+            lo, hi = self.boundingBox(d['first'])
+            if kind != 'subtraction':
+                slo, shi = self.placedBox(d)
+                if kind == 'union':
+                    lo, hi = tuple(map(min, lo, slo)), tuple(map(max, hi, shi))
+                else:
+                    lo, hi = tuple(map(max, lo, slo)), tuple(map(min, hi, shi))
+            self.boxes[name] = lo, hi
+            return lo, hi
+
+        if kind == 'Box' or kind == 'EllipticalTube':
+            h = (d['dx'], d['dy'], d['dz'])
+        elif kind == 'TwistedBox':
+            r = math.hypot(d['dx'], d['dy'])
+            h = (r, r, d['dz'])
+        elif kind == 'Tubs':
+            h = (d['rmax'], d['rmax'], d['dz'])
+        elif kind == 'Cone':
+            r = max(d['rmax1'], d['rmax2'])
+            h = (r, r, d['dz'])
+        elif kind == 'Sphere':
+            h = (d['rmax'], d['rmax'], d['rmax'])
+        elif kind == 'Torus':
+            r = d['rtor'] + d['rmax']
+            h = (r, r, d['rmax'])
+        elif kind == 'PolyhedraRegular':
+            r = d['rmax'] / math.cos(d['dphi'] / (2*int(d['numsides'])))
+            h = (r, r, d['dz'])
+        elif kind == 'Trapezoid':
+            h = (max(d['dx1'], d['dx2']), max(d['dy1'], d['dy2']), d['dz'])
+        elif kind == 'TwistedTrd':
+            r = math.hypot(max(d['dx1'], d['dx2']), max(d['dy1'], d['dy2']))
+            h = (r, r, d['dz'])
+        elif kind == 'Ellipsoid':
+            zlo, zhi = self.ellipsoidCuts(d)
+            ret = (-2*d['dax'], -2*d['dby'], zlo), (2*d['dax'], 2*d['dby'], zhi)
+        elif kind == 'Paraboloid':
+            r = 2*max(d['drlo'], d['drhi'])
+            h = (r, r, 2*d['ddz'])
+        else:
+            raise ValueError('%s: no bounding box for %s shapes' % (name, kind))
+        if ret is None:
+            ret = tuple(-v for v in h), h
+        self.boxes[name] = ret
+        return ret
+
+    def placedBox( self, d ):
+        """ bounding box of the second part of a Boolean, in the frame of the first """
+        pts = [toFirst(d['R'], d['t'], p) for p in corners(*self.boundingBox(d['second']))]
+        return tuple(map(min, *pts)), tuple(map(max, *pts))
+
+    def isConvex( self, name ):
+        kind, d = self.get(name)
+        if kind in ('Box', 'Trapezoid', 'EllipticalTube', 'Ellipsoid', 'Paraboloid'):
+            return True
+        if kind in ('Tubs', 'PolyhedraRegular'):
+            return d['rmin'] == 0 and (d['dphi'] >= twopi or d['dphi'] <= math.pi)
+        if kind == 'Cone':
+            return d['rmin1'] == 0 and d['rmin2'] == 0 and d['dphi'] >= twopi
+        if kind == 'Sphere':
+            return d['rmin'] == 0 and d['dphi'] >= twopi and d['dtheta'] >= math.pi
+        if kind == 'intersection':
+            return self.isConvex(d['first']) and self.isConvex(d['second'])
+        return False
+
+    def radialRange( self, name ):
+        """ (rmin, rmax) around the z axis of a shape, rmin is 0 for a partial phi """
+        kind, d = self.get(name)
+        if kind == 'Tubs':
+            return (d['rmin'] if d['dphi'] >= twopi else 0.), d['rmax']
+        if kind == 'Cone':
+            return (min(d['rmin1'], d['rmin2']) if d['dphi'] >= twopi else 0.), max(d['rmax1'], d['rmax2'])
+        if kind == 'PolyhedraRegular':
+            return 0., d['rmax'] / math.cos(d['dphi'] / (2*int(d['numsides'])))
+        lo, hi = self.boundingBox(name)
+        return 0., math.sqrt(max(lo[0]**2, hi[0]**2) + max(lo[1]**2, hi[1]**2))
+
+    def contains( self, d ):
+        """
+        Return True if the second part of a Boolean is known to be inside the first.
+        """
+        R, t = d['R'], d['t']
+        first, second = d['first'], d['second']
+        kind, f = self.get(first)
+        if kind in ('Tubs', 'Cone', 'PolyhedraRegular') and abs(R[2][2] - 1) < 1e-12:
+            # round shapes on the same axis
+            lo, hi = self.boundingBox(second)
+            rmin, rmax = self.radialRange(second)
+            off = math.hypot(t[0], t[1])
+            skind, s = self.get(second)
+            if (kind == skind == 'PolyhedraRegular' and off == 0 and abs(R[0][0] - 1) < 1e-12
+                    and int(s['numsides']) == int(f['numsides']) and s['sphi'] == f['sphi']):
+                # the same polygon, compare the apothems
+                rmin, rmax, frmax = s['rmin'], s['rmax'], f['rmax']
+                return (f['dphi'] >= twopi and t[2] + lo[2] >= -f['dz'] and t[2] + hi[2] <= f['dz']
+                        and rmax <= frmax and (f['rmin'] == 0 or rmin >= f['rmin']))
+            if kind == 'Tubs':
+                frmin, frmax = f['rmin'], f['rmax']
+            elif kind == 'Cone':
+                frmin, frmax = max(f['rmin1'], f['rmin2']), min(f['rmax1'], f['rmax2'])
+            else:
+                frmin, frmax = f['rmin'] / math.cos(f['dphi'] / (2*int(f['numsides']))), f['rmax']
+            full = f['dphi'] >= twopi
+            return (full and t[2] + lo[2] >= -f['dz'] and t[2] + hi[2] <= f['dz']
+                    and off + rmax <= frmax and (frmin == 0 or rmin - off >= frmin))
+        # the second part inside a convex first one
+        return self.isConvex(first) and all(self.inside(first, toFirst(R, t, p))
+                                            for p in corners(*self.boundingBox(second)))
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def commonVolume( self, d ):
+        """
+        Volume in cm3 common to the two parts of a Boolean.
+        """
+        R, t = d['R'], d['t']
+        lo, hi = self.boundingBox(d['first'])
+        slo, shi = self.placedBox(d)
+        lo, hi = tuple(map(max, lo, slo)), tuple(map(min, hi, shi))
+        if any(l >= h for l, h in zip(lo, hi)):
+            return 0.
+        if self.contains(d):
+            return self.volume(d['second'])
+
+        size = [h - l for l, h in zip(lo, hi)]
+        step = (size[0]*size[1]*size[2] / gridPoints)**(1./3)
+        n = [max(1, int(round(s/step))) for s in size]
+        count = 0
+        for i in range(n[0]):
+            x = lo[0] + (i + 0.5)*size[0]/n[0]
+            for j in range(n[1]):
+                y = lo[1] + (j + 0.5)*size[1]/n[1]
+                for k in range(n[2]):
+                    p = (x, y, lo[2] + (k + 0.5)*size[2]/n[2])
+                    if self.inside(d['first'], p) and self.inside(d['second'], toSecond(R, t, p)):
+                        count += 1
+        return size[0]*size[1]*size[2] * count / (n[0]*n[1]*n[2])
+
+    def volume( self, name ):
+        """
+        Return the volume of a shape in cm3.
+        """
+        key = self.key(name)
+        ret = self.volumes.get(key)
+        if ret is not None:
+            return ret
+        kind, d = self.get(name)
+        if kind in ('union', 'subtraction', 'intersection'):
+            common = self.commonVolume(d)
+            if kind == 'union':
+                ret = self.volume(d['first']) + self.volume(d['second']) - common
+            elif kind == 'subtraction':
+                ret = self.volume(d['first']) - common
+            else:
+                ret = common
+        elif kind in ('Box', 'TwistedBox'):
+            ret = 8 * d['dx'] * d['dy'] * d['dz']
+        elif kind == 'Tubs':
+            ret = d['dphi'] * (d['rmax']**2 - d['rmin']**2) * d['dz']
+        elif kind == 'Cone':
+            ret = d['dphi'] * d['dz'] / 3 * (d['rmax1']**2 + d['rmax1']*d['rmax2'] + d['rmax2']**2
+                                             - d['rmin1']**2 - d['rmin1']*d['rmin2'] - d['rmin2']**2)
+        elif kind == 'Sphere':
+            ret = (d['dphi'] * (d['rmax']**3 - d['rmin']**3) / 3
+                   * (math.cos(d['stheta']) - math.cos(d['stheta'] + d['dtheta'])))
+        elif kind in ('Trapezoid', 'TwistedTrd'):
+            # the half widths are linear in z
+            x1, x2, y1, y2 = d['dx1'], d['dx2'], d['dy1'], d['dy2']
+            ret = 8 * d['dz'] * (x1*y1 + (x1*(y2-y1) + y1*(x2-x1))/2 + (x2-x1)*(y2-y1)/3)
+        elif kind == 'PolyhedraRegular':
+            n = int(d['numsides'])
+            ret = 2 * d['dz'] * n * (d['rmax']**2 - d['rmin']**2) * math.tan(d['dphi']/(2*n))
+        elif kind == 'EllipticalTube':
+            ret = 2 * math.pi * d['dx'] * d['dy'] * d['dz']
+        elif kind == 'Ellipsoid':
+            c = 2*d['dcz']
+            zlo, zhi = self.ellipsoidCuts(d)
+            ret = 4 * math.pi * d['dax'] * d['dby'] * ((zhi - zlo) - (zhi**3 - zlo**3)/(3*c*c))
+        elif kind == 'Torus':
+            ret = d['deltaphi'] * d['rtor'] * math.pi * (d['rmax']**2 - d['rmin']**2)
+        elif kind == 'Paraboloid':
+            ret = 8 * math.pi * (d['drlo']**2 + d['drhi']**2) * d['ddz']
+        else:
+            raise ValueError('%s: no volume for %s shapes' % (name, kind))
+        self.volumes[key] = ret
+        return ret
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def shapeVolume( geom, shape ):
+    """
+    Return the volume of a shape (or of a shape name) as a Quantity.
+    """
+    if not isinstance(shape, str):
+        shape = shape.name
+    return Q(Solids(geom).volume(shape), 'cm**3')
+
+def subtreeMaterials( geom, lv ):
+    """
+    Return an OrderedDict material -> volume (Quantity) of the logical volume
+    lv (or its name) and of all its daughters, each volume counting its shape
+    minus the shapes of its daughters.  The daughters are supposed not to
+    overlap, nor to stick out of their mother.
+    """
+    if not isinstance(lv, str):
+        lv = lv.name
+    solids = Solids(geom)
+    done = {}
+
+    def integrate( name ):
+        if name in done:
+            return done[name]
+        vol = geom.store.structure[name]
+        total = solids.volume(vol.shape)
+        ret = OrderedDict([(vol.material, total)])
+        for pname in vol.placements:
+            daughter = geom.store.structure[geom.store.structure[pname].volume]
+            ret[vol.material] -= solids.volume(daughter.shape)
+            for mat, v in integrate(daughter.name).items():
+                ret[mat] = ret.get(mat, 0.) + v
+        own = ret[vol.material]
+        if own < -1e-2*total:
+            raise ValueError('%s: the daughters have more volume than the mother, do they overlap?' % name)
+        if own < 1e-9*total:
+            # rounding or Boolean volume estimates, the mother is filled by its daughters
+            ret[vol.material] -= own
+        done[name] = ret
+        return ret
+
+    return OrderedDict((mat, Q(v, 'cm**3')) for mat, v in integrate(lv).items())
+
+def homogeniseSubtree( geom, name, lv ):
+    """
+    Define a Mixture with the mass and the volume of the logical volume lv (or
+    its name) and its daughters, and return its name.
+    """
+    parts = [(mat, vol) for mat, vol in subtreeMaterials(geom, lv).items() if vol.magnitude > 0]
+    return ltools.homogenisedMaterial(geom, name, parts)
+
+def homogeniseBuilt( geom, name, construct ):
+    """
+    Define a Mixture with the mass and the volume of the logical volume
+    returned by construct(scratch), where scratch is a new Geometry with the
+    materials of materialdefinition, and return its name.  Nothing is built
+    when the Mixture is already defined.
+    """
+    if name in geom.store.matter:
+        return name
+    scratch = gegede.construct.Geometry()
+    materials.ensure_materials(scratch)
+    lv = construct(scratch)
+    parts = [(mat, vol) for mat, vol in subtreeMaterials(scratch, lv).items() if vol.magnitude > 0]
+    return ltools.homogenisedMaterial(geom, name, parts)
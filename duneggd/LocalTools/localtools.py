@@ -1,6 +1,20 @@
 from gegede import Quantity as Q
 import math
+import bisect
+import functools
+import weakref
 from platform import python_version
+from duneggd.LocalTools import materialdefinition as materials
+
+# numpy is optional, the array helpers fall back to plain python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# levels of detail of the builders which have one, from the fastest to build
+# and navigate to the most detailed
+lod_levels = ['coarse', 'medium', 'full']
 
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
 def main_lv( slf, geom, shape):
@@ -42,12 +56,34 @@ def addAuxParams( slf, ggd_vol ):
             ggd_vol.params.append((key,slf.AuxParams[key]))
 
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
-def getShapeDimensions( ggd_vol, geom ):
+# getShapeDimensions results per geometry: shape name -> (shape, dimensions,
+# exact), and the homogenise.Solids its bounding boxes come from
+shapeDimensions = weakref.WeakKeyDictionary()
+shapeSolids = weakref.WeakKeyDictionary()
+
+def getShapeDimensions( ggd_vol, geom, bounding=True ):
     """
+    Return the half dimensions [dx, dy, dz] of the shape of a volume: the ones
+    of a Box, Tubs, Sphere, Cone or Trapezoid, and for the other shapes the
+    half sizes of the box around the shape centred on its origin (None if it
+    has none, or without <bounding>).  They are computed once per shape of
+    the geometry.
     """
+    cache = shapeDimensions.get(geom)
+    if cache is None:
+        cache = shapeDimensions[geom] = {}
     ggd_shape = geom.store.shapes.get(ggd_vol.shape)
+    hit = cache.get(ggd_vol.shape)
+    if hit is not None and hit[0] is ggd_shape:
+        return None if hit[1] is None or not (bounding or hit[2]) else list(hit[1])
+    if hit is not None:
+        # the shape was replaced, so may be the parts of the Booleans
+        cache.clear()
+        shapeSolids.pop(geom, None)
+
     shapename = type(ggd_shape).__name__
     ggd_dim = []
+    exact = True
     if "Box" in shapename:
         ggd_dim = [ggd_shape.dx, ggd_shape.dy, ggd_shape.dz]
     elif "Tubs" in shapename:
@@ -61,8 +97,40 @@ def getShapeDimensions( ggd_vol, geom ):
         ggd_dim = [ggd_shape.dx1 if ggd_shape.dx1 >= ggd_shape.dx2 else ggd_shape.dx2,
                     ggd_shape.dy1 if ggd_shape.dy1 >= ggd_shape.dy2 else ggd_shape.dx2, ggd_shape.dz]
     else:
-        ggd_dim = None
-    return ggd_dim
+        ggd_dim = getBoundingDimensions( ggd_vol.shape, geom )
+        exact = False
+    cache[ggd_vol.shape] = (ggd_shape, ggd_dim, exact)
+    return None if ggd_dim is None or not (bounding or exact) else list(ggd_dim)
+
+def getBuilderDimensions( sb, geom ):
+    """
+    Return the half dimensions [dx, dy, dz] of the volume of a sub-builder:
+    the ones of its shape if it is a Box, Tubs, Sphere, Cone or Trapezoid,
+    else its declared halfDimension, else the box around its shape.
+    """
+    sb_lv = sb.get_volume()
+    sb_dim = getShapeDimensions( sb_lv, geom, bounding=False )
+    if sb_dim == None and getattr( sb, 'halfDimension', None ) != None:
+        sb_dim = [sb.halfDimension['dx'],sb.halfDimension['dy'],sb.halfDimension['dz']]
+    if sb_dim == None:
+        sb_dim = getShapeDimensions( sb_lv, geom )
+    assert( sb_dim != None ), " No dimension defined on %s " % sb
+    return sb_dim
+
+def getBoundingDimensions( name, geom ):
+    """
+    Return the half sizes of the box centred on the origin of a shape around
+    it, from homogenise.Solids, or None for the shapes it does not know.
+    """
+    from duneggd.LocalTools import homogenise
+    solids = shapeSolids.get(geom)
+    if solids is None:
+        solids = shapeSolids[geom] = homogenise.Solids( geom )
+    try:
+        lo, hi = solids.boundingBox( name )
+    except (ValueError, KeyError):
+        return None
+    return [ Q(max(-l, h), 'cm') for l, h in zip(lo, hi) ]
 
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
 def getRotation( slf, geom ):
@@ -151,6 +219,44 @@ def getInitialPos( slf, ggd_dim, transpV ):
     else:
         return [-t*(d-begingap) for t,d in zip(transpV,ggd_dim)]
 
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def cmValues( vec ):
+    """
+    Return the magnitudes in cm of a list of lengths, bare numbers are taken as cm.
+    """
+    return [ v.to('cm').magnitude if isinstance(v, Q) else float(v) for v in vec ]
+
+def cmPosition( geom, name, xyz ):
+    """
+    Return a new Position from a position in cm.
+    """
+    return geom.structure.Position( name, Q(xyz[0], 'cm'), Q(xyz[1], 'cm'), Q(xyz[2], 'cm') )
+
+def linearPositions( start, steps, gap ):
+    """
+    Return the positions in cm of elements stacked from start, each one moved
+    by its step (its half dimension on the transportation vector) before it
+    is placed, and by its step and the gap after.  start and gap are [x,y,z]
+    and steps a [x,y,z] per element, all in cm.
+
+    The sums are done in the same order as when stepping through the elements
+    one by one, with numpy in one cumulative sum if it is available.
+    """
+    if numpy is not None and len(steps) > 1:
+        incr = numpy.empty( (3*len(steps)+1, 3) )
+        incr[0] = start
+        incr[1::3] = steps
+        incr[2::3] = steps
+        incr[3::3] = gap
+        return numpy.cumsum( incr, axis=0 )[1::3].tolist()
+    positions = []
+    pos = list(start)
+    for step in steps:
+        pos = [ p+s for p,s in zip(pos,step) ]
+        positions.append( pos )
+        pos = [ p+s+g for p,s,g in zip(pos,step,gap) ]
+    return positions
+
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
 def placeBuilders( slf, geom, main_lv, TranspV ):
     """
@@ -171,15 +277,14 @@ def placeBuilders( slf, geom, main_lv, TranspV ):
     pos = getInitialPos( slf, main_hDim, TranspV )
     # placement n elements
     if slf.NElements > 0:
-        for elem in range(slf.NElements):
-            step = [ t*d for t,d in zip(TranspV, sb_dim) ]
-            pos = [ p+s for p,s in zip(pos,step) ]
-            sb_pos = geom.structure.Position(slf.name+sb_lv.name+str(elem)+'_pos',
-                                                pos[0], pos[1], pos[2])
+        step = [ t*d for t,d in zip(TranspV, cmValues(sb_dim)) ]
+        gap = [ t*InsideGap.to('cm').magnitude for t in TranspV ]
+        positions = linearPositions( cmValues(pos), [step]*slf.NElements, gap )
+        for elem, xyz in enumerate(positions):
+            sb_pos = cmPosition( geom, slf.name+sb_lv.name+str(elem)+'_pos', xyz )
             sb_pla = geom.structure.Placement(slf.name+sb_lv.name+str(elem)+'_pla',
                                                 volume=sb_lv, pos=sb_pos, rot =rotation)
             main_lv.placements.append(sb_pla.name)
-            pos = [p+s+t*InsideGap for p,s,t in zip(pos,step,TranspV)]
     # placement simple element, component or subdetector
     elif slf.NElements == 0:
         sb_pos = geom.structure.Position(slf.name+sb_lv.name+'_pos',
@@ -194,33 +299,30 @@ def placeUserLocationBuilders( slf, geom, main_lv, TranspV ):
     InsideGap = getInsideGap( slf )
     # get the main dimensions
     main_hDim = getShapeDimensions( main_lv, geom )
+    main_hDim = cmValues( main_hDim )
     # initial position, based on the dimension projected on transportation vector
     pos = [-t*(d) for t,d in zip(TranspV,main_hDim)]
+    gap = [ t*InsideGap.to('cm').magnitude for t in TranspV ]
     # get builders
     builders = slf.get_builders()
     places = slf.UserPlace
 
+    volumes, steps, offsets = [], [], []
     for i,sb in enumerate(builders):
         sb_lv = sb.get_volume()
-        sb_dim = getShapeDimensions( sb_lv, geom )
-        if sb_dim == None:
-            assert( sb.halfDimension != None ), " No dimension defined on %s " % sb
-            sb_dim = [sb.halfDimension['dx'],sb.halfDimension['dy'],sb.halfDimension['dz']]
-        step = [ t*d for t,d in zip(TranspV, sb_dim) ]
-        pos = [ p+s for p,s in zip(pos,step) ]
-
-        step2 = [ -t*d for t,d in zip(places[i], sb_dim) ]
-        pos2 = [ t*(d)+s for t,d,s in zip(places[i],main_hDim, step2)]
-
-        pos = [p+p2 for p, p2 in zip(pos, pos2)] #+
-
-        sb_pos = geom.structure.Position(slf.name+sb_lv.name+'_pos', pos[0], pos[1], pos[2])
+        sb_dim = cmValues( getBuilderDimensions( sb, geom ) )
+        volumes.append( sb_lv )
+        steps.append( [ t*d for t,d in zip(TranspV, sb_dim) ] )
+        # the user location of the element inside the main volume
+        offsets.append( [ t*(d)-t*s for t,d,s in zip(places[i],main_hDim, sb_dim)] )
+
+    positions = linearPositions( pos, steps, gap )
+    for sb_lv, xyz, off in zip(volumes, positions, offsets):
+        xyz = [p+p2 for p, p2 in zip(xyz, off)]
+        sb_pos = cmPosition( geom, slf.name+sb_lv.name+'_pos', xyz )
         sb_pla = geom.structure.Placement(slf.name+sb_lv.name+'_pla', volume=sb_lv, pos=sb_pos )
         main_lv.placements.append(sb_pla.name)
 
-        pos = [p-p2 for p, p2 in zip(pos, pos2)] #-
-        pos = [p+s+t*InsideGap for p,s,t in zip(pos,step,TranspV)]
-
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
 def placeComplexBuilders( slf, geom, main_lv, TranspV ):
     """
@@ -237,19 +339,19 @@ def placeComplexBuilders( slf, geom, main_lv, TranspV ):
     # get builders
     builders = slf.get_builders()
 
+    # get the sub-builders and their dimensions
+    volumes = [ sb.get_volume() for sb in builders ]
+    steps = [ [ t*d for t,d in zip(TranspV, cmValues(getShapeDimensions( sb_lv, geom ))) ]
+                for sb_lv in volumes ]
+    gap = [ t*InsideGap.to('cm').magnitude for t in TranspV ]
+    positions = linearPositions( cmValues(pos), steps*slf.NElements, gap )
+
     for elem in range(slf.NElements):
-        for i,sb in enumerate(builders):
-            # get the sub-builders and its dimensions
-            sb_lv = sb.get_volume()
-            sb_dim = getShapeDimensions( sb_lv, geom )
-            step = [ t*d for t,d in zip(TranspV, sb_dim) ]
-            pos = [ p+s for p,s in zip(pos,step) ]
-            sb_pos = geom.structure.Position(slf.name+sb_lv.name+str(elem)+'_pos',
-                                                pos[0], pos[1], pos[2])
+        for i,sb_lv in enumerate(volumes):
+            sb_pos = cmPosition( geom, slf.name+sb_lv.name+str(elem)+'_pos', positions[elem*len(volumes)+i] )
             sb_pla = geom.structure.Placement(slf.name+sb_lv.name+str(elem)+'_pla',
                                                 volume=sb_lv, pos=sb_pos, rot =rotation)
             main_lv.placements.append(sb_pla.name)
-            pos = [p+s+t*InsideGap for p,s,t in zip(pos,step,TranspV)]
 
 #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
 def placeSurroundBuilders( main_lv, sb_cent, sb_surr, gap, geom ):
@@ -297,14 +399,14 @@ def placeSurroundBuilders( main_lv, sb_cent, sb_surr, gap, geom ):
 def placeCrossBuilders( main_lv, sb_cent, sb_top, sb_side, slf, geom ):
     """
     """
-    Gap = getInsideGap( slf )
+    Gap = getInsideGap( slf ).to('cm').magnitude
     TranspP = getTranspP( slf )
     sb_cent_lv = sb_cent.get_volume()
-    sb_cent_dim = getShapeDimensions( sb_cent_lv, geom )
+    sb_cent_dim = cmValues( getShapeDimensions( sb_cent_lv, geom ) )
     sb_top_lv = sb_top.get_volume()
-    sb_top_dim = getShapeDimensions( sb_top_lv, geom )
+    sb_top_dim = cmValues( getShapeDimensions( sb_top_lv, geom ) )
     sb_side_lv = sb_side.get_volume()
-    sb_side_dim = getShapeDimensions( sb_side_lv, geom )
+    sb_side_dim = cmValues( getShapeDimensions( sb_side_lv, geom ) )
 
     sb_cent_pos = geom.structure.Position( main_lv.name+sb_cent_lv.name+'_pos', Q("0m"), Q("0m"), Q("0m") )
     sb_cent_pla = geom.structure.Placement( main_lv.name+sb_cent_lv.name+'_pla', volume=sb_cent_lv, pos=sb_cent_pos )
@@ -313,10 +415,10 @@ def placeCrossBuilders( main_lv, sb_cent, sb_top, sb_side, slf, geom ):
     rotTop, rotBottom, rotLeft, rotRight = getCrossRotations( slf, geom )
 
     # Top
-    pzero = [ Q('0m'), Q('0m'), Q('0m') ]
+    pzero = [ 0., 0., 0. ]
     pos = [pz+transp*(cen+top+Gap) for pz,transp,cen,top in zip(pzero,TranspP['top'],sb_cent_dim,sb_top_dim)]
     #pos = [ Q('0m'), sb_cent_dim[1] + sb_top_dim[1] + gap, Q('0m') ]
-    sb_top_pos = geom.structure.Position( main_lv.name+sb_top_lv.name+'_top_pos', pos[0], pos[1], pos[2] )
+    sb_top_pos = cmPosition( geom, main_lv.name+sb_top_lv.name+'_top_pos', pos )
     sb_top_pla = geom.structure.Placement( main_lv.name+sb_top_lv.name+'_top_pla', volume=sb_top_lv,
                                                 pos=sb_top_pos, rot=rotTop )
     main_lv.placements.append( sb_top_pla.name )
@@ -324,7 +426,7 @@ def placeCrossBuilders( main_lv, sb_cent, sb_top, sb_side, slf, geom ):
     # Left
     pos = [pz+transp*(cen+side+Gap) for pz,transp,cen,side in zip(pzero,TranspP['side'],sb_cent_dim,sb_side_dim)]
     #pos = [ sb_cent_dim[0] + sb_side_dim[1] + gap, Q('0m'), Q('0m') ]
-    sb_side_pos = geom.structure.Position( main_lv.name+sb_side_lv.name+'_left_pos', pos[0], pos[1], pos[2] )
+    sb_side_pos = cmPosition( geom, main_lv.name+sb_side_lv.name+'_left_pos', pos )
     sb_side_pla = geom.structure.Placement( main_lv.name+sb_side_lv.name+'_left_pla', volume=sb_side_lv,
                                                 pos=sb_side_pos, rot=rotLeft )
     main_lv.placements.append( sb_side_pla.name )
@@ -332,7 +434,7 @@ def placeCrossBuilders( main_lv, sb_cent, sb_top, sb_side, slf, geom ):
     # Bottom
     pos = [pz-transp*(cen+top+Gap) for pz,transp,cen,top in zip(pzero,TranspP['top'],sb_cent_dim,sb_top_dim)]
     #pos = [ Q('0m'), -sb_cent_dim[1] - sb_top_dim[1] - gap, Q('0m') ]
-    sb_top_pos = geom.structure.Position( main_lv.name+sb_top_lv.name+'_bottom_pos', pos[0], pos[1], pos[2] )
+    sb_top_pos = cmPosition( geom, main_lv.name+sb_top_lv.name+'_bottom_pos', pos )
     sb_top_pla = geom.structure.Placement( main_lv.name+sb_top_lv.name+'_bottom_pla', volume=sb_top_lv,
                                                 pos=sb_top_pos, rot=rotBottom )
     main_lv.placements.append( sb_top_pla.name )
@@ -340,7 +442,7 @@ def placeCrossBuilders( main_lv, sb_cent, sb_top, sb_side, slf, geom ):
     #Right
     pos = [pz-transp*(cen+side+Gap) for pz,transp,cen,side in zip(pzero,TranspP['side'],sb_cent_dim,sb_side_dim)]
     #pos = [ -sb_cent_dim[0] - sb_side_dim[1] - gap, Q('0m'), Q('0m') ]
-    sb_side_pos = geom.structure.Position( main_lv.name+sb_side_lv.name+'_right_pos', pos[0], pos[1], pos[2] )
+    sb_side_pos = cmPosition( geom, main_lv.name+sb_side_lv.name+'_right_pos', pos )
     sb_side_pla = geom.structure.Placement( main_lv.name+sb_side_lv.name+'_right_pla', volume=sb_side_lv,
                                                 pos=sb_side_pos, rot=rotRight )
     main_lv.placements.append( sb_side_pla.name )
@@ -353,24 +455,26 @@ def placeBooleanBuilders( slf, geom, main_lv, TranspV ):
     main_hDim = getShapeDimensions( main_lv, geom )
     # get shape of main_lv in case of boolean shapes
     sb_boolean_shape = geom.store.shapes.get(main_lv.shape)
+    main_hDim = cmValues( main_hDim )
     # initial position, based on the dimension projected on transportation vector
     pos = [-t*(d) for t,d in zip(TranspV,main_hDim)]
+    gap = [ t*InsideGap.to('cm').magnitude for t in TranspV ]
     # get builders
     builders = slf.get_builders()
     places = slf.UserPlace
 
-    for i,sb in enumerate(builders):
-        sb_lv = sb.get_volume()
+    dims = []
+    for sb in builders:
         dim_dict = sb.halfDimension
-        sb_dim = [ dim_dict['dx'], dim_dict['dy'], dim_dict['dz'] ]
-        step = [ t*d for t,d in zip(TranspV, sb_dim) ]
-        pos = [ p+s for p,s in zip(pos,step) ]
+        dims.append( cmValues([ dim_dict['dx'], dim_dict['dy'], dim_dict['dz'] ]) )
+    positions = linearPositions( pos, [ [ t*d for t,d in zip(TranspV, sb_dim) ] for sb_dim in dims ], gap )
 
-        step2 = [ -t*d for t,d in zip(places[i], sb_dim) ]
-        pos2 = [ t*(d)+s for t,d,s in zip(places[i],main_hDim, step2)]
-
-        pos = [p+p2 for p, p2 in zip(pos, pos2)] #+
-        sb_pos = geom.structure.Position(slf.name+sb_lv.name+'_pos', pos[0], pos[1], pos[2])
+    for i,sb in enumerate(builders):
+        sb_lv = sb.get_volume()
+        # the user location of the element inside the main volume
+        pos2 = [ t*(d)-t*s for t,d,s in zip(places[i],main_hDim, dims[i])]
+        pos = [p+p2 for p, p2 in zip(positions[i], pos2)]
+        sb_pos = cmPosition( geom, slf.name+sb_lv.name+'_pos', pos )
 
         sb_shape = geom.store.shapes.get(sb_lv.shape)
         if i == 0 and slf.Boolean == "union":
@@ -381,9 +485,6 @@ def placeBooleanBuilders( slf, geom, main_lv, TranspV ):
         sb_boolean_shape = geom.shapes.Boolean( slf.name+'_bool_'+str(i), type=operation,
                                             first=sb_boolean_shape, second=sb_shape, pos=sb_pos)
 
-        pos = [p-p2 for p, p2 in zip(pos, pos2)] #-
-        pos = [p+s+t*InsideGap for p,s,t in zip(pos,step,TranspV)]
-
     sb_boolean_lv = geom.structure.Volume('vol'+sb_boolean_shape.name, material=slf.Material,
                                         shape=sb_boolean_shape)
 
@@ -397,7 +498,7 @@ def rotation( axis, theta, vec ):
     """
     Return the vector rotated, the rotation matrix is called inside.
     """
-    Matrix = rotation_matrix( axis, theta)
+    Matrix = cachedRotationMatrix( tuple(axis), theta )
     rot_vec = [0,0,0]
     rot_vec[0] = Matrix[0][0]*vec[0] + Matrix[0][1]*vec[1] + Matrix[0][2]*vec[2]
     rot_vec[1] = Matrix[1][0]*vec[0] + Matrix[1][1]*vec[1] + Matrix[1][2]*vec[2]
@@ -410,6 +511,14 @@ def rotation_matrix( axis, theta ):
     Return the rotation matrix associated with counterclockwise rotation about
     the given axis by theta degrees. (https://en.wikipedia.org/wiki/Euler-Rodrigues_formula)
     """
+    return [ list(row) for row in cachedRotationMatrix( tuple(axis), theta ) ]
+
+@functools.lru_cache(maxsize=4096)
+def cachedRotationMatrix( axis, theta ):
+    """
+    Return rotation_matrix(axis, theta) as a tuple of rows, computed once per
+    (axis, theta), axis being a tuple.
+    """
     theta_rad = math.radians(theta)
     a = math.cos(theta_rad/2.0)
     b = -1*math.sin(theta_rad/2.0)*axis[0]
@@ -417,5 +526,225 @@ def rotation_matrix( axis, theta ):
     d = -1*math.sin(theta_rad/2.0)*axis[2]
     aa, bb, cc, dd = a*a, b*b, c*c, d*d
     bc, ad, ac, ab, bd, cd = b*c, a*d, a*c, a*b, b*d, c*d
-    return [[aa+bb-cc-dd, 2*(bc+ad), 2*(bd-ac)], [2*(bc-ad), aa+cc-bb-dd, 2*(cd+ab)],
-                [2*(bd+ac), 2*(cd-ab), aa+dd-bb-cc]]
+    return ((aa+bb-cc-dd, 2*(bc+ad), 2*(bd-ac)), (2*(bc-ad), aa+cc-bb-dd, 2*(cd+ab)),
+                (2*(bd+ac), 2*(cd-ab), aa+dd-bb-cc))
+
+def rotationChain( rotations ):
+    """
+    Return the matrix of the rotations [(axis, theta), ...] applied one after
+    the other, the first one first.
+    """
+    Matrix = ((1.,0.,0.), (0.,1.,0.), (0.,0.,1.))
+    for axis, theta in rotations:
+        R = cachedRotationMatrix( tuple(axis), theta )
+        Matrix = tuple( tuple( sum(R[i][k]*Matrix[k][j] for k in range(3)) for j in range(3) )
+                        for i in range(3) )
+    return Matrix
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def rotate_many( axis, angles, vectors, chain=() ):
+    """
+    Return the vectors rotated about axis by angles (in degrees, numbers or
+    Quantities), and then by the rotations of chain, [(axis, theta), ...],
+    as rotation() does one by one.  vectors is one vector for all the angles
+    or one vector per angle, of lengths or numbers; the results are in the
+    unit of the first component of the first vector.
+
+    With numpy all the rotations are applied in one go, the matrices are the
+    cached ones of rotation_matrix so the results are the same.
+    """
+    angles = [ a.to('degree').magnitude if isinstance(a, Q) else a for a in angles ]
+    if len(vectors) and not isinstance(vectors[0], (list, tuple)):
+        vectors = [vectors]*len(angles)
+    unit = vectors[0][0].units if len(vectors) and isinstance(vectors[0][0], Q) else None
+    # the components are converted to the unit after the first rotation, as
+    # the sums of Quantities of rotation() do
+    factors = [1., 1., 1.]
+    if unit is not None:
+        factors = [ Q(1, v.units).to(unit).magnitude for v in vectors[0] ]
+        vectors = [ [ v.to(u.units).magnitude for v, u in zip(vec, vectors[0]) ] for vec in vectors ]
+    chain = [ (tuple(ax), th.to('degree').magnitude if isinstance(th, Q) else th) for ax, th in chain ]
+    steps = [ [ cachedRotationMatrix( tuple(axis), a ) for a in angles ] ]
+    steps += [ [ cachedRotationMatrix( ax, th ) ]*len(angles) for ax, th in chain ]
+
+    if numpy is not None:
+        vec = numpy.array( vectors, dtype=float ).reshape(-1, 3).T
+        f = factors
+        for matrices in steps:
+            M = numpy.array( matrices ).reshape(-1, 3, 3)
+            vec = numpy.array([ M[:,i,0]*vec[0]*f[0] + M[:,i,1]*vec[1]*f[1] + M[:,i,2]*vec[2]*f[2]
+                                for i in range(3) ])
+            f = [1., 1., 1.]
+        rotated = vec.T.tolist()
+    else:
+        rotated = [ list(v) for v in vectors ]
+        f = factors
+        for matrices in steps:
+            rotated = [ [ M[i][0]*v[0]*f[0] + M[i][1]*v[1]*f[1] + M[i][2]*v[2]*f[2] for i in range(3) ]
+                        for M, v in zip(matrices, rotated) ]
+            f = [1., 1., 1.]
+    if unit is None:
+        return rotated
+    return [ [ Q(x, unit) for x in v ] for v in rotated ]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def placeGrid( geom, main_lv, lv, origin, pitch, counts, name=None, suffix='', rot=None, copynumber=True ):
+    """
+    Place counts=[nx,ny,nz] copies of lv in main_lv, the copy (i,j,k) at
+    origin + [i,j,k]*pitch, all with the Rotation rot if any, and return the
+    names of the placements.
+
+    The Positions and Placements are called name+'_pos_'+index+suffix and
+    name+'_pla_'+index+suffix, name being lv.name by default and index the
+    indices of the axes with more than one copy joined by '.'.  copynumber
+    is True for i+nx*(j+ny*k), False for none, or a function of (i,j,k).
+    The copies are placed with i as the outer loop and k as the inner one.
+    """
+    name = name or lv.name
+    origin, pitch = cmValues(origin), cmValues(pitch)
+    indices = [ (i,j,k) for i in range(counts[0]) for j in range(counts[1]) for k in range(counts[2]) ]
+    if numpy is not None:
+        positions = ( numpy.array(origin) + numpy.array(indices, dtype=float).reshape(-1, 3)*numpy.array(pitch) ).tolist()
+    else:
+        positions = [ [ o+n*p for o,n,p in zip(origin, idx, pitch) ] for idx in indices ]
+    axes = [ a for a in range(3) if counts[a] > 1 ] or [0]
+    placements = []
+    for idx, xyz in zip(indices, positions):
+        index = '.'.join( str(idx[a]) for a in axes ) + suffix
+        kwds = {}
+        if rot is not None:
+            kwds['rot'] = rot
+        if copynumber is True:
+            kwds['copynumber'] = idx[0] + counts[0]*(idx[1] + counts[1]*idx[2])
+        elif copynumber:
+            kwds['copynumber'] = copynumber(*idx)
+        pos = cmPosition( geom, name+'_pos_'+index, xyz )
+        pla = geom.structure.Placement( name+'_pla_'+index, volume=lv, pos=pos, **kwds )
+        main_lv.placements.append( pla.name )
+        placements.append( pla.name )
+    return placements
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def placeRing( geom, main_lv, lv, radius, n, axis=(0,0,1), phase=0, chain=(), rot=None, radial=True,
+                name=None, copynumber=True ):
+    """
+    Place n copies of lv in main_lv on a ring about axis, the x, y or z axis
+    of main_lv, and return the names of the placements.  The copy k is at
+    radius rotated by phase+k*360/n degrees about axis, and then by the
+    rotations of chain as in rotate_many.  radius is a position, or a length
+    along the next axis (y for a ring about x, z about y, x about z).
+
+    rot is the rotation [x,y,z] of the copies, none by default.  If radial
+    they turn with the ring: their angle is taken off the angle of rot about
+    axis, as GDML rotations are those of the frame.  The Positions, Rotations
+    and Placements are called name+'_pos_'+k, '_rot_' and '_pla_', name being
+    lv.name by default.  copynumber is True for k, False for none, or a
+    function of k.
+    """
+    name = name or lv.name
+    a = list(axis).index(1)
+    if not isinstance(radius, (list, tuple)):
+        radius = [ radius if c == (a+1)%3 else 0*radius for c in range(3) ]
+    phase = phase.to('degree').magnitude if isinstance(phase, Q) else phase
+    angles = [ phase + k*(360/n) for k in range(n) ]
+    positions = rotate_many( axis, angles, radius, chain=chain )
+    if radial and rot is None:
+        rot = [Q('0deg'), Q('0deg'), Q('0deg')]
+    placements = []
+    for k, pos in enumerate(positions):
+        pos = geom.structure.Position( name+'_pos_'+str(k), pos[0], pos[1], pos[2] )
+        kwds = {}
+        if rot is not None:
+            angle = [ Q(r) for r in rot ]
+            if radial:
+                angle[a] = angle[a] - angles[k]*Q('1deg')
+            kwds['rot'] = geom.structure.Rotation( name+'_rot_'+str(k), angle[0], angle[1], angle[2] )
+        if copynumber is True:
+            kwds['copynumber'] = k
+        elif copynumber:
+            kwds['copynumber'] = copynumber(k)
+        pla = geom.structure.Placement( name+'_pla_'+str(k), volume=lv, pos=pos, **kwds )
+        main_lv.placements.append( pla.name )
+        placements.append( pla.name )
+    return placements
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def checkLOD( slf, lod ):
+    """
+    Return the level of detail of the builder, one of lod_levels.
+    """
+    if lod not in lod_levels:
+        raise ValueError('%s: unknown level of detail "%s", use one of %s' % (slf.name, lod, ', '.join(lod_levels)))
+    return lod
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def homogenisedMaterial( geom, name, parts ):
+    """
+    Define a Mixture with the mass and the volume of the parts, a list of
+    (material, volume), and return its name.  It is defined only once per name.
+    """
+    materials.ensure_materials( geom )
+    if name in geom.store.matter:
+        return name
+
+    masses = []
+    tot_mass, tot_volume = Q('0g'), Q('0cm**3')
+    for mat, volume in parts:
+        mass = geom.store.matter[mat].density * volume
+        masses.append( (mat, mass) )
+        tot_mass += mass
+        tot_volume += volume
+
+    fractions = {}
+    for mat, mass in masses:
+        fractions[mat] = fractions.get(mat, 0.0) + (mass/tot_mass).to('').magnitude
+    components = tuple( (mat, fractions.pop(mat)) for mat, mass in masses if mat in fractions )
+    density = (tot_mass/tot_volume).to('g/cm**3').magnitude
+    geom.matter.Mixture( name, density = "%.9g*g/cc" % density, components = components )
+    return name
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+@functools.lru_cache(maxsize=None)
+def polygonProfile( apothem, nsides ):
+    """
+    Return the half height profile of a regular polygon of nsides sides with
+    a flat side on top at apothem (in cm): the distances from the centre
+    where its sides start, the half heights there and the slopes of the
+    sides, over a quarter of the polygon, and where the last side ends.
+    """
+    theta = 2*math.pi/nsides
+    d = apothem*math.tan(theta/2)
+    starts, heights, slopes = [0.], [apothem], [0.]
+    end = d
+    for i in range(1, nsides//4):
+        starts.append(end)
+        heights.append(heights[-1] - (2*d*math.sin((i-1)*theta) if i > 1 else 0.))
+        slopes.append(math.tan(i*theta))
+        end += 2*d*math.cos(i*theta)
+    return tuple(starts), tuple(heights), tuple(slopes), end
+
+def polygonHalfHeight( apothem, nsides, dis2c ):
+    """
+    Return the half height of a regular polygon of nsides sides with a flat
+    side on top at apothem, at the distance dis2c from its centre, as the
+    KLOE 24-gon seen by the STT modules.  dis2c can be one Quantity, or a
+    list or array of distances to get them all at once (as an array
+    Quantity).  Beyond the last side before the vertical one it is nan.
+    """
+    starts, heights, slopes, end = polygonProfile( apothem.to('cm').magnitude, int(nsides) )
+    if isinstance(dis2c, (list, tuple)):
+        x = [abs(Q(v).to('cm').magnitude) for v in dis2c]
+    else:
+        x = abs(Q(dis2c).to('cm').magnitude)
+    if numpy is not None:
+        x = numpy.asarray(x, dtype=float)
+        i = numpy.searchsorted(starts, x, side='right') - 1
+        h = numpy.take(heights, i) - (x - numpy.take(starts, i))*numpy.take(slopes, i)
+        h = numpy.where(x < end, h, numpy.nan)
+        return Q(float(h) if h.ndim == 0 else h, 'cm')
+    def one( v ):
+        i = bisect.bisect_right(starts, v) - 1
+        return heights[i] - (v - starts[i])*slopes[i] if v < end else float('nan')
+    if isinstance(x, list):
+        return Q([one(v) for v in x], 'cm')
+    return Q(one(x), 'cm')
@@ -650,3 +650,12 @@ def define_materials( g ):
 
     # SiPM plastic spacer
     # Using PVT
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def ensure_materials( g ):
+    """
+    Define the materials unless they are already in the store, e.g. because a
+    builder needed them before the World builder.
+    """
+    if "hydrogen" not in g.store.matter:
+        define_materials( g )
@@ -0,0 +1,269 @@
+'''
+TPC and module ID maps of the ArgonCube module arrays.
+
+The analyses of edep-sim hits need, for every TPC, its module and half detector
+copy numbers, the bounds of its active volume, the centre of its pixel plane
+and its drift direction (ArgonCube/TPCActive.py).  The builders record what
+they know of it: HalfDetector the volume whose copy number numbers the TPCs of
+a module and its TPC volume, TPCPlane the face the pixels are on, and the
+arrays of modules (Detector for the 2x2, ModuleArray for ND-LAr) walk their
+subtree once built for the map in their own frame:
+
+    self.TPCMap = tpcmap.arrayMap(geom, self, main_lv, placements, indices, self.Module_builder.halfDimension)
+
+The map is kept in the builder, so that it comes with the subtree from a
+SubtreeCache.  worldMaps() puts the maps of all the arrays of a geometry in the
+frame of its world, which build.generate() writes next to the output as
+<output>.tpcmap.json.  The lengths are in mm, as edep-sim, and a TPC is
+numbered 2*module+halfdetector.
+
+The map of a GDML file built without it is made from its volumes with:
+
+    python -m duneggd.LocalTools.tpcmap ArgonCube/Detector_2x2.gdml
+'''
+
+import argparse
+import json
+
+from duneggd.LocalTools import homogenise
+
+version = 1
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+# A frame (M, c) takes the points q of a volume to M*q+c in an ancestor
+identity = (((1.,0.,0.), (0.,1.,0.), (0.,0.,1.)), (0.,0.,0.))
+
+def mm( q ):
+    return q.to('mm').magnitude
+
+def apply( frame, q ):
+    M, c = frame
+    return [sum(M[i][j]*q[j] for j in range(3)) + c[i] for i in range(3)]
+
+def turn( frame, u ):
+    """ a direction, rather than a point """
+    M = frame[0]
+    return [sum(M[i][j]*u[j] for j in range(3)) for i in range(3)]
+
+def compose( frame, M2, c2 ):
+    """ the frame of a daughter placed by (M2, c2) in the volume of frame """
+    M, c = frame
+    MM = tuple(tuple(sum(M[i][k]*M2[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+    return MM, tuple(apply(frame, c2))
+
+def placementFrame( geom, pla ):
+    """ (M, c) of a placement in its mother, in mm """
+    structure = geom.store.structure
+    R = homogenise.rotationMatrix(structure[pla.rot] if pla.rot is not None else None)
+    c = (0., 0., 0.)
+    if pla.pos is not None:
+        pos = structure[pla.pos]
+        c = (mm(pos.x), mm(pos.y), mm(pos.z))
+    # the point p of the mother is R*(p-t) in the daughter
+    return tuple(zip(*R)), c
+
+def rounded( v ):
+    return [round(x, 6) + 0. for x in v]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def roles( builder ):
+    """
+    Merge the TPCMapRoles the builders under builder recorded.
+    """
+    ret = {}
+    todo = [builder]
+    while todo:
+        b = todo.pop()
+        ret.update(getattr(b, 'TPCMapRoles', {}))
+        todo += b.builders.values()
+    return ret
+
+def findTPCs( geom, lv, frame, role, found, halfdetector=None ):
+    """
+    Append to found (halfdetector copy, frame of the TPC) of the TPCs under lv.
+    """
+    structure = geom.store.structure
+    for pname in structure[lv].placements:
+        pla = structure[pname]
+        M, c = placementFrame(geom, pla)
+        sub = compose(frame, M, c)
+        if pla.volume == role['halfdetector']:
+            findTPCs(geom, pla.volume, sub, role, found, pla.copynumber)
+        elif pla.volume == role['tpc']:
+            found.append((halfdetector, sub))
+        else:
+            findTPCs(geom, pla.volume, sub, role, found, halfdetector)
+
+def tpcParts( geom, role ):
+    """
+    The active volume and the pixel plane in the frame of the TPC volume:
+    (lo, hi) of the active box, and the centre and normal of the pixel face.
+    """
+    structure = geom.store.structure
+    active = anode = None
+    for pname in structure[role['tpc']].placements:
+        pla = structure[pname]
+        vol = structure[pla.volume]
+        if pla.volume == role['anode']:
+            M, c = placementFrame(geom, pla)
+            shape = geom.store.shapes[vol.shape]
+            face = [v*mm(shape.dx) for v in role['normal']]
+            anode = apply((M, c), face), turn((M, c), role['normal'])
+        elif any(k == 'SensDet' for k, v in vol.params or []):
+            M, c = placementFrame(geom, pla)
+            shape = geom.store.shapes[vol.shape]
+            h = (mm(shape.dx), mm(shape.dy), mm(shape.dz))
+            corners = [apply((M, c), p) for p in homogenise.corners([-v for v in h], h)]
+            active = [min(p[i] for p in corners) for i in range(3)], [max(p[i] for p in corners) for i in range(3)]
+    if active is None or anode is None:
+        raise ValueError('%s has no active volume or pixel plane' % role['tpc'])
+    return active, anode
+
+def arrayMap( geom, builder, main_lv, placements, indices, module_hDim ):
+    """
+    The map of the TPCs of an array of modules in its frame: the module
+    placements of main_lv and their (i, k) indices along x and z in the
+    array, and the half dimensions of the modules.  None if the modules
+    have no TPCs.
+    """
+    role = roles(builder)
+    if any(k not in role for k in ('halfdetector', 'tpc', 'anode', 'normal')):
+        return None
+    return roleMap(geom, role, main_lv.name, placements, indices,
+                   [2*mm(module_hDim[d]) for d in ('dx', 'dy', 'dz')])
+
+def roleMap( geom, role, volume, placements, indices, module_dimension ):
+    """ arrayMap() with the roles given, and the module dimensions in mm """
+    (alo, ahi), (face, normal) = tpcParts(geom, role)
+
+    structure = geom.store.structure
+    modules, tpcs = [], []
+    for pname, index in zip(placements, indices):
+        pla = structure[pname]
+        M, c = placementFrame(geom, pla)
+        frame = compose(identity, M, c)
+        modules.append(dict(copy=pla.copynumber, index=list(index), center=rounded(c)))
+        found = []
+        findTPCs(geom, pla.volume, frame, role, found)
+        for halfdetector, tframe in found:
+            corners = [apply(tframe, p) for p in homogenise.corners(alo, ahi)]
+            lo = [min(p[i] for p in corners) for i in range(3)]
+            hi = [max(p[i] for p in corners) for i in range(3)]
+            # the electrons drift towards the pixels, against the normal of their face
+            tpcs.append(dict(id=2*pla.copynumber + halfdetector, module=pla.copynumber, halfdetector=halfdetector,
+                             active_min=rounded(lo), active_max=rounded(hi),
+                             active_center=rounded([(a+b)/2 for a, b in zip(lo, hi)]),
+                             pixel_plane_center=rounded(apply(tframe, face)),
+                             drift_direction=rounded([-v for v in turn(tframe, normal)])))
+    tpcs.sort(key=lambda t: t['id'])
+    return dict(volume=volume,
+                n_module=[max(i for i, k in indices)+1, max(k for i, k in indices)+1],
+                module_dimension=list(module_dimension),
+                module_pitch=[module_dimension[0], module_dimension[2]],
+                modules=modules, tpcs=tpcs)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def arrayMaps( builder ):
+    """ the TPCMaps of the arrays under a builder """
+    ret = []
+    todo = [builder]
+    while todo:
+        b = todo.pop()
+        if getattr(b, 'TPCMap', None):
+            ret.append(b.TPCMap)
+        todo += b.builders.values()
+    return ret
+
+def worldFrames( geom, volume ):
+    """ the frames in the world of every placement of a volume """
+    structure = geom.store.structure
+    holds = {volume: True}
+    def holding( lv ):
+        if lv not in holds:
+            holds[lv] = any(holding(structure[p].volume) for p in structure[lv].placements or [])
+        return holds[lv]
+
+    ret = []
+    todo = [(geom.world, identity)]
+    while todo:
+        lv, frame = todo.pop()
+        if lv == volume:
+            ret.append(frame)
+            continue
+        for pname in structure[lv].placements or []:
+            pla = structure[pname]
+            if not holding(pla.volume):
+                continue
+            M, c = placementFrame(geom, pla)
+            todo.append((pla.volume, compose(frame, M, c)))
+    return ret
+
+def inWorld( amap, frame ):
+    """ an array map in the world frame, with the frame (M, c) of the array """
+    ret = dict(amap, rotation=[list(r) for r in frame[0]], translation=rounded(frame[1]))
+    ret['modules'] = [dict(m, center=rounded(apply(frame, m['center']))) for m in amap['modules']]
+    tpcs = []
+    for t in amap['tpcs']:
+        corners = [apply(frame, p) for p in homogenise.corners(t['active_min'], t['active_max'])]
+        tpcs.append(dict(t, active_min=rounded([min(p[i] for p in corners) for i in range(3)]),
+                         active_max=rounded([max(p[i] for p in corners) for i in range(3)]),
+                         active_center=rounded(apply(frame, t['active_center'])),
+                         pixel_plane_center=rounded(apply(frame, t['pixel_plane_center'])),
+                         drift_direction=rounded(turn(frame, t['drift_direction']))))
+    ret['tpcs'] = tpcs
+    return ret
+
+def worldMaps( geom, builder ):
+    """
+    The maps of the arrays under the world builder, in the frame of the
+    world, one per placement of an array; None without arrays.
+    """
+    maps = arrayMaps(builder)
+    if not maps:
+        return None
+    arrays = []
+    for amap in maps:
+        for frame in worldFrames(geom, amap['volume']):
+            arrays.append(inWorld(amap, frame))
+    return dict(version=version, world=geom.world, unit='mm', arrays=arrays)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+# the names of the volumes in the ArgonCube builders
+gdmlRoles = {'halfdetector': 'volHalfDetector', 'tpc': 'volTPC', 'anode': 'volTPCPlane', 'normal': [1, 0, 0]}
+
+def gdmlMaps( filename, array='volDetector', module='volModule', role=gdmlRoles ):
+    """
+    The maps of a GDML file built before the builders kept them, e.g. the
+    committed ArgonCube/Detector_2x2.gdml: the modules of the array volume
+    are indexed along x and z by their positions.
+    """
+    from duneggd import gdmlfile
+    geom = gdmlfile.load(filename)
+    structure = geom.store.structure
+    placements = [p for p in structure[array].placements if structure[p].volume == module]
+    centers = [placementFrame(geom, structure[p])[1] for p in placements]
+    xs = sorted(set(round(c[0], 3) for c in centers))
+    zs = sorted(set(round(c[2], 3) for c in centers))
+    indices = [(xs.index(round(c[0], 3)), zs.index(round(c[2], 3))) for c in centers]
+    shape = geom.store.shapes[structure[module].shape]
+    amap = roleMap(geom, role, array, placements, indices, [2*mm(shape.dx), 2*mm(shape.dy), 2*mm(shape.dz)])
+    arrays = [inWorld(amap, frame) for frame in worldFrames(geom, array)]
+    return dict(version=version, world=geom.world, unit='mm', arrays=arrays)
+
+def write( maps, filename ):
+    with open(filename, 'w') as f:
+        json.dump(maps, f, indent=1)
+        f.write('\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the TPC map of a GDML file of ArgonCube modules')
+    parser.add_argument('gdml', help='GDML file, compressed or not')
+    parser.add_argument('-o', '--output', default=None, help='Output json, default is <gdml>.tpcmap.json')
+    parser.add_argument('--array', default='volDetector', help='Volume of the array of modules')
+    parser.add_argument('--module', default='volModule', help='Volume of the modules')
+    args = parser.parse_args()
+    write(gdmlMaps(args.gdml, args.array, args.module), args.output or args.gdml+'.tpcmap.json')
+
+
+if '__main__' == __name__:
+    main()
@@ -63,6 +63,7 @@ class KLOE3DST_STT_builder(gegede.builder.Builder):
     def construct(self,geom):
         #  liqAR STXXYY STXXYY ||||| 3+ 1+ 12 + 1 + 12 + 1 + 12 + 1 + 12+ 1 + 12+ 1 + 12 + 1 + 3  |||| 5 no_slab modules
         sqrt3             = 1.7320508
+        self.strawTubes   = {}
         kloeTrkRegRadius  = self.kloeVesselRadius - self.extRadialgap
         kloeTrkRegHalfDx  = self.kloeVesselHalfDx - self.extLateralgap
         planeXXThickness = self.strawRadius * (2 + sqrt3)
@@ -134,8 +135,8 @@ class KLOE3DST_STT_builder(gegede.builder.Builder):
             self.foilpositions.append(geom.structure.Position("pos_foilpositions_"+str(i),  -self.totfoilThickness/2.0 +self.foilThickness/2.0 + i*(self.foilThickness+self.foilGap) , Q('0m'), Q('0m')))
             
         
-        self.horizontalST_Xe=self.construct_strawtube(geom,"horizontalST_Xe" , kloeTrkRegHalfDx, "reg")
-        self.horizontalST_Ar=self.construct_strawtube(geom,"horizontalST_Ar" , kloeTrkRegHalfDx, "gra")
+        self.horizontalST_Xe=self.getStrawtube(geom,"horizontalST_Xe" , kloeTrkRegHalfDx, "reg")
+        self.horizontalST_Ar=self.getStrawtube(geom,"horizontalST_Ar" , kloeTrkRegHalfDx, "gra")
 
         ############################ build front STT
         self.build_frontSTT(geom, main_lv)
@@ -396,7 +397,7 @@ class KLOE3DST_STT_builder(gegede.builder.Builder):
             else:
                 straw_lv=self.horizontalST_Xe
         else:
-            straw_lv=self.construct_strawtube(geom, name+"_ST",halflength, modtype)
+            straw_lv=self.getStrawtube(geom, name+"_ST",halflength, modtype)
         
         
         Nstraw=int((2*halfCrosslength-self.strawRadius)/self.strawRadius/2.0)
@@ -416,6 +417,13 @@ class KLOE3DST_STT_builder(gegede.builder.Builder):
         return main_lv
         
         
+    def getStrawtube(self,geom, name, halflength, modtype):
+        # the straw tube of this half length and gas, made once and shared by all the planes
+        key=(round(halflength.to("mm").magnitude, 6), modtype=="gra")
+        if key not in self.strawTubes:
+            self.strawTubes[key]=self.construct_strawtube(geom, name, halflength, modtype)
+        return self.strawTubes[key]
+
     def construct_strawtube(self,geom, name, halflength, modtype):
 
         if modtype=="gra":
@@ -6,12 +6,29 @@
 ##### for straws and foils, no empty space
 import gegede.builder
 from duneggd.LocalTools import localtools as ltools
+from duneggd.LocalTools import homogenise
 import math
 from gegede import Quantity as Q
 import time
 
 class STTBuilder(gegede.builder.Builder):
-    def configure( self, halfDimension=None, Material=None, nBarrelModules=None, configuration=None, liqArThickness=None, TestMode=False, **kwds):
+    """
+    The SAND straw tube tracker.
+
+    Copy numbers, for decoding the hits into straws: a module is placed with
+    the copy number of its index (imod).  In its straw planes (the _hh and _vv
+    volumes of construct_XXST: x across the plane, y in the plane across the
+    straws, z along the straws) pair i is placed with copy number i, and in a
+    pair straw j = 0 or 1.  Straw j of pair i has its axis at
+    x = -t/2+(1+j*sqrt(3))*r and y = H-(2i+2-j)*r, with t the thickness of the
+    plane, H its half height along y and r = 2.5mm the straw radius.  It is
+    straw n = 2i+1-j of the plane counted from the +y edge.
+
+    The pair positions are made once for all the planes of the same height
+    (strawPairArray), but each plane still places its pairs one by one:
+    gegede has no replica or division to describe them as one array.
+    """
+    def configure( self, halfDimension=None, Material=None, nBarrelModules=None, configuration=None, liqArThickness=None, TestMode=False, lod='full', shareModules=True, **kwds):
         self.simpleStraw      	    = False
         self.sqrt3                  = 1.7320508
         #        self.start_time=time.time()
@@ -21,6 +38,12 @@ class STTBuilder(gegede.builder.Builder):
             print()
             print(" !!!!!!! Warning !!!!!! it's test mode, it's quick but miss components ")
             print()
+        # medium: straws as one homogenised tube, foils as one homogenised slab
+        # coarse: straw planes as homogenised boxes too
+        self.lod = ltools.checkLOD(self, lod)
+        # modules of the same type and height are one volume placed at each position,
+        # told apart by the copy number of their placement (the module index)
+        self.shareModules = shareModules
         self.halfDimension, self.Material = ( halfDimension, Material )
 
         self.kloeVesselRadius       = self.halfDimension['rmax']
@@ -126,8 +149,15 @@ class STTBuilder(gegede.builder.Builder):
         for i in range(self.leftNFoil):
             self.leftFoilPositions.append(geom.structure.Position("pos_left_"+str(i)+"_Foil", self.totfoilThickness/2.0 - self.foilThickness/2.0 - (self.foilThickness + self.foilGap)*i, Q('0m'), Q('0m')))
 
-        self.horizontalST_Xe=self.construct_strawtube(geom,"horizontalST_Xe" , self.kloeTrkRegHalfDx - self.FrameThickness, "stGas_Xe19")
-        self.horizontalST_Ar=self.construct_strawtube(geom,"horizontalST_Ar" , self.kloeTrkRegHalfDx - self.FrameThickness, "stGas_Ar19")
+        # positions of the straw pairs in a plane, by plane half cross length
+        self.strawPairArrays={}
+        # straw tubes by half length and gas
+        self.strawTubes={}
+        # modules by type and half height
+        self.modules={}
+
+        self.horizontalST_Xe=self.getStrawtube(geom,"horizontalST_Xe" , self.kloeTrkRegHalfDx - self.FrameThickness, "stGas_Xe19")
+        self.horizontalST_Ar=self.getStrawtube(geom,"horizontalST_Ar" , self.kloeTrkRegHalfDx - self.FrameThickness, "stGas_Ar19")
 
         self.modthicknesses={"TrkMod": self.trkModThickness, "CMod":self.cModThickness, "C3H6Mod":self.C3H6ModThickness}
         self.modBuilder = {'C3H6Mod': self.construct_C3H6Module, 'TrkMod': self.construct_TrackingModule, 'CMod': self.construct_cModule}
@@ -221,7 +251,7 @@ class STTBuilder(gegede.builder.Builder):
         left2upstream=self.realDistance2ECAL  
         for imod in range(0, self.firstSymModId):
             name="STT_"+str(imod).zfill(2)+"_"+self.mod_list[imod]
-            self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[imod], left2upstream)
+            self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[imod], left2upstream, imod)
             #print("name:  %s  left2upstream:  %f"%(name,left2upstream));
             print("name:", name,"  left2upstream:",left2upstream);
             left2upstream +=  self.modthicknesses[self.mod_list[imod]]
@@ -237,44 +267,31 @@ class STTBuilder(gegede.builder.Builder):
             name="STT_"+str(i).zfill(2)+"_"+self.mod_list[i]
             
             print("name:", name, " l1:",Q("2m")-left2center," l2:", Q("2m")+left2center-ModThickness,"  ModThickness:",ModThickness);
-            self.construct_2sym_modules(main_lv,geom, name, self.Material, self.mod_list[i], left2center)
+            self.construct_2sym_modules(main_lv,geom, name, self.Material, self.mod_list[i], left2center, i, 2*self.centralModId-i)
 
 
         imod=self.centralModId
         left2upstream=self.kloeTrkRegRadius- self.cModThickness/2
         name="STT_"+str(imod).zfill(2)+"_"+self.mod_list[imod]
         print(" name: ",name,"  left2upstream", left2upstream);
-        self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[imod], left2upstream)
+        self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[imod], left2upstream, imod)
 
 
         left2upstream=  self.SymStop2upstream
         for i in range(self.SymStopFirstModId, len(self.mod_list)):
             name="STT_"+str(i).zfill(2)+"_"+self.mod_list[i]
-            self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[i], left2upstream)
+            self.construct_one_module(main_lv, geom, name, self.Material, self.mod_list[i], left2upstream, i)
             #print("name:  %s  left2upstream:  %f"%(name,left2upstream));
             print("name:", name,"  left2upstream:",left2upstream);
             left2upstream += self.modthicknesses[self.mod_list[i]]
 
 
     def getHalfHeight(self,dis2c):
-        nside=24
-        theta=3.1415926536*2/nside
-        d=self.kloeTrkRegRadius*math.tan(theta/2)
-        if dis2c<d:
-            return self.kloeTrkRegRadius
-        projectedDis=d
-        HalfHeight=self.kloeTrkRegRadius
-        for i in range(1,int(nside/4)):
-            projectedDisPre=projectedDis
-            projectedDis+=2*d*math.cos(i*theta)
-            if dis2c<projectedDis:
-                return HalfHeight-(dis2c-projectedDisPre)*math.tan(i*theta)
-            else:
-                HalfHeight-=2*d*math.sin(i*theta)
-
+        # half height of the KLOE 24-gon at dis2c from its centre, dis2c may be a list
+        return ltools.polygonHalfHeight(self.kloeTrkRegRadius, 24, dis2c)
 
 
-    def construct_one_module(self, main_lv, geom, name, Material, mod_type, left2upstream):
+    def construct_one_module(self, main_lv, geom, name, Material, mod_type, left2upstream, imod=0):
         ModThickness= self.modthicknesses[mod_type]
         loc=[left2upstream - self.kloeTrkRegRadius + 0.5 * ModThickness,Q("0cm") - self.halfUpModGap, Q("0cm")]
         if (left2upstream+0.5 * ModThickness) < self.kloeTrkRegRadius:
@@ -288,16 +305,15 @@ class STTBuilder(gegede.builder.Builder):
         #        print("%s %f %f"%(name, (self.kloeTrkRegRadius-left2upstream)/Q("1mm"), (self.kloeTrkRegRadius-left2upstream-ModThickness)/Q("1mm")) )
 
         halfDimension = {'dx': ModThickness/2.0, 'dy':halfheight, 'dz': self.kloeTrkRegHalfDx}
-        construct_mod = self.modBuilder[mod_type]
-        mod_lv = construct_mod(geom, name, Material, halfDimension)
+        mod_lv = self.getModule(geom, name, Material, mod_type, halfDimension)
 
         #            module_pos=geom.structure.Position("pos_"+name,loc[0],loc[1],loc[2])
 
         module_pos=geom.structure.Position("pos_"+name, loc[0],loc[1], loc[2])
-        module_pla=geom.structure.Placement("pla_"+name,volume=mod_lv,pos=module_pos)
+        module_pla=geom.structure.Placement("pla_"+name,volume=mod_lv,pos=module_pos,copynumber=imod)
         main_lv.placements.append(module_pla.name)
 
-    def construct_2sym_modules(self, main_lv, geom, name, Material, mod_type, left2c):
+    def construct_2sym_modules(self, main_lv, geom, name, Material, mod_type, left2c, imodUp=0, imodDown=0):
         ModThickness= self.modthicknesses[mod_type]
         loc=[ -left2c + 0.5 * ModThickness,  Q("0cm") - self.halfUpModGap , Q("0cm")]
         halfheight=self.getHalfHeight(left2c)
@@ -308,20 +324,26 @@ class STTBuilder(gegede.builder.Builder):
         #print("2%s  %f"%(name,fullheight.magnitude ))
         #        print("%s %f %f"%(name, left2c.magnitude, (left2c-ModThickness).magnitude))
         halfDimension = {'dx': ModThickness/2.0, 'dy':halfheight, 'dz': self.kloeTrkRegHalfDx}
-        construct_mod = self.modBuilder[mod_type]
-        mod_lv = construct_mod(geom, name, Material, halfDimension)
+        mod_lv = self.getModule(geom, name, Material, mod_type, halfDimension)
 
         module_posUp=geom.structure.Position("posUp_"+name, loc[0],loc[1],loc[2])
 
         locDown=[-loc[0],loc[1],loc[2]]
         module_posDown=geom.structure.Position("posDown_"+name, locDown[0],locDown[1] ,locDown[2])
 
-        module_plaUp=geom.structure.Placement("plaUp_"+name,volume=mod_lv,pos=module_posUp)
-        module_plaDown=geom.structure.Placement("plaDown_"+name,volume=mod_lv,pos=module_posDown)
+        module_plaUp=geom.structure.Placement("plaUp_"+name,volume=mod_lv,pos=module_posUp,copynumber=imodUp)
+        module_plaDown=geom.structure.Placement("plaDown_"+name,volume=mod_lv,pos=module_posDown,copynumber=imodDown)
         main_lv.placements.append(module_plaUp.name)
         main_lv.placements.append(module_plaDown.name)
 
 
+    def getModule(self, geom, name, Material, mod_type, halfDimension):
+        # the module of this type and half height, made once with the name of the first one
+        key=(mod_type, round(halfDimension['dy'].to("mm").magnitude, 6))
+        if not self.shareModules or key not in self.modules:
+            self.modules[key]=self.modBuilder[mod_type](geom, name, Material, halfDimension)
+        return self.modules[key]
+
     def construct_TrackingModule(self,geom, name, Material, halfDimension, upstreamMost=False):
         
         main_shape = geom.shapes.Box("shape_"+name, dx=halfDimension['dx'], dy=halfDimension['dy'], dz=halfDimension['dz'] )
@@ -417,8 +439,10 @@ class STTBuilder(gegede.builder.Builder):
         main_lv.placements.append(strawplane_pla.name)
         return main_lv
 
-    def construct_foils(self,geom, name, halfheight):
+    def construct_foils(self,geom, name, halfheight, lod=None):
         main_shape = geom.shapes.Box(name, dx=self.totfoilThickness/2.0, dy=halfheight, dz= self.kloeTrkRegHalfDx - self.FrameThickness )
+        if (lod or self.lod) != 'full' and not self.TestMode:
+            return geom.structure.Volume(name, material=self.foilMaterial(geom), shape=main_shape )
         main_lv = geom.structure.Volume(name, material="Air35C", shape=main_shape )
         if self.TestMode:
             return main_lv
@@ -444,6 +468,10 @@ class STTBuilder(gegede.builder.Builder):
             main_shape = geom.shapes.Box("shape_"+name, dx=self.planeXXThickness, dy=halfheight, dz=self.kloeTrkRegHalfDx - self.FrameThickness)
         else:
             main_shape = geom.shapes.Box("shape_"+name, dx=self.planeXXThickness*3./2., dy=halfheight, dz=self.kloeTrkRegHalfDx -self.FrameThickness)
+        if self.lod == 'coarse' and not self.TestMode:
+            main_lv = geom.structure.Volume(name, material=self.strawPlaneMaterial(geom, gasMaterial), shape=main_shape )
+            main_lv.params.append(("SensDet","Straw"))
+            return main_lv
         main_lv = geom.structure.Volume(name, material="Air35C", shape=main_shape )
 
         if self.TestMode:
@@ -480,7 +508,7 @@ class STTBuilder(gegede.builder.Builder):
             else:
                 print("unrecognized gas material wrong wrong  wrong wrong wrong wrong wrong wrong wrong wrong wrong wrong")
         else:
-            straw_lv=self.construct_strawtube(geom, name+"_ST",halflength, gasMaterial)
+            straw_lv=self.getStrawtube(geom, name+"_ST",halflength, gasMaterial)
 
 
         Nstraw=int((2*halfCrosslength-self.strawRadius)/self.strawRadius/2.0)
@@ -496,27 +524,50 @@ class STTBuilder(gegede.builder.Builder):
                                               pos="pos_straw2relative")
 
         twoStraw_lv=geom.structure.Volume(name+"_2straw",material="Air35C", shape=twoStraw_shape)
+        # straw j of pair i in the plane has copy numbers i (pair) and j (straw), it is straw 2*i+1-j
+        # of the plane from the +y edge (see the class docstring)
         straw1_pla=geom.structure.Placement("pla_"+name+"_s1",volume=straw_lv)
         twoStraw_lv.placements.append(straw1_pla.name)
-        straw2_pla=geom.structure.Placement("pla_"+name+"_s2",volume=straw_lv, pos="pos_straw2relative")
+        straw2_pla=geom.structure.Placement("pla_"+name+"_s2",volume=straw_lv, pos="pos_straw2relative", copynumber=1)
         twoStraw_lv.placements.append(straw2_pla.name)
 
 
 
-        for i in range(Nstraw):
-            pos1=geom.structure.Position("pos_"+name+"_"+str(i), -self.planeXXThickness/2.0+self.strawRadius, halfCrosslength - (2*i+2)*self.strawRadius, Q('0m'))
-            twoStraw_pla1=geom.structure.Placement("pla_"+name+"_"+str(i), volume=twoStraw_lv, pos=pos1)
+        for i, pos1 in enumerate(self.strawPairArray(geom, halfCrosslength)):
+            twoStraw_pla1=geom.structure.Placement("pla_"+name+"_"+str(i), volume=twoStraw_lv, pos=pos1, copynumber=i)
             main_lv.placements.append(twoStraw_pla1.name)
         return main_lv
 
+    def strawPairArray(self, geom, halfCrosslength):
+        # the positions of the straw pairs along the cross direction of a plane, made once for all
+        # the planes with the same half cross length (all the vv planes, hh planes of the same height)
+        key=round(halfCrosslength.to("mm").magnitude, 6)
+        if key not in self.strawPairArrays:
+            Nstraw=int((2*halfCrosslength-self.strawRadius)/self.strawRadius/2.0)
+            name="strawpairs"+str(len(self.strawPairArrays))
+            self.strawPairArrays[key]=[geom.structure.Position("pos_"+name+"_"+str(i), -self.planeXXThickness/2.0+self.strawRadius, halfCrosslength - (2*i+2)*self.strawRadius, Q('0m'))
+                                       for i in range(Nstraw)]
+        return self.strawPairArrays[key]
 
-    def construct_strawtube(self,geom, name, halflength, airMaterial):
+
+    def getStrawtube(self, geom, name, halflength, gasMaterial):
+        # the straw tube of this half length and gas, made once and shared by all the planes
+        key=(round(halflength.to("mm").magnitude, 6), gasMaterial)
+        if key not in self.strawTubes:
+            self.strawTubes[key]=self.construct_strawtube(geom, name, halflength, gasMaterial)
+        return self.strawTubes[key]
+
+    def construct_strawtube(self,geom, name, halflength, airMaterial, lod=None):
 
         main_shape = geom.shapes.Tubs("shape_"+name, rmin=Q("0m"), rmax=self.strawRadius, dz=halflength)
         if self.simpleStraw:
             main_lv = geom.structure.Volume(name, material="straw_avg_ArXe", shape=main_shape )
             main_lv.params.append(("SensDet","Straw"))
             return main_lv
+        if (lod or self.lod) != 'full':
+            main_lv = geom.structure.Volume(name, material=self.strawMaterial(geom, airMaterial), shape=main_shape )
+            main_lv.params.append(("SensDet","Straw"))
+            return main_lv
 
         if airMaterial!="stGas_Ar19" and airMaterial!="stGas_Xe19":
             print("unrecognized gas material wrong wrong  wrong wrong wrong wrong wrong wrong wrong wrong wrong wrong")
@@ -555,6 +606,23 @@ class STTBuilder(gegede.builder.Builder):
 
         return main_lv
 
+    def strawMaterial(self, geom, gasMaterial):
+        # the mixture of 1cm of full detail straw
+        return homogenise.homogeniseBuilt(geom, "straw_lod_"+gasMaterial,
+                    lambda g: self.construct_strawtube(g, "straw", Q("0.5cm"), gasMaterial, lod='full'))
+
+    def strawPlaneMaterial(self, geom, gasMaterial):
+        # two straws per 2*strawRadius of height and planeXXThickness of depth
+        straw = self.strawMaterial(geom, gasMaterial)
+        straws = 2*math.pi*self.strawRadius**2 * Q("1cm")
+        return ltools.homogenisedMaterial(geom, "strawplane_lod_"+gasMaterial,
+                    [(straw, straws), ("Air35C", self.planeXXThickness * 2*self.strawRadius * Q("1cm") - straws)])
+
+    def foilMaterial(self, geom):
+        # the mixture of a full detail foil stack
+        return homogenise.homogeniseBuilt(geom, "foil_lod_C3H6",
+                    lambda g: self.construct_foils(g, "foils", Q("0.5cm"), lod='full'))
+
 ##############################################################         GRAIN         ###################################################################
 
 
@@ -57,6 +57,7 @@ class STTFULLBuilder(gegede.builder.Builder):
     # construct STT 
     def construct(self,geom):
         start_time=tm.time()
+        self.strawTubes = {}
                 
         main_lv, main_hDim = ltools.main_lv( self, geom, "Tubs")
         print( "KLOESTTFULL::construct()")
@@ -441,10 +442,10 @@ class STTFULLBuilder(gegede.builder.Builder):
         main_lv = geom.structure.Volume(name + "_vol", 
                                         material="Air35C", 
                                         shape=main_shape )
-        straw_lv=self.construct_ST(geom,
-                                   name + "_ST_" + gasMaterial , 
-                                   halflength=halflength, 
-                                   gasMaterial=gasMaterial)
+        straw_lv=self.getST(geom,
+                            name + "_ST_" + gasMaterial , 
+                            halflength=halflength, 
+                            gasMaterial=gasMaterial)
             
         Nstraw=int(0.5*(2.*halfheight/self.strawRadius-1.))
         
@@ -470,6 +471,14 @@ class STTFULLBuilder(gegede.builder.Builder):
             main_lv.placements.append(straw_pla2.name)    
         return main_lv  
 
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    # straw tube of this half length and gas, constructed once and shared by all the planes
+    def getST( self, geom, name, halflength, gasMaterial ):
+        key = (round(halflength.to("mm").magnitude, 6), gasMaterial)
+        if key not in self.strawTubes:
+            self.strawTubes[key] = self.construct_ST(geom, name, halflength, gasMaterial)
+        return self.strawTubes[key]
+
     #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
     # construct straw tube        
     def construct_ST( self, geom, name, halflength, gasMaterial ):
@@ -24,7 +24,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         self.extRadialgap           = Q("0cm")
         self.extLateralgap          = Q("0cm")
         self.kloeTrkRegRadius       = self.kloeVesselRadius - self.extRadialgap
-	self.kloeTrkRegHalfDx       = self.kloeVesselHalfDx - self.extLateralgap
+        self.kloeTrkRegHalfDx       = self.kloeVesselHalfDx - self.extLateralgap
         
         
         self.nfoil                  = 150
@@ -68,6 +68,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         
     def construct(self,geom):
 
+        self.strawTubes={}
         mod_types=["C3H6Mod","C3H6Mod","C3H6Mod"]
         for i in range(6):
             for j in range(13):
@@ -112,15 +113,15 @@ class STTFULLBuilder(gegede.builder.Builder):
 
         self.fiveFoilPositions=[]
         self.foilPositionsInFive=[]
-        for i in range(self.nfoil/5):
+        for i in range(self.nfoil//5):
             self.fiveFoilPositions.append(geom.structure.Position("pos_fiveFoilPositions_"+str(i),  -self.totfoilThickness/2.0 + self.fiveFoilThickness/2.0 + i*(self.fiveFoilThickness+self.foilGap) , Q('0m'), Q('0m')))
 
         for i in range(5):
             self.foilPositionsInFive.append(geom.structure.Position("pos_foilInFive_"+str(i), (self.foilThickness+self.foilGap)*(i-2), Q('0m'), Q('0m')))
             
         
-        self.horizontalST_Xe=self.construct_strawtube(geom,"horizontalST_Xe" , self.kloeTrkRegHalfDx, "C3H6Mod")
-        self.horizontalST_Ar=self.construct_strawtube(geom,"horizontalST_Ar" , self.kloeTrkRegHalfDx, "CMod")
+        self.horizontalST_Xe=self.getStrawtube(geom,"horizontalST_Xe" , self.kloeTrkRegHalfDx, "C3H6Mod")
+        self.horizontalST_Ar=self.getStrawtube(geom,"horizontalST_Ar" , self.kloeTrkRegHalfDx, "CMod")
         
 
         ########################################  Front ST  #################################
@@ -129,7 +130,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         height=self.kloeTrkRegRadius*math.sqrt(1 - ratio*ratio)
         module_lv = self.construct_strawplane(geom, "frontST" , height, "gra")  # every time there is no raditor (with foils) we use Ar instead
         pos_frontST1=geom.structure.Position("pos_frontST1", -self.kloeTrkRegRadius+usedLength + self.planeXXThickness, "0cm","0cm")
-        pos_frontST2=geom.structure.Position("pos_frontST2", -self.kloeTrkRegRadius+usedLength + 3*self.planeXXThickness,	"0cm","0cm")
+        pos_frontST2=geom.structure.Position("pos_frontST2", -self.kloeTrkRegRadius+usedLength + 3*self.planeXXThickness,       "0cm","0cm")
         frontST_pla1=geom.structure.Placement("pla_frontST1",volume=module_lv,pos=pos_frontST1, copynumber=0)
         frontST_pla2=geom.structure.Placement("pla_frontST2",volume=module_lv,pos=pos_frontST2, copynumber=1)
         main_lv.placements.append(frontST_pla1.name)
@@ -245,7 +246,7 @@ class STTFULLBuilder(gegede.builder.Builder):
             foil_pla=geom.structure.Placement("pla_"+name+"_"+str(i)+"inf5", volume=foil_lv, pos=self.foilPositionsInFive[i])
             fiveFoil_lv.placements.append(foil_pla.name)        
             
-        for i in range(self.nfoil/5):
+        for i in range(self.nfoil//5):
             #            pos = [ -self.totfoilThickness/2.0 +self.foilThickness/2.0 + i*(self.foilThickness+self.foilGap) , Q('0m'), Q('0m')]
             #            foil_pos=geom.structure.Position("pos"+namef+str(i), pos[0],pos[1], pos[2])
             foil_pla=geom.structure.Placement("pla"+name+"_grp_"+str(i), volume=fiveFoil_lv, pos=self.fiveFoilPositions[i])
@@ -276,7 +277,7 @@ class STTFULLBuilder(gegede.builder.Builder):
             else:
                 straw_lv=self.horizontalST_Xe
         else:
-            straw_lv=self.construct_strawtube(geom, name+"_ST",halflength, modtype)
+            straw_lv=self.getStrawtube(geom, name+"_ST",halflength, modtype)
         
         
         Nstraw=int((2*halfCrosslength-self.strawRadius)/self.strawRadius/2.0)
@@ -314,6 +315,13 @@ class STTFULLBuilder(gegede.builder.Builder):
 
         
         
+    def getStrawtube(self,geom, name, halflength, modtype):
+        # the straw tube of this half length and gas, made once and shared by all the planes
+        key=(round(halflength.to("mm").magnitude, 6), modtype=="CMod")
+        if key not in self.strawTubes:
+            self.strawTubes[key]=self.construct_strawtube(geom, name, halflength, modtype)
+        return self.strawTubes[key]
+
     def construct_strawtube(self,geom, name, halflength, modtype):
 
         if modtype=="CMod":
@@ -7,7 +7,7 @@ import time
 
 class STTFULLBuilder(gegede.builder.Builder):
     def configure( self, halfDimension=None, Material=None,  **kwds):
-        self.simpleStraw      	    = True
+        self.simpleStraw            = True
         self.sqrt3                  = 1.7320508
         #        self.start_time=time.time()
         #        print("start_time:",self.start_time)
@@ -24,7 +24,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         self.extRadialgap           = Q("0cm")
         self.extLateralgap          = Q("0cm")
         self.kloeTrkRegRadius       = self.kloeVesselRadius - self.extRadialgap
-	self.kloeTrkRegHalfDx       = self.kloeVesselHalfDx - self.extLateralgap
+        self.kloeTrkRegHalfDx       = self.kloeVesselHalfDx - self.extLateralgap
         self.GapForST               = Q("7.5cm")
         self.AddGapForSlab          = Q("7.5cm")
         self.UpModGap               = Q("4mm")
@@ -124,7 +124,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         mod_types.append("TrkMod")
         mod_types.append("TrkMod")
         mod_types.append("TrkMod")
-	mod_types.append("TrkMod")
+        mod_types.append("TrkMod")
         
 
         self.modthicknesses={"TrkMod": self.trkModThickness, "CMod":self.cModThickness, "C3H6Mod":self.C3H6ModThickness}
@@ -184,22 +184,9 @@ class STTFULLBuilder(gegede.builder.Builder):
             #        print("time diff:",end_time-self.start_time)
 
     def getHalfHeight(self,dis2c):
-        nside=24
-        theta=3.1415926536*2/nside
-        d=self.kloeTrkRegRadius*math.tan(theta/2)
-        if dis2c<d:
-            return self.kloeTrkRegRadius
-        projectedDis=d
-        HalfHeight=self.kloeTrkRegRadius
-        for i in range(1,nside/4):
-            projectedDisPre=projectedDis
-            projectedDis+=2*d*math.cos(i*theta)
-            if dis2c<projectedDis:
-                return HalfHeight-(dis2c-projectedDisPre)*math.tan(i*theta)
-            else:
-                HalfHeight-=2*d*math.sin(i*theta)
-                
-            
+        # half height of the KLOE 24-gon at dis2c from its centre, dis2c may be a list
+        return ltools.polygonHalfHeight(self.kloeTrkRegRadius, 24, dis2c)
+
 
     def construct_one_module(self, main_lv, geom, name, Material, mod_type, left2upstream, upstreamMost_TrkMod=False, downstreamMost_C3H6Mod=False):
         ModThickness= self.modthicknesses[mod_type]
@@ -241,7 +228,7 @@ class STTFULLBuilder(gegede.builder.Builder):
         loc=[ -left2c + 0.5 * ModThickness,  Q("0cm") - self.halfUpModGap ,Q("0cm")]
         halfheight=self.getHalfHeight(left2c)
         halfheight -=self.halfUpModGap
-        #	halfheight -=self.GapForST
+        #       halfheight -=self.GapForST
 
         fullheight=(halfheight + self.halfUpModGap)*2
         #        print("%s  %f"%(name,fullheight.magnitude ))
@@ -91,40 +91,19 @@ class SandECalBuilder(gegede.builder.Builder):
         emcalo_module_builder = self.get_builder("SANDECALBARRELMOD")
         emcalo_module_lv = emcalo_module_builder.get_volume()
 
-        for j in range(self.NCaloModBarrel):
-
-            axisy = (0, 1, 0)
-            axisz = (1, 0, 0)
-            ang = 360 / self.NCaloModBarrel
-            theta = j * ang
-            ModPosition = [
-                Q('0mm'),
-                Q('0mm'), self.BarrelRmin + 0.5 * self.caloThickness
-            ]
-            ModPositionNew = ltools.rotation(
-                axisy, theta, ModPosition
-            )  #Rotating the position vector (the slabs will be rotated automatically after append)
-            ModPositionNew = ltools.rotation(axisz, -90, ModPositionNew)
-
-            ECAL_position = geom.structure.Position(
-                'ECAL_position' + '_' + str(j), ModPositionNew[0],
-                ModPositionNew[1], ModPositionNew[2])
-
-            ECAL_rotation = geom.structure.Rotation(
-                'ECAL_rotation' + '_' + str(j), Q('90deg'), -theta * Q('1deg'),
-                Q('0deg'))  #Rotating the module on its axis accordingly
-
-            print("Building Kloe ECAL module " + str(j))  # keep compatibility with Python3 pylint: disable=superfluous-parens
-
-            ####Placing and appending the j ECAL Module#####
-
-            ECAL_place = geom.structure.Placement('ECAL_place' + '_' + str(j),
-                                                  volume=emcalo_module_lv,
-                                                  pos=ECAL_position,
-                                                  rot=ECAL_rotation)
-            main_lv.placements.append(ECAL_place.name)
-
-            ################################################
+        axisy = (0, 1, 0)
+        axisz = (1, 0, 0)
+        ModPosition = [
+            Q('0mm'),
+            Q('0mm'), self.BarrelRmin + 0.5 * self.caloThickness
+        ]
+        #Rotating the position vector (the slabs will be rotated automatically after append)
+        #and the module on its axis accordingly
+        print("Building Kloe ECAL modules")
+        ltools.placeRing(geom, main_lv, emcalo_module_lv, ModPosition,
+                         self.NCaloModBarrel, axis=axisy, chain=[(axisz, -90)],
+                         rot=[Q('90deg'), Q('0deg'), Q('0deg')],
+                         name='ECAL', copynumber=False)
 
     def buildECALEndCaps(self, main_lv, geom):
 
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 import gegede.builder
 from duneggd.LocalTools import materialdefinition as materials
+from duneggd.LocalTools import localtools as ltools
 from gegede import Quantity as Q
 global Pos
 class tmsBuilder(gegede.builder.Builder):
-    def configure(self, mat=None, thinbox1Dimension=None, thinbox2Dimension=None, gapPosition=None, BFieldUpLow = None, BFieldUpHigh = None, BFieldDownLow = None , BFieldDownHigh = None,  **kwds):
+    def configure(self, mat=None, thinbox1Dimension=None, thinbox2Dimension=None, gapPosition=None, BFieldUpLow = None, BFieldUpHigh = None, BFieldDownLow = None , BFieldDownHigh = None, lod='full', **kwds):
         self.BFieldUpLow = BFieldUpLow
         self.BFieldUpHigh = BFieldUpHigh
         self.BFieldDownLow = BFieldDownLow 
@@ -13,6 +14,9 @@ class tmsBuilder(gegede.builder.Builder):
         self.thinbox1Dimension=thinbox1Dimension
         self.thinbox2Dimension=thinbox2Dimension
         self.gapPosition=gapPosition
+        # medium: solid scintillator modules without bars
+        # coarse: scintillator layers as one homogenised volume, steel kept
+        self.lod=ltools.checkLOD(self, lod)
         
         
     def construct(self, geom):        
@@ -142,37 +146,45 @@ class tmsBuilder(gegede.builder.Builder):
         
 
         # Scintillator
-        # Individual scintillator bar
-        scinBox = geom.shapes.Box( 'scinbox'+self.name,
-                                    dx = 0.5*Q("0.03542m"),
-                                    dy = 0.5*Q("3.096m"),
-                                    dz = 0.5*Q("0.01m"))
-
-        scinBox_lv = geom.structure.Volume( 'scinBoxlv'+self.name, material='Scintillator', shape=scinBox)
-        scinBox_lv.params.append(("SensDet", tms_lv.name))
-
-        # Place Bars into Modules
-        ModuleBox = geom.shapes.Box( 'ModuleBox',
-                                     dx = 0.5*Q("0.03542m")*48, # 0.04*42
-                                     dy = 0.5*Q("3.096m"),
-                                     dz = 0.5*Q("0.01m"))
-        ModuleBox_lv = geom.structure.Volume( 'ModuleBoxvol', material='Air', shape=ModuleBox )
+        # Individual scintillator bar, only placed at full detail
+        if self.lod == 'full':
+            scinBox = geom.shapes.Box( 'scinbox'+self.name,
+                                        dx = 0.5*Q("0.03542m"),
+                                        dy = 0.5*Q("3.096m"),
+                                        dz = 0.5*Q("0.01m"))
+
+            scinBox_lv = geom.structure.Volume( 'scinBoxlv'+self.name, material='Scintillator', shape=scinBox)
+            scinBox_lv.params.append(("SensDet", tms_lv.name))
+
+        # Place Bars into Modules, the modules are part of the layers in coarse
+        if self.lod != 'coarse':
+            ModuleBox = geom.shapes.Box( 'ModuleBox',
+                                         dx = 0.5*Q("0.03542m")*48, # 0.04*42
+                                         dy = 0.5*Q("3.096m"),
+                                         dz = 0.5*Q("0.01m"))
+        if self.lod == 'full':
+            ModuleBox_lv = geom.structure.Volume( 'ModuleBoxvol', material='Air', shape=ModuleBox )
+        elif self.lod == 'medium':
+            # the 48 bars fill the module
+            ModuleBox_lv = geom.structure.Volume( 'ModuleBoxvol', material='Scintillator', shape=ModuleBox )
+            ModuleBox_lv.params.append(("SensDet", tms_lv.name))
                                                                                                                                            
-        sci_bars = 48
-        sci_Bar_pos = [geom.structure.Position('e')]*sci_bars
-        sci_Bar_pla = [geom.structure.Placement('f',volume=scinBox_lv, pos=sci_Bar_pos[1])]*sci_bars
-
-        # y and z positions are the same for each bar
-        zpos_bar = Q("0m") 
-        ypos_bar = Q("0m")
-        for bar in range(sci_bars):
-            xpos = -Q("0.83237m")+ bar * Q("0.03542m")
-            sci_Bar_pos[bar] = geom.structure.Position( 'sci_barposition'+str(bar),
-                                                           x = xpos,
-                                                           y = ypos_bar,
-                                                           z = zpos_bar)
-            sci_Bar_pla[bar] = geom.structure.Placement( 'scibarpla'+self.name+str(bar), volume=scinBox_lv, pos=sci_Bar_pos[bar] )
-            ModuleBox_lv.placements.append(sci_Bar_pla[bar].name)
+        if self.lod == 'full':
+            sci_bars = 48
+            sci_Bar_pos = [geom.structure.Position('e')]*sci_bars
+            sci_Bar_pla = [geom.structure.Placement('f',volume=scinBox_lv, pos=sci_Bar_pos[1])]*sci_bars
+
+            # y and z positions are the same for each bar
+            zpos_bar = Q("0m") 
+            ypos_bar = Q("0m")
+            for bar in range(sci_bars):
+                xpos = -Q("0.83237m")+ bar * Q("0.03542m")
+                sci_Bar_pos[bar] = geom.structure.Position( 'sci_barposition'+str(bar),
+                                                               x = xpos,
+                                                               y = ypos_bar,
+                                                               z = zpos_bar)
+                sci_Bar_pla[bar] = geom.structure.Placement( 'scibarpla'+self.name+str(bar), volume=scinBox_lv, pos=sci_Bar_pos[bar] )
+                ModuleBox_lv.placements.append(sci_Bar_pla[bar].name)
 
         # Place Modules into scint layers
         modules_in_layer = 4
@@ -181,60 +193,70 @@ class tmsBuilder(gegede.builder.Builder):
                                       dy = 0.5*Q("5.022m"),
                                       dz = 0.5*Q("0.040m"))        
 
-        Module_layer_lv = geom.structure.Volume( 'modulelayervol', material='Air', shape=Module_layer )
+        if self.lod != 'coarse':
+            Module_layer_lv = geom.structure.Volume( 'modulelayervol', material='Air', shape=Module_layer )
+        else:
+            # the 8 modules of a layer, homogenised with the air around them
+            module_volume = Q("0.03542m")*48 * Q("3.096m") * Q("0.01m")
+            layer_volume = Q("7.036m") * Q("5.022m") * Q("0.040m")
+            layer_material = ltools.homogenisedMaterial(geom, 'modulelayer_lod',
+                                                        [('Scintillator', 8*module_volume), ('Air', layer_volume - 8*module_volume)])
+            Module_layer_lv = geom.structure.Volume( 'modulelayervol', material=layer_material, shape=Module_layer )
+            Module_layer_lv.params.append(("SensDet", tms_lv.name))
 
-        #Poition modules in layer                                                                                            
-        Mod_ri_rot = geom.structure.Rotation( 'Modrirot', '0deg','0deg','3deg')
-        Mod_left_rot = geom.structure.Rotation( 'Modleftrot', '0deg','0deg','-3deg')
+        if self.lod != 'coarse':
+            #Poition modules in layer                                                                                            
+            Mod_ri_rot = geom.structure.Rotation( 'Modrirot', '0deg','0deg','3deg')
+            Mod_left_rot = geom.structure.Rotation( 'Modleftrot', '0deg','0deg','-3deg')
 
-        mod_pos1 = geom.structure.Position( 'modpos1'+self.name,
-                                          -1.5*Q("0.03542m")*48-Q("0.015m"),
-                                          Q("0m"),
-                                          Q("0m"))
+            mod_pos1 = geom.structure.Position( 'modpos1'+self.name,
+                                              -1.5*Q("0.03542m")*48-Q("0.015m"),
+                                              Q("0m"),
+                                              Q("0m"))
 
-        mod_pos2 = geom.structure.Position( 'modpos2'+self.name,
-                                            -0.5*Q("0.03542m")*48-Q("0.005m"),
-                                            Q("0m"),
-                                            Q("0m"))
+            mod_pos2 = geom.structure.Position( 'modpos2'+self.name,
+                                                -0.5*Q("0.03542m")*48-Q("0.005m"),
+                                                Q("0m"),
+                                                Q("0m"))
 
-        mod_pos3 = geom.structure.Position( 'modpos3'+self.name,
-                                           +0.5*Q("0.03542m")*48+Q("0.005m"),
-                                           Q("0m"),
-                                           Q("0m"))
+            mod_pos3 = geom.structure.Position( 'modpos3'+self.name,
+                                               +0.5*Q("0.03542m")*48+Q("0.005m"),
+                                               Q("0m"),
+                                               Q("0m"))
 
-        mod_pos4 = geom.structure.Position( 'modpos4'+self.name,
-                                            +1.5*Q("0.03542m")*48+Q("0.015m"),
-                                            Q("0m"),
-                                            Q("0m"))
+            mod_pos4 = geom.structure.Position( 'modpos4'+self.name,
+                                                +1.5*Q("0.03542m")*48+Q("0.015m"),
+                                                Q("0m"),
+                                                Q("0m"))
 
 
 
 
-        mod_ri_pla1 = geom.structure.Placement( 'modripla1'+self.name, volume=  ModuleBox_lv, pos=mod_pos1, rot = Mod_ri_rot)
-        mod_le_pla1 = geom.structure.Placement( 'modlepla1'+self.name, volume=  ModuleBox_lv, pos=mod_pos1, rot = Mod_left_rot)
+            mod_ri_pla1 = geom.structure.Placement( 'modripla1'+self.name, volume=  ModuleBox_lv, pos=mod_pos1, rot = Mod_ri_rot)
+            mod_le_pla1 = geom.structure.Placement( 'modlepla1'+self.name, volume=  ModuleBox_lv, pos=mod_pos1, rot = Mod_left_rot)
 
-        #mod_pla1 = geom.structure.Placement( 'mod1pla'+self.name, volume=  ModuleBox_lv, pos=mod_pos1)
-        mod_ri_pla2 = geom.structure.Placement( 'modripla2'+self.name, volume=  ModuleBox_lv, pos=mod_pos2, rot = Mod_ri_rot)
-        mod_le_pla2 = geom.structure.Placement( 'modlepla2'+self.name, volume=  ModuleBox_lv, pos=mod_pos2, rot = Mod_left_rot)
+            #mod_pla1 = geom.structure.Placement( 'mod1pla'+self.name, volume=  ModuleBox_lv, pos=mod_pos1)
+            mod_ri_pla2 = geom.structure.Placement( 'modripla2'+self.name, volume=  ModuleBox_lv, pos=mod_pos2, rot = Mod_ri_rot)
+            mod_le_pla2 = geom.structure.Placement( 'modlepla2'+self.name, volume=  ModuleBox_lv, pos=mod_pos2, rot = Mod_left_rot)
 
-        #mod_pla2 = geom.structure.Placement( 'mod2pla'+self.name, volume=  ModuleBox_lv, pos=mod_pos2)
-        mod_ri_pla3 = geom.structure.Placement( 'modripla3'+self.name, volume=  ModuleBox_lv, pos=mod_pos3, rot = Mod_ri_rot)
-        mod_le_pla3 = geom.structure.Placement( 'modlepla3'+self.name, volume=  ModuleBox_lv, pos=mod_pos3, rot = Mod_left_rot)
+            #mod_pla2 = geom.structure.Placement( 'mod2pla'+self.name, volume=  ModuleBox_lv, pos=mod_pos2)
+            mod_ri_pla3 = geom.structure.Placement( 'modripla3'+self.name, volume=  ModuleBox_lv, pos=mod_pos3, rot = Mod_ri_rot)
+            mod_le_pla3 = geom.structure.Placement( 'modlepla3'+self.name, volume=  ModuleBox_lv, pos=mod_pos3, rot = Mod_left_rot)
 
-        mod_ri_pla4 = geom.structure.Placement( 'modripla4'+self.name, volume=  ModuleBox_lv, pos=mod_pos4, rot = Mod_ri_rot)
-        mod_le_pla4 = geom.structure.Placement( 'modlepla4'+self.name, volume=  ModuleBox_lv, pos=mod_pos4, rot = Mod_left_rot)
+            mod_ri_pla4 = geom.structure.Placement( 'modripla4'+self.name, volume=  ModuleBox_lv, pos=mod_pos4, rot = Mod_ri_rot)
+            mod_le_pla4 = geom.structure.Placement( 'modlepla4'+self.name, volume=  ModuleBox_lv, pos=mod_pos4, rot = Mod_left_rot)
 
-        Module_layer_lv.placements.append(mod_ri_pla1.name)
-        Module_layer_lv.placements.append(mod_le_pla1.name)
+            Module_layer_lv.placements.append(mod_ri_pla1.name)
+            Module_layer_lv.placements.append(mod_le_pla1.name)
 
-        Module_layer_lv.placements.append(mod_ri_pla2.name)
-        Module_layer_lv.placements.append(mod_le_pla2.name)
+            Module_layer_lv.placements.append(mod_ri_pla2.name)
+            Module_layer_lv.placements.append(mod_le_pla2.name)
 
-        Module_layer_lv.placements.append(mod_ri_pla3.name)
-        Module_layer_lv.placements.append(mod_le_pla3.name)
+            Module_layer_lv.placements.append(mod_ri_pla3.name)
+            Module_layer_lv.placements.append(mod_le_pla3.name)
 
-        Module_layer_lv.placements.append(mod_ri_pla4.name)
-        Module_layer_lv.placements.append(mod_le_pla4.name)
+            Module_layer_lv.placements.append(mod_ri_pla4.name)
+            Module_layer_lv.placements.append(mod_le_pla4.name)
 
         #Place Layers into RMS vol
         Module_layers_thin = 40
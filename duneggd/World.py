@@ -18,7 +18,7 @@ class WorldBuilder(gegede.builder.Builder):
 
         ########################### Above is math, below is GGD ###########################
 
-        materials.define_materials(geom)
+        materials.ensure_materials(geom)
 
         noRotate       = geom.structure.Rotation( 'noRotate',      '0deg',  '0deg',  '0deg'  )
         r90aboutX      = geom.structure.Rotation( 'r90aboutX',      '90deg',  '0deg',  '0deg'  )
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+'''
+Benchmark the construction of the production geometries.
+
+Each variant of the benchmark set (the "bench" group of the build manifest, or
+the variants given on the command line) is built from scratch, without
+SubtreeCache, in its own process and one at a time so that the numbers do not
+depend on the other variants.  For every variant the build time, CPU time, peak
+RSS, the number of materials, shapes, volumes and placements and the size of
+the GDML file are recorded.
+
+The results of a run are appended as one JSON line to a results file, together
+with the git commit of the tree, so that runs on different commits can be
+compared.  Every run is compared with the last one made on another commit (or
+with --baseline), and a variant is reported as a regression when it got slower
+or bigger than --threshold times the baseline, or when its counts changed.
+
+Example:
+
+    dunendggd-benchmark
+    dunendggd-benchmark -r ~/bench.jsonl --repeat 3 empty sand_opt1
+    dunendggd-benchmark --baseline <commit> --threshold 1.2
+
+With --micro N it only times the position arithmetic of the LocalTools
+placement helpers for N elements, with pint Quantities element by element as
+they used to do and with linearPositions, without building anything.
+'''
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import resource
+import subprocess
+import multiprocessing
+from collections import OrderedDict
+
+import gegede
+
+from duneggd import build
+from duneggd import gdmlfile
+from duneggd.LocalTools import localtools as ltools
+
+default_results = 'dunendggd_benchmark.jsonl'
+# figures compared between runs, with the absolute change below which a
+# change is noise (s, s, MB, bytes); the counts must not change at all
+timed = OrderedDict([('wall', 1.), ('cpu', 1.), ('maxrss', 10.), ('bytes', 0)])
+counted = ['matter', 'shapes', 'volumes', 'placements']
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def git_commit():
+    """
+    Return the commit of the working tree, with a "-dirty" suffix if it has
+    uncommitted changes, or None outside of a git checkout.
+    """
+    top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=top,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', 'duneggd', 'setup.py'], cwd=top,
+                                stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+def store_counts( geom ):
+    """
+    Return the number of materials, shapes, volumes and placements in the store.
+    """
+    kinds = [type(v).__name__ for v in geom.store.structure.values()]
+    return OrderedDict([('matter', len(geom.store.matter)), ('shapes', len(geom.store.shapes)),
+                        ('volumes', kinds.count('Volume')), ('placements', kinds.count('Placement'))])
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def bench_variant( args ):
+    """
+    Worker entry point: build one variant with its output in <outdir> and
+    return its figures as a dict (with an "error" entry if it failed).
+    """
+    variant, outdir = args
+    output = os.path.join(outdir, variant.name + gdmlfile.splitext(variant.output)[1])
+    log = open(output+'.log', 'w')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+
+    ret = OrderedDict()
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        geom, cache = build.generate(variant.configs, variant.world, output)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        ret['error'] = '%s: %s' % (type(e).__name__, e)
+        geom = None
+    ret['wall'] = time.perf_counter() - t0
+    ret['cpu'] = time.process_time() - c0
+    ret['maxrss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.    # kB -> MB
+    if geom is not None:
+        ret['bytes'] = os.path.getsize(output)
+        ret.update(store_counts(geom))
+        os.remove(output)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return ret
+
+def run( variants, outdir, repeat=1 ):
+    """
+    Build every variant <repeat> times, one fresh process per build, and
+    return an OrderedDict variant name -> figures.  The times and memory are
+    the minimum over the repetitions.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    results = OrderedDict()
+    for v in variants:
+        best = None
+        for i in range(repeat):
+            with multiprocessing.Pool(1) as pool:
+                res = pool.apply(bench_variant, ((v, outdir),))
+            if 'error' in res:
+                best = res
+                break
+            if best is None:
+                best = res
+            else:
+                for k in ['wall', 'cpu', 'maxrss']:
+                    best[k] = min(best[k], res[k])
+        print(format_result(v.name, best))
+        sys.stdout.flush()
+        results[v.name] = best
+    return results
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def load_runs( filename ):
+    """
+    Return the list of runs recorded in a results file, oldest first.
+    """
+    runs = []
+    if not os.path.exists(filename):
+        return runs
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                runs.append(json.loads(line, object_pairs_hook=OrderedDict))
+    return runs
+
+def find_baseline( runs, commit, baseline=None ):
+    """
+    Return the last run made on the <baseline> commit (a prefix is enough), or
+    by default the last run made on another commit than <commit>.
+    """
+    for r in reversed(runs):
+        if baseline is not None:
+            if r.get('commit') and r['commit'].startswith(baseline):
+                return r
+        elif r.get('commit') != commit:
+            return r
+    return None
+
+def compare( results, base, threshold ):
+    """
+    Return the list of regressions of <results> with respect to the results
+    of the baseline run <base>, as text.
+    """
+    regressions = []
+    for name, res in results.items():
+        old = base['results'].get(name)
+        if old is None or 'error' in old:
+            continue
+        if 'error' in res:
+            regressions.append('%s: failed, %s' % (name, res['error']))
+            continue
+        for k, noise in timed.items():
+            if old.get(k) and res[k] > threshold * old[k] and res[k] - old[k] > noise:
+                regressions.append('%s: %s %.4g -> %.4g (x%.2f)' % (name, k, old[k], res[k], res[k]/old[k]))
+        for k in counted:
+            if k in old and res[k] != old[k]:
+                regressions.append('%s: %s %d -> %d' % (name, k, old[k], res[k]))
+    return regressions
+
+def format_result( name, res ):
+    if 'error' in res:
+        return '%-32s FAILED %s' % (name, res['error'])
+    return '%-32s %8.1fs %8.1fs %9.1f MB %8.1f MB %8d %8d %8d' % (
+        name, res['wall'], res['cpu'], res['maxrss'], res['bytes']/1024./1024.,
+        res['shapes'], res['volumes'], res['placements'])
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def placement_micro( n, repeat=3 ):
+    """
+    Time the positions of n elements stacked along z as placeBuilders does,
+    stepping with Quantities and with ltools.linearPositions, and return the
+    best times in s of both.
+    """
+    Q = gegede.Quantity
+    TranspV, sb_dim, gap = [0,0,1], [Q('0.5cm'), Q('0.5cm'), Q('5mm')], Q('0.1mm')
+    start = [Q('0m'), Q('0m'), Q('-1m')]
+
+    def quantities():
+        positions = []
+        pos = start
+        for elem in range(n):
+            step = [ t*d for t,d in zip(TranspV, sb_dim) ]
+            pos = [ p+s for p,s in zip(pos,step) ]
+            positions.append( [p.to('cm').magnitude for p in pos] )
+            pos = [p+s+t*gap for p,s,t in zip(pos,step,TranspV)]
+        return positions
+
+    def arrays():
+        step = [ t*d for t,d in zip(TranspV, ltools.cmValues(sb_dim)) ]
+        return ltools.linearPositions( ltools.cmValues(start), [step]*n, [ t*gap.to('cm').magnitude for t in TranspV ] )
+
+    best, results = [], []
+    for func in (quantities, arrays):
+        times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            positions = func()
+            times.append(time.perf_counter() - t0)
+        best.append(min(times))
+        results.append(positions)
+    assert all(abs(a-b) < 1e-6 for p, q in zip(*results) for a, b in zip(p, q)), 'positions differ'
+    return best
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the construction of dunendggd geometries')
+    parser.add_argument('-m', '--manifest', default=build.default_manifest,
+                        help='Manifest of variants, default is %(default)s')
+    parser.add_argument('-r', '--results', default=default_results,
+                        help='Results file the run is appended to, default is %(default)s')
+    parser.add_argument('-d', '--outdir', default=None,
+                        help='Directory for the temporary outputs and the logs, default is next to the results')
+    parser.add_argument('-n', '--repeat', type=int, default=1,
+                        help='Build every variant this many times and keep the best figures')
+    parser.add_argument('-b', '--baseline', default=None,
+                        help='Compare with the last run on this commit, default is the last run on another commit')
+    parser.add_argument('-t', '--threshold', type=float, default=1.25,
+                        help='Report a regression when a figure grows by more than this factor, default is %(default)s')
+    parser.add_argument('--micro', type=int, default=None, metavar='N',
+                        help='Only time the placement arithmetic for N elements')
+    parser.add_argument('variants', nargs='*', default=['bench'],
+                        help='Variant names or groups, default is "bench"')
+    args = parser.parse_args()
+
+    if args.micro:
+        slow, fast = placement_micro(args.micro, args.repeat)
+        print('placement of %d elements: %.4fs with Quantities, %.4fs with linearPositions (x%.0f, numpy %s)' % (
+            args.micro, slow, fast, slow/fast, 'on' if ltools.numpy is not None else 'off'))
+        return
+
+    try:
+        variants = build.select_variants(build.read_manifest(args.manifest), args.variants)
+    except ValueError as e:
+        parser.error(str(e))
+    outdir = args.outdir or os.path.join(os.path.dirname(os.path.abspath(args.results)), 'dunendggd_benchmark')
+
+    commit = git_commit()
+    print('%-32s %9s %9s %12s %11s %8s %8s %8s' % ('variant', 'wall', 'cpu', 'maxrss', 'gdml', 'shapes', 'volumes', 'placemnt'))
+    results = run(variants, outdir, args.repeat)
+
+    record = OrderedDict([('commit', commit), ('date', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                          ('host', socket.gethostname()), ('cpus', os.cpu_count()),
+                          ('python', platform.python_version()), ('gegede', gegede.__version__),
+                          ('repeat', args.repeat), ('results', results)])
+    runs = load_runs(args.results)
+    with open(args.results, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+    base = find_baseline(runs, commit, args.baseline)
+    if base is None:
+        print('No baseline run in %s to compare with' % args.results)
+        regressions = []
+    else:
+        if base.get('host') != record['host']:
+            print('Warning: baseline run was made on %s, not on this host' % base.get('host'))
+        regressions = compare(results, base, args.threshold)
+        print('Compared with %s (%s): %d regressions' % (base.get('commit'), base.get('date'), len(regressions)))
+        for r in regressions:
+            print('    ' + r)
+
+    if regressions or any('error' in r for r in results.values()):
+        sys.exit(1)
+
+
+if '__main__' == __name__:
+    main()
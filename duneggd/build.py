@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+'''
+Build several geometry variants in parallel.
+
+The variants are listed in a manifest (by default duneggd/Config/build_manifest.cfg,
+which mirrors build_hall.sh).  Each variant is generated in its own worker process
+of a pool sized to the machine, and a report with the wall time, CPU time and
+peak RSS of every variant is printed at the end.
+
+Example:
+
+    dunendggd-build prod
+    dunendggd-build -j 4 -d /data/geometries miniproduction1_tms miniproduction1_tms_nosand
+    dunendggd-build --cache ~/.cache/dunendggd all
+    dunendggd-build --lod coarse sand_opt2
+
+Only the variants whose inputs (see duneggd.depgraph) changed since their last
+build in the output directory are built again, unless --force is given.
+
+With --lod coarse or medium, the builders which have a level of detail (see
+LocalTools.localtools.lod_levels) build homogenised volumes in place of their
+finest structures, and the outputs get a _coarse or _medium suffix.
+
+With --dedup shapes, the identical positions, rotations and shapes are merged
+before the export, and with --dedup all the identical volumes too, see
+duneggd.dedup.
+
+The GDML outputs are written element by element by duneggd.gdmlstream, the
+same bytes as gegede's exporter but without holding the whole document.
+Outputs named .gdml.gz (or .gdml.zst) in the manifest are compressed while
+they are written, and --compress gz or zst compresses every output, see
+duneggd.gdmlfile.
+
+With --overlaps, every geometry is checked for overlaps (see duneggd.overlaps)
+before it is exported, and a geometry with overlaps fails without an output.
+The tolerance is an input of the build, and --overlap-jobs shares out the
+volumes of each geometry to that many processes.
+
+With --table, the table of the placements of every geometry with their global
+transformations (see duneggd.geotable) is written to <output>.table.npz.
+'''
+
+import os
+import sys
+import time
+import resource
+import inspect
+import argparse
+import configparser
+import multiprocessing
+from collections import namedtuple
+
+from duneggd import subtreecache
+from duneggd import depgraph
+from duneggd import profiling
+from duneggd import dedup as dedup_pass
+from duneggd import gdmlstream
+from duneggd import gdmlfile
+from duneggd import overlaps as overlap_check
+from duneggd import geotable
+from duneggd.LocalTools import localtools as ltools
+from duneggd.LocalTools import tpcmap
+
+config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Config')
+default_manifest = os.path.join(config_dir, 'build_manifest.cfg')
+
+Variant = namedtuple('Variant', 'name groups world output configs')
+Result = namedtuple('Result', 'name output status wall cpu maxrss cache error')
+dedup_modes = ['shapes', 'all']
+compress_modes = ['gz', 'zst']
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def read_manifest( filename=default_manifest ):
+    """
+    Return the list of Variants described in the manifest, in file order.
+    The cfg files are resolved relative to duneggd/Config.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    if not parser.read(filename):
+        raise IOError('Can not read build manifest "%s"' % filename)
+
+    variants = []
+    for name in parser.sections():
+        sec = parser[name]
+        configs = [os.path.join(config_dir, c) for c in sec['configs'].split()]
+        variants.append(Variant(name, sec.get('groups', '').split(), sec.get('world', 'World'),
+                                sec['output'], configs))
+    return variants
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def select_variants( variants, options ):
+    """
+    Return the variants selected by the options, either by variant name or by
+    one of their groups (as the first argument of build_hall.sh).
+    """
+    known = set(v.name for v in variants)
+    for v in variants:
+        known.update(v.groups)
+    unknown = [o for o in options if o not in known]
+    if unknown:
+        raise ValueError('Unknown variant or group: %s' % ', '.join(unknown))
+
+    selected = [v for v in variants if v.name in options or set(v.groups) & set(options)]
+
+    outputs = {}
+    for v in selected:
+        if v.output in outputs:
+            raise ValueError('Variants "%s" and "%s" write the same output "%s"'
+                             % (outputs[v.output], v.name, v.output))
+        outputs[v.output] = v.name
+    return selected
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def apply_lod( cfg, wbuilder, lod ):
+    """
+    Set the level of detail in the cfg section of every builder under the
+    world builder which has one, unless its section sets it already.  Done in
+    the cfg so that it is part of the SubtreeCache keys.
+    """
+    if lod not in ltools.lod_levels:
+        raise ValueError('Unknown level of detail "%s", use one of %s' % (lod, ', '.join(ltools.lod_levels)))
+    for b, parent, depth in profiling.walk(wbuilder):
+        klass = type(b)
+        if 'lod' in getattr(klass, 'defaults', {}) or 'lod' in inspect.signature(klass.configure).parameters:
+            cfg[b.name].setdefault('lod', lod)
+
+def lod_output( output, lod ):
+    """
+    Return the name of the output at the given level of detail.
+    """
+    if lod == 'full':
+        return output
+    base, ext = gdmlfile.splitext(output)
+    return base + '_' + lod + ext
+
+def compressed_variant( variant, compress ):
+    """
+    Return the variant with its GDML output compressed with 'gz' or 'zst'.
+    """
+    base, ext = gdmlfile.splitext(variant.output)
+    if not ext.startswith('.gdml'):
+        return variant
+    return variant._replace(output=base + '.gdml.' + compress)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def generate_geometry( wbuilder, cache=None, profiler=None ):
+    """
+    Return the geometry constructed by the world builder, as
+    gegede.main.generate_geometry() but optionally through a SubtreeCache
+    and under a BuildProfiler.
+    """
+    import gegede.construct
+    import gegede.builder
+
+    geom = gegede.construct.Geometry()
+    if profiler is not None:
+        profiler.__enter__()
+    try:
+        if cache is None:
+            gegede.builder.construct(wbuilder, geom)
+        else:
+            cache.construct(wbuilder, geom)
+    finally:
+        if profiler is not None:
+            profiler.__exit__(*sys.exc_info())
+    assert len(wbuilder.volumes) == 1, 'Top level builder "%s" must only produce one LV, produced %d' % (wbuilder.name, len(wbuilder.volumes))
+    geom.set_world(wbuilder.get_volume(0))
+    return geom
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def generate( configs, world, output, cachedir=None, cachesize=None, profile=False, lod='full', dedup=None, level=None, overlaps=None, table=False, overlap_jobs=1 ):
+    """
+    Generate one geometry and export it, the same as gegede-cli does, at the
+    given level of detail.
+    With <cachedir>, subtrees are taken from and saved to a SubtreeCache.
+    With <profile>, the construction is profiled per builder into
+    <output>.profile.txt and <output>.profile.json.
+    With <dedup> "shapes" or "all", the duplicates are removed before the
+    export (see duneggd.dedup), "all" merges the volumes too.
+    With <overlaps> (a tolerance in cm), the geometry is checked for
+    overlaps first and not exported if it has some, reusing the verdicts
+    of the volumes unchanged since a check with the same <cachedir>, over
+    <overlap_jobs> processes.
+    GDML is written by duneggd.gdmlstream, other formats by gegede.  A
+    .gdml.gz or .gdml.zst output is compressed at the given <level>.  The
+    TPC maps of the ArgonCube arrays, if any, are written to
+    <output>.tpcmap.json.
+    With <table>, the table of the placements of the geometry as written
+    is saved to <output>.table.npz (see duneggd.geotable).
+    Return the geometry and the cache (or None).
+    """
+    import gegede.main
+    from gegede.export import Exporter
+
+    cfg = gegede.main.parse_config(configs)
+    wbuilder = gegede.main.make_builder(cfg, world)
+    apply_lod(cfg, wbuilder, lod)
+    gegede.main.configure_builder(cfg, wbuilder)
+
+    cache = None
+    if cachedir:
+        cache = subtreecache.SubtreeCache(cfg, cachedir, cachesize or subtreecache.default_max_size)
+    profiler = profiling.BuildProfiler(wbuilder) if profile else None
+    geom = generate_geometry(wbuilder, cache, profiler)
+    if profiler is not None:
+        with open(output+'.profile.txt', 'w') as f:
+            f.write(profiler.report()+'\n')
+        profiler.save(output+'.profile.json')
+    if cache is not None:
+        print(cache.report())
+        cache.evict()
+    # before the volumes are merged
+    maps = tpcmap.worldMaps(geom, wbuilder)
+    if dedup:
+        print(dedup_pass.Dedup(geom, volumes=(dedup == 'all')).run().report())
+    if overlaps is not None:
+        checker = overlap_check.OverlapChecker(geom, overlaps, jobs=overlap_jobs, cachedir=cachedir)
+        found = checker.run()
+        print(checker.report())
+        if found:
+            raise ValueError('%d overlaps, %s is not written' % (len(found), output))
+
+    ext = gdmlfile.splitext(output)[1][1:]
+    if ext.split('.')[0] == 'gdml':
+        gdmlstream.write(geom, output, level)
+    elif gdmlfile.compression(output):
+        raise ValueError('Only GDML outputs can be compressed, not "%s"' % output)
+    else:
+        exporter = Exporter(ext)
+        exporter.convert(geom)
+        exporter.output(output)
+    if maps is not None:
+        tpcmap.write(maps, output+'.tpcmap.json')
+    if table:
+        geotable.write(geotable.table(geom), output+'.table.npz')
+    return geom, cache
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Worker(multiprocessing.Process):
+    """ a pool worker which may have children, daemons may not """
+    @property
+    def daemon( self ):
+        return False
+
+    @daemon.setter
+    def daemon( self, value ):
+        pass
+
+class WorkerContext(type(multiprocessing.get_context())):
+    Process = Worker
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def build_variant( args ):
+    """
+    Worker entry point: build one variant with its stdout/stderr sent to
+    <output>.log, and return its Result.
+    """
+    variant, outdir, cachedir, cachesize, profile, lod, dedup, level, overlaps, table, overlap_jobs = args
+    output = os.path.join(outdir, lod_output(variant.output, lod))
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    # the builders print a lot, keep each variant in its own log
+    log = open(output+'.log', 'w')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+
+    status, error, cache = 'ok', '', ''
+    t0, c0 = time.time(), time.process_time()
+    try:
+        geom, subtrees = generate(variant.configs, variant.world, output, cachedir, cachesize, profile, lod, dedup, level, overlaps, table, overlap_jobs)
+        if subtrees is not None:
+            cache = subtrees.summary()
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        status, error = 'FAILED', '%s: %s' % (type(e).__name__, e)
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    wall, cpu = time.time() - t0, time.process_time() - c0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.    # kB -> MB
+    return Result(variant.name, output, status, wall, cpu, maxrss, cache, error)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def run( variants, outdir='.', jobs=None, cachedir=None, cachesize=None, profile=False, lod='full', dedup=None, level=None, overlaps=None, table=False, overlap_jobs=1 ):
+    """
+    Build the variants over a process pool and return their Results in
+    completion order.  Every worker builds a single variant so that peak RSS
+    is measured per variant.  The workers share the SubtreeCache in <cachedir>.
+    The workers are not daemons, so that they can start the <overlap_jobs>
+    processes of their overlap check.
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(variants)) or 1
+    # start the variants with the most cfg files (the big halls) first
+    ordered = sorted(variants, key=lambda v: len(v.configs), reverse=True)
+
+    results = []
+    with WorkerContext().Pool(jobs, maxtasksperchild=1) as pool:
+        for res in pool.imap_unordered(build_variant, [(v, outdir, cachedir, cachesize, profile, lod, dedup, level, overlaps, table, overlap_jobs) for v in ordered]):
+            print('%-32s %-7s %9.1fs %9.1f MB' % (res.name, res.status, res.wall, res.maxrss))
+            sys.stdout.flush()
+            results.append(res)
+    return results
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def outdated( variants, outdir, stamps, force=False, lod='full', dedup=None, table=False, overlaps=None ):
+    """
+    Return the variants that need to be built, because an input changed since
+    the stamped build of their output (or it is missing, or its table with
+    <table>), and the current inputs of every variant.  The table is an input:
+    asking for it builds again the outputs stamped without it.
+    """
+    todo, inputs = [], {}
+    for v in variants:
+        try:
+            inputs[v.name] = depgraph.inputs(v.configs, v.world, lod, dedup, overlaps, table)
+        except Exception:
+            # the build will report the problem
+            inputs[v.name] = None
+            todo.append(v)
+            continue
+        if force:
+            todo.append(v)
+        elif not os.path.exists(os.path.join(outdir, lod_output(v.output, lod))):
+            print('%-32s missing' % v.name)
+            todo.append(v)
+        elif table and not os.path.exists(os.path.join(outdir, lod_output(v.output, lod))+'.table.npz'):
+            print('%-32s missing table' % v.name)
+            todo.append(v)
+        else:
+            changed = depgraph.changes(stamps.get(lod_output(v.output, lod)), inputs[v.name])
+            if changed:
+                more = ' ...' if len(changed) > 5 else ''
+                print('%-32s changed %s%s' % (v.name, ' '.join(changed[:5]), more))
+                todo.append(v)
+            else:
+                print('%-32s up-to-date' % v.name)
+    sys.stdout.flush()
+    return todo, inputs
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def report( results, elapsed ):
+    """
+    Return a text report of the Results.
+    """
+    lines = ['%-32s %-7s %10s %10s %12s  %s' % ('variant', 'status', 'wall [s]', 'cpu [s]', 'maxrss [MB]', 'output')]
+    for r in sorted(results, key=lambda r: r.wall, reverse=True):
+        lines.append('%-32s %-7s %10.1f %10.1f %12.1f  %s' % (r.name, r.status, r.wall, r.cpu, r.maxrss, r.output))
+        if r.cache:
+            lines.append('    cache: '+r.cache)
+        if r.error:
+            lines.append('    '+r.error)
+    serial = sum(r.wall for r in results)
+    lines.append('%d variants in %.1fs (%.1fs if built serially)' % (len(results), elapsed, serial))
+    return '\n'.join(lines)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    parser = argparse.ArgumentParser(description='Build dunendggd geometry variants in parallel')
+    parser.add_argument('-m', '--manifest', default=default_manifest,
+                        help='Manifest of variants, default is %(default)s')
+    parser.add_argument('-d', '--outdir', default='.',
+                        help='Directory for the outputs and their logs')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of worker processes, default is the number of cores')
+    parser.add_argument('-c', '--cache', default=None, nargs='?', const=subtreecache.default_cache_dir,
+                        help='Reuse builder subtrees from a SubtreeCache in this directory, default is %(const)s')
+    parser.add_argument('--cache-size', default='2GB',
+                        help='Maximum size of the SubtreeCache, default is %(default)s')
+    parser.add_argument('-p', '--profile', action='store_true',
+                        help='Profile the builders of each variant into <output>.profile.txt/.json')
+    parser.add_argument('--lod', default='full', choices=ltools.lod_levels,
+                        help='Level of detail of the builders which have one, default is %(default)s')
+    parser.add_argument('--dedup', default=None, choices=dedup_modes,
+                        help='Merge the identical positions, rotations and shapes ("shapes") and also the volumes ("all") before the export')
+    parser.add_argument('-z', '--compress', default=None, choices=compress_modes,
+                        help='Compress every GDML output, as <output>.gz or <output>.zst')
+    parser.add_argument('--compress-level', type=int, default=None,
+                        help='Compression level, default is %s' % ', '.join('%d for %s' % (l, k) for k, l in gdmlfile.default_levels.items()))
+    parser.add_argument('--overlaps', type=float, default=None, nargs='?', const=overlap_check.default_tolerance,
+                        help='Check the overlaps before the export and fail the variants which have some, '
+                             'ignoring those up to this depth in cm, default is %(const)g')
+    parser.add_argument('--overlap-jobs', type=int, default=1,
+                        help='Number of processes of the overlap check of each variant, default is %(default)d')
+    parser.add_argument('-t', '--table', action='store_true',
+                        help='Write the table of the placements with their global transformations to <output>.table.npz')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Rebuild the variants even if none of their inputs changed')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='List the variants and exit')
+    parser.add_argument('variants', nargs='*', default=['prod'],
+                        help='Variant names or groups (as in build_hall.sh), default is "prod"')
+    args = parser.parse_args()
+
+    variants = read_manifest(args.manifest)
+    if args.list:
+        for v in variants:
+            print('%-32s %-40s %s' % (v.name, ' '.join(v.groups), v.output))
+        return
+
+    try:
+        selected = select_variants(variants, args.variants)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.compress:
+        selected = [compressed_variant(v, args.compress) for v in selected]
+
+    t0 = time.time()
+    stamps = depgraph.load_stamps(args.outdir)
+    todo, inputs = outdated(selected, args.outdir, stamps, args.force, args.lod, args.dedup, args.table, args.overlaps)
+    results = []
+    if todo:
+        results = run(todo, args.outdir, args.jobs, args.cache, subtreecache.parse_size(args.cache_size),
+                      args.profile, args.lod, args.dedup, args.compress_level, args.overlaps, args.table, args.overlap_jobs)
+    print(report(results, time.time() - t0))
+
+    # remember the inputs of what was built, for the next incremental build
+    outputs = dict((v.name, lod_output(v.output, args.lod)) for v in todo)
+    for r in results:
+        if r.status == 'ok' and inputs.get(r.name):
+            stamps[outputs[r.name]] = inputs[r.name]
+    depgraph.save_stamps(args.outdir, stamps)
+
+    if any(r.status != 'ok' for r in results):
+        sys.exit(1)
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+'''
+Structural deduplication of a constructed geometry before it is exported.
+
+Many builders make identical objects under different names: a frame shape per
+module, a zero rotation per placement, the same tube for every straw, a volume
+per stave.  Dedup gives every position, rotation, shape and volume of the store
+a structural key, and keeps only the first object of each key:
+
+  - positions and rotations are keyed by their values in the GDML units, and
+    the zero ones are replaced by no position or rotation at all (the GDML
+    "center" and "identity"),
+  - shapes by their GDML element without the name, the parts and transform
+    of a Boolean being deduplicated first,
+  - volumes by material, shape, auxiliary parameters and the list of their
+    placements (daughter volume, position, rotation and copy number), the
+    daughters being deduplicated first, so that whole identical subtrees
+    collapse onto the first one.
+
+The references of the Booleans and placements are rewritten to the objects
+kept, and the duplicates are removed from the store, together with the
+placements of the removed volumes.  Two objects get the same key only if they
+export to the same GDML but for their names, so the geometry is unchanged.
+
+Merging volumes loses their names, which some analyses use to identify a
+detector element, so it can be switched off with volumes=False.
+
+Example:
+
+    stats = Dedup(geom).run()
+    print(stats.report())
+'''
+
+from collections import OrderedDict
+
+from lxml import etree
+from gegede.export import gdml
+
+booleans = ('Boolean', 'Union', 'Subtraction', 'Intersection')
+kinds = ['positions', 'rotations', 'shapes', 'volumes', 'placements']
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Dedup(object):
+    """
+    Deduplication of the store of a gegede Geometry, see the module
+    docstring.  After run(), <dropped> holds the number of objects removed
+    per kind and <saved> an estimate of the GDML bytes saved.
+    """
+
+    def __init__( self, geom, volumes=True ):
+        self.geom = geom
+        self.volumes = volumes
+        self.dropped = OrderedDict((k, 0) for k in kinds)
+        self.saved = 0
+        # name -> name of the object kept, for the shapes and the structure,
+        # and key -> name of the object kept
+        self.shapes = {}
+        self.canon = {}
+        self.keys = {}
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def run( self ):
+        structure = self.geom.store.structure
+        # the placements with no position or rotation refer to "center" and
+        # "identity", the zero ones can do so too unless these are not zero
+        self.zero = {}
+        for kind, name in [('Position', 'center'), ('Rotation', 'identity')]:
+            obj = structure.get(name)
+            if obj is None or (type(obj).__name__ == kind and not any(v.magnitude for v in obj[1:])):
+                self.zero[kind] = None
+        for name, obj in list(structure.items()):
+            if type(obj).__name__ in ('Position', 'Rotation'):
+                self.transform(name)
+        for name in list(self.geom.store.shapes):
+            self.shape(name)
+        for name, obj in list(structure.items()):
+            if type(obj).__name__ == 'Placement':
+                self.rewrite(name)
+        for name, obj in list(structure.items()):
+            if type(obj).__name__ != 'Volume':
+                continue
+            if self.volumes:
+                self.volume(name)
+            elif obj.shape in self.shapes:
+                structure[name] = obj._replace(shape=self.shapes[obj.shape])
+        if self.volumes and self.geom.world:
+            self.geom.set_world(self.canon.get(self.geom.world, self.geom.world))
+        self.drop()
+        return self
+
+    def keep( self, name, key, canon ):
+        """
+        Return the name of the object kept for <key>, <name> if it is the first.
+        """
+        kept = self.keys.setdefault(key, name)
+        canon[name] = kept
+        return kept
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def transform( self, name ):
+        """
+        Return the name of the position or rotation kept for <name>, None
+        for a zero one which can be left out.
+        """
+        if name is None or name in self.canon:
+            return self.canon.get(name)
+        obj = self.geom.store.structure[name]
+        kind = type(obj).__name__
+        attrs = gdml.nt_qunit2xmldict(obj, 'cm' if kind == 'Position' else 'degree')
+        del attrs['name']
+        key = (kind,) + tuple(sorted(attrs.items()))
+        if kind in self.zero and not any(float(attrs[k]) for k in 'xyz'):
+            self.keys.setdefault(key, None)
+        return self.keep(name, key, self.canon)
+
+    def shape( self, name ):
+        """
+        Return the name of the shape kept for <name>.
+        """
+        if name in self.shapes:
+            return self.shapes[name]
+        shapes = self.geom.store.shapes
+        obj = shapes[name]
+        if type(obj).__name__ in booleans:
+            obj = obj._replace(first=self.shape(obj.first), second=self.shape(obj.second),
+                               pos=self.transform(obj.pos), rot=self.transform(obj.rot))
+            shapes[name] = obj
+        node = gdml.make_shape_node(obj)
+        del node.attrib['name']
+        return self.keep(name, ('shape', etree.tostring(node)), self.shapes)
+
+    def rewrite( self, name ):
+        """
+        Point a placement to the positions, rotations and volumes kept.
+        """
+        structure = self.geom.store.structure
+        obj = structure[name]
+        new = obj._replace(volume=self.canon.get(obj.volume, obj.volume),
+                           pos=self.transform(obj.pos), rot=self.transform(obj.rot))
+        if new != obj:
+            structure[name] = new
+        return new
+
+    def volume( self, name ):
+        """
+        Return the name of the volume kept for <name>.
+        """
+        if name in self.canon:
+            return self.canon[name]
+        structure = self.geom.store.structure
+        obj = structure[name]
+        daughters = []
+        for pname in obj.placements or []:
+            self.volume(structure[pname].volume)
+            p = self.rewrite(pname)
+            daughters.append((p.volume, p.pos, p.rot, p.copynumber or 0))
+        shape = self.shapes.get(obj.shape, obj.shape)
+        if shape != obj.shape:
+            structure[name] = obj._replace(shape=shape)
+        key = ('volume', obj.material, shape, tuple(daughters), tuple(map(tuple, obj.params or [])))
+        return self.keep(name, key, self.canon)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def drop( self ):
+        """
+        Remove the objects which were replaced by another one.
+        """
+        structure, shapes = self.geom.store.structure, self.geom.store.shapes
+        for name, kept in self.shapes.items():
+            if kept != name:
+                self.dropped['shapes'] += 1
+                self.saved += len(etree.tostring(gdml.make_shape_node(shapes.pop(name)))) + 5
+        for name, kept in self.canon.items():
+            if kept == name or name in ('center', 'identity'):
+                continue
+            obj = structure.pop(name)
+            kind = type(obj).__name__
+            if kind == 'Volume':
+                self.dropped['volumes'] += 1
+                self.saved += len(etree.tostring(gdml.make_volume_node(obj, structure))) + 5
+                for pname in obj.placements or []:
+                    structure.pop(pname)
+                    self.dropped['placements'] += 1
+            else:
+                attrs = gdml.nt_qunit2xmldict(obj, 'cm' if kind == 'Position' else 'degree')
+                self.dropped[kind.lower()+'s'] += 1
+                self.saved += len(etree.tostring(etree.Element(kind.lower(), **attrs))) + 5
+
+    def report( self ):
+        """
+        Return a one line summary of what was removed.
+        """
+        return 'dedup: removed %d objects (%s), about %.1f kB of GDML' % (
+            sum(self.dropped.values()),
+            ', '.join('%d %s' % (n, k) for k, n in self.dropped.items()),
+            self.saved / 1024.)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+'''
+Dependencies of a geometry output on its configuration.
+
+The inputs of an output are the cfg sections of the builders it is made of
+(found by walking the subbuilders from the world section), the {SECTION:key}
+interpolations these sections read from other sections, the sources of the
+builder classes and of LocalTools, and the gegede version.  Each input gets a
+fingerprint, and the fingerprints of the last successful build of every output
+are kept in a stamp file next to the outputs, so that an output only needs to be
+regenerated when one of its inputs changed.  The level of detail the output is
+built at is an input too, and so are the deduplication of the store, the
+tolerance of the overlap check before the export, if any, and the table of the
+nodes written next to the output, with the sources it is made by.
+'''
+
+import os
+import copy
+import json
+import hashlib
+import inspect
+from collections import OrderedDict
+
+import gegede
+import gegede.configuration
+from gegede.util import make_class
+
+stamp_name = '.dunendggd_deps.json'
+duneggd_dir = os.path.dirname(os.path.abspath(__file__))
+localtools_dir = os.path.join(duneggd_dir, 'LocalTools')
+# modules between the builders and the output file
+pipeline_sources = ['build.py', 'dedup.py', 'gdmlstream.py', 'gdmlfile.py', 'overlaps.py']
+# and between the geometry and its table, with --table
+table_sources = ['geotable.py', 'locator.py']
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def digest( obj ):
+    """
+    Return the fingerprint of a string or of a json-able object.
+    """
+    if not isinstance(obj, str):
+        obj = json.dumps(obj, sort_keys=True)
+    return hashlib.sha256(obj.encode()).hexdigest()
+
+def file_digest( filename ):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def references( value, secname ):
+    """
+    Return the (section, key) pairs interpolated in a raw cfg value.
+    """
+    refs = []
+    for m in gegede.configuration.interp_reobj.findall(value):
+        if ':' in m:
+            refs.append(tuple(m.split(':', 1)))
+        else:
+            refs.append((secname, m))
+    return refs
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def builder_sections( pod, world ):
+    """
+    Return the names of the sections of the builders reachable from the world,
+    <pod> holds the interpolated but not evaluated sections.
+    """
+    sections = []
+    todo = [world]
+    while todo:
+        name = todo.pop(0)
+        if name in sections:
+            continue
+        if name not in pod:
+            raise ValueError('No such builder configuration section: "%s"' % name)
+        sections.append(name)
+        if pod[name].get('subbuilders'):
+            # subbuilders may refer to the other values of the section
+            dat = gegede.configuration.evaluate(OrderedDict([(name, pod[name])]))
+            todo += list(dat[name]['subbuilders'])
+    return sections
+
+def inputs( configs, world, lod='full', dedup=None, overlaps=None, table=False ):
+    """
+    Return an OrderedDict of the inputs of the geometry built from the cfg files
+    with the given world builder at the given level of detail, dedup mode and
+    overlap tolerance, and of its table with <table>, input name -> fingerprint.
+
+    Input names are "[SECTION]" for the builder sections, "{SECTION:key}" for
+    values interpolated from other sections, and "source:<file>" for sources.
+    """
+    raw = gegede.configuration.cfg2pod(gegede.configuration.parse(configs))
+    pod = copy.deepcopy(raw)
+    gegede.configuration.interpolate(pod)
+    sections = builder_sections(pod, world)
+
+    ret = OrderedDict()
+    ret['gegede'] = gegede.__version__
+    ret['lod'] = lod
+    if dedup:
+        ret['dedup'] = dedup
+    if overlaps is not None:
+        ret['overlaps'] = overlaps
+    if table:
+        ret['table'] = True
+
+    refs = []
+    for name in sections:
+        ret['[%s]' % name] = digest(list(raw[name].items()))
+        for v in raw[name].values():
+            refs += references(v, name)
+
+    # the interpolated values, and what they interpolate in turn
+    seen = set()
+    while refs:
+        sec, key = refs.pop(0)
+        if sec in sections or (sec, key) in seen:
+            continue
+        seen.add((sec, key))
+        value = raw.get(sec, {}).get(key)
+        ret['{%s:%s}' % (sec, key)] = digest(str(value))
+        if value is not None:
+            refs += references(value, sec)
+
+    files = set(os.path.join(localtools_dir, f) for f in os.listdir(localtools_dir) if f.endswith('.py'))
+    files.update(os.path.join(duneggd_dir, f) for f in pipeline_sources)
+    if table:
+        files.update(os.path.join(duneggd_dir, f) for f in table_sources)
+    for name in sections:
+        klass = make_class(pod[name]['class'])
+        for k in inspect.getmro(klass):
+            if k.__module__.startswith('gegede') or k is object:
+                continue
+            try:
+                files.add(inspect.getsourcefile(k))
+            except TypeError:
+                pass
+    for f in sorted(f for f in files if f):
+        ret['source:'+os.path.relpath(f, os.path.dirname(duneggd_dir))] = file_digest(f)
+    return ret
+
+def changes( old, new ):
+    """
+    Return the names of the inputs that differ between two inputs() results.
+    """
+    old = old or {}
+    return [k for k in sorted(set(old) | set(new)) if old.get(k) != new.get(k)]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def load_stamps( outdir ):
+    """
+    Return the inputs of the last successful build of every output in outdir.
+    """
+    try:
+        with open(os.path.join(outdir, stamp_name)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def save_stamps( outdir, stamps ):
+    path = os.path.join(outdir, stamp_name)
+    os.makedirs(outdir, exist_ok=True)
+    with open(path+'.tmp', 'w') as f:
+        json.dump(stamps, f, indent=1, sort_keys=True)
+    os.replace(path+'.tmp', path)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+'''
+Compressed GDML files.
+
+The GDML of the halls is very repetitive XML, which gzip or zstd make about
+ten times smaller.  open_gdml() opens a GDML file for writing compressed as
+its name says (foo.gdml.gz or foo.gdml.zst, plain otherwise) and for reading
+whatever its compression (from its first bytes, not its name):
+
+    with gdmlfile.open_gdml('foo.gdml.gz', 'wb', level=6) as f:
+        gdmlstream.stream(geom, f)
+    tree = gdmlfile.parse('foo.gdml.gz')
+
+gzip is written by pigz, with several threads, when it is in the PATH, else
+by the gzip module.  zstd needs the zstandard module, which is optional and
+compresses with as many threads as cores.
+
+Geant4 and ROOT only read plain GDML, the files are decompressed (or
+compressed) by copying them to a name with the other extension:
+
+    python -m duneggd.gdmlfile foo.gdml.gz foo.gdml
+
+load() reads the structure of a GDML file written by gegede back into a gegede
+Geometry, e.g. for duneggd.locator.
+'''
+
+import os
+import gzip
+import shutil
+import argparse
+import subprocess
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compressions = {'.gz': 'gzip', '.zst': 'zstd'}
+magics = {b'\x1f\x8b': 'gzip', b'\x28\xb5\x2f\xfd': 'zstd'}
+default_levels = {'gzip': 6, 'zstd': 10}
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def splitext( filename ):
+    """
+    As os.path.splitext, but with the compression extension kept with the
+    one before it: 'foo.gdml.gz' -> ('foo', '.gdml.gz').
+    """
+    base, ext = os.path.splitext(filename)
+    if ext in compressions:
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+    return base, ext
+
+def compression( filename ):
+    """
+    Return the compression given by the name of the file ('gzip', 'zstd' or None).
+    """
+    return compressions.get(os.path.splitext(filename)[1])
+
+def sniff( filename ):
+    """
+    Return the compression of an existing file from its first bytes.
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(4)
+    for magic, name in magics.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class PipeWriter(object):
+    """
+    Binary file writing through the stdin of a compressor process.
+    """
+    def __init__( self, filename, command ):
+        self.out = open(filename, 'wb')
+        self.command = command
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=self.out)
+
+    def write( self, data ):
+        return self.proc.stdin.write(data)
+
+    def close( self ):
+        if self.proc is None:
+            return
+        self.proc.stdin.close()
+        status = self.proc.wait()
+        self.out.close()
+        self.proc = None
+        if status != 0:
+            raise IOError('%s exited with status %d' % (' '.join(self.command), status))
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
+
+def open_gdml( filename, mode='rb', level=None, threads=None ):
+    """
+    Open a GDML file in binary mode.  Read, the compression is found from the
+    content of the file; written, from its name, with the compression level
+    (default in default_levels) and number of threads (default all cores) of
+    the compressor.
+    """
+    if mode not in ('rb', 'wb'):
+        raise ValueError('GDML files are opened "rb" or "wb", not "%s"' % mode)
+
+    if mode == 'rb':
+        kind = sniff(filename)
+        if kind == 'gzip':
+            return gzip.open(filename, 'rb')
+        if kind == 'zstd':
+            if zstandard is None:
+                raise ImportError('Reading %s needs the zstandard module' % filename)
+            return zstandard.open(filename, 'rb')
+        return open(filename, 'rb')
+
+    kind = compression(filename)
+    if kind is None:
+        return open(filename, 'wb')
+    if level is None:
+        level = default_levels[kind]
+    threads = threads or os.cpu_count() or 1
+    if kind == 'gzip':
+        pigz = shutil.which('pigz')
+        if pigz and threads > 1:
+            return PipeWriter(filename, [pigz, '-c', '-n', '-%d' % level, '-p', str(threads)])
+        # mtime 0 so that the same geometry gives the same file
+        return gzip.GzipFile(filename, 'wb', compresslevel=level, mtime=0)
+    if zstandard is None:
+        raise ImportError('Writing %s needs the zstandard module, or use .gdml.gz' % filename)
+    cctx = zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0)
+    return zstandard.open(filename, 'wb', cctx=cctx)
+
+def parse( filename ):
+    """
+    Return the lxml tree of a GDML file, compressed or not.
+    """
+    from lxml import etree
+    with open_gdml(filename) as f:
+        return etree.parse(f)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+# GDML solid -> gegede shape and its fields from the attributes, 'd' is a
+# dimension the exporter of gegede doubles, 'r' a length and 'a' an angle
+solids = {
+    'box': ('Box', (('dx', 'x', 'd'), ('dy', 'y', 'd'), ('dz', 'z', 'd'))),
+    'twistedbox': ('TwistedBox', (('dx', 'x', 'd'), ('dy', 'y', 'd'), ('dz', 'z', 'd'), ('phitws', 'PhiTwist', 'a'))),
+    'tube': ('Tubs', (('rmin', 'rmin', 'r'), ('rmax', 'rmax', 'r'), ('dz', 'z', 'd'),
+                      ('sphi', 'startphi', 'a'), ('dphi', 'deltaphi', 'a'))),
+    'sphere': ('Sphere', (('rmin', 'rmin', 'r'), ('rmax', 'rmax', 'r'), ('sphi', 'startphi', 'a'),
+                          ('dphi', 'deltaphi', 'a'), ('stheta', 'starttheta', 'a'), ('dtheta', 'deltatheta', 'a'))),
+    'cone': ('Cone', (('rmin1', 'rmin1', 'r'), ('rmax1', 'rmax1', 'r'), ('rmin2', 'rmin2', 'r'),
+                      ('rmax2', 'rmax2', 'r'), ('dz', 'z', 'd'), ('sphi', 'startphi', 'a'), ('dphi', 'deltaphi', 'a'))),
+    'trd': ('Trapezoid', (('dx1', 'x1', 'd'), ('dx2', 'x2', 'd'), ('dy1', 'y1', 'd'), ('dy2', 'y2', 'd'), ('dz', 'z', 'd'))),
+    'twistedtrd': ('TwistedTrd', (('dx1', 'x1', 'd'), ('dx2', 'x2', 'd'), ('dy1', 'y1', 'd'), ('dy2', 'y2', 'd'),
+                                  ('dz', 'z', 'd'), ('phitws', 'PhiTwist', 'a'))),
+    'paraboloid': ('Paraboloid', (('drlo', 'rlo', 'd'), ('drhi', 'rhi', 'd'), ('ddz', 'dz', 'd'))),
+    'ellipsoid': ('Ellipsoid', (('dax', 'ax', 'd'), ('dby', 'by', 'd'), ('dcz', 'cz', 'd'),
+                                ('dzcut1', 'zcut1', 'd'), ('dzcut2', 'zcut2', 'd'))),
+    'eltube': ('EllipticalTube', (('dx', 'dx', 'r'), ('dy', 'dy', 'r'), ('dz', 'dz', 'r'))),
+    'torus': ('Torus', (('rmin', 'rmin', 'r'), ('rmax', 'rmax', 'r'), ('rtor', 'rtor', 'r'),
+                        ('startphi', 'startphi', 'a'), ('deltaphi', 'deltaphi', 'a'))),
+}
+
+def load( filename ):
+    """
+    Return a gegede Geometry with the positions, rotations, shapes and volumes
+    of a GDML file, compressed or not, as the exporter of gegede writes them
+    (its full lengths and GDML's default units are read back).  The materials
+    are only names, for what reads the structure (duneggd.locator).
+    """
+    import gegede.construct
+    from gegede import Quantity as Q
+
+    tree = parse(filename)
+    geom = gegede.construct.Geometry()
+
+    def quantity( node, attr, unit ):
+        return Q(float(node.get(attr)), unit)
+
+    def define( node ):
+        tag = node.tag
+        if tag == 'position':
+            unit = node.get('unit', 'mm')
+            return geom.structure.Position(node.get('name'), *[Q(float(node.get(c, 0)), unit) for c in 'xyz'])
+        if tag == 'rotation':
+            unit = node.get('unit', 'radian')
+            return geom.structure.Rotation(node.get('name'), *[Q(float(node.get(c, 0)), unit) for c in 'xyz'])
+        return None
+
+    def ref( node, kind, default ):
+        """ name of a positionref/rotationref, or of an inline position/rotation """
+        for child in node:
+            if child.tag == kind + 'ref':
+                name = child.get('ref')
+                return name if name in geom.store.structure else None
+            if child.tag == kind:
+                if child.get('name') is None:
+                    child.set('name', '%s_%s' % (node.get('name') or default, kind))
+                return define(child).name
+        return None
+
+    for node in tree.getroot().iterfind('define/*'):
+        # the center and identity which the exporter adds are None placements
+        if node.get('name') in ('center', 'identity') and len(node.attrib) == 1:
+            continue
+        define(node)
+
+    for node in tree.getroot().iterfind('solids/*'):
+        tag, name = node.tag, node.get('name')
+        if tag in ('union', 'subtraction', 'intersection'):
+            first, second = node.find('first').get('ref'), node.find('second').get('ref')
+            maker = getattr(geom.shapes, tag.capitalize())
+            maker(name, first=first, second=second,
+                  pos=ref(node, 'position', name), rot=ref(node, 'rotation', name))
+            continue
+        if tag == 'polyhedra':
+            planes = node.findall('zplane')
+            lunit = node.get('lunit', 'mm')
+            rmin, rmax = set(p.get('rmin', '0') for p in planes), set(p.get('rmax') for p in planes)
+            z = sorted(float(p.get('z')) for p in planes)
+            if len(planes) != 2 or len(rmin) != 1 or len(rmax) != 1 or z[0] != -z[1]:
+                raise ValueError('%s: only polyhedra of two symmetric planes of the same radii are read' % name)
+            geom.shapes.PolyhedraRegular(name, numsides=int(node.get('numsides')),
+                                         sphi=quantity(node, 'startphi', node.get('aunit', 'radian')),
+                                         dphi=quantity(node, 'deltaphi', node.get('aunit', 'radian')),
+                                         rmin=Q(float(rmin.pop()), lunit), rmax=Q(float(rmax.pop()), lunit),
+                                         dz=Q(z[1], lunit))
+            continue
+        if tag not in solids:
+            raise ValueError('%s: %s solids are not read' % (name, tag))
+        typename, fields = solids[tag]
+        lunit, aunit = node.get('lunit', 'mm'), node.get('aunit', 'radian')
+        args = {}
+        for field, attr, kind in fields:
+            if node.get(attr) is None:
+                continue
+            if kind == 'a':
+                args[field] = quantity(node, attr, aunit)
+            else:
+                args[field] = quantity(node, attr, lunit) * (0.5 if kind == 'd' else 1.)
+        getattr(geom.shapes, typename)(name, **args)
+
+    for node in tree.getroot().iterfind('structure/*'):
+        name = node.get('name')
+        material = shape = None
+        if node.tag == 'volume':
+            material, shape = node.find('materialref').get('ref'), node.find('solidref').get('ref')
+        placements = []
+        for i, pv in enumerate(node.iterfind('physvol')):
+            volume = pv.find('volumeref').get('ref')
+            pname = pv.get('name') or '%s_in_%s_%d' % (volume, name, i)
+            pv.set('name', pname)
+            copynumber = int(pv.get('copynumber', 0))
+            placements.append(geom.structure.Placement(pname, volume=volume, copynumber=copynumber,
+                                                       pos=ref(pv, 'position', pname), rot=ref(pv, 'rotation', pname)).name)
+        params = [(aux.get('auxtype'), aux.get('auxvalue')) for aux in node.iterfind('auxiliary')]
+        geom.structure.Volume(name, material=material, shape=shape, placements=placements, params=params)
+
+    geom.set_world(tree.getroot().find('setup/world').get('ref'))
+    return geom
+
+def copy( src, dst, level=None, threads=None ):
+    """
+    Copy a GDML file, decompressing it and compressing it as their names say.
+    """
+    with open_gdml(src) as fin:
+        with open_gdml(dst, 'wb', level, threads) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    parser = argparse.ArgumentParser(description='Compress or decompress a GDML file as the output name says')
+    parser.add_argument('input', help='GDML file, compressed or not')
+    parser.add_argument('output', help='Output GDML file, .gdml.gz and .gdml.zst are compressed')
+    parser.add_argument('--level', type=int, default=None,
+                        help='Compression level, default is %s' % ', '.join('%d for %s' % (l, k) for k, l in default_levels.items()))
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Threads of the compressor, default is the number of cores')
+    args = parser.parse_args()
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        parser.error('The input and output are the same file')
+    copy(args.input, args.output, args.level, args.threads)
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+'''
+Streaming GDML export.
+
+The GDML exporter of gegede builds the lxml tree of the whole document and
+then serialises it into one string before writing it, so that for the full
+hall geometries the export needs several times the memory of the store.
+write() makes the same elements with the make_*_node functions of the
+exporter, but serialises and writes them one at a time: the memory needed is
+that of the largest element, and the file is byte for byte the one gegede
+writes (pretty printed, with its quotes workaround for ROOT).
+
+    gdmlstream.write(geom, 'out.gdml')
+    gdmlstream.write(geom, 'out.gdml.gz', level=6)
+
+The compatibility with the exporter of gegede is checked by building a
+geometry as gegede-cli does and comparing both outputs:
+
+    python -m duneggd.gdmlstream --check -w World -o out.gdml cfg1 cfg2 ...
+'''
+
+import sys
+import argparse
+
+from lxml import etree
+from gegede.iter import ascending
+from gegede.export import gdml
+
+from duneggd import gdmlfile
+
+xsi_location = '{http://www.w3.org/2001/XMLSchema-instance}noNamespaceSchemaLocation'
+indent = b'  '
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def define_nodes( geom ):
+    """
+    Yield the elements of <define>, in the order of gdml.convert().
+    """
+    center = identity = None
+    for name, obj in geom.store.structure.items():
+        typename = type(obj).__name__.lower()
+        if typename == 'position':
+            yield etree.Element('position', **gdml.nt_qunit2xmldict(obj, 'cm'))
+            if obj.name == 'center':
+                center = obj
+        elif typename == 'rotation':
+            yield etree.Element('rotation', **gdml.nt_qunit2xmldict(obj, 'degree'))
+            if obj.name == 'identity':
+                identity = obj
+    for name, obj in geom.store.matter.items():
+        if type(obj).__name__.lower() in ('mixture', 'molecule', 'amalgam'):
+            for prop, val in obj.properties:
+                yield etree.Element('matrix', name=name+'_'+prop+'_VALUE', coldim=str(len(val)),
+                                    values=' '.join(str(v) for v in val))
+    if center is None:
+        yield etree.Element('position', name='center')
+    if identity is None:
+        yield etree.Element('rotation', name='identity')
+
+def material_nodes( geom ):
+    for obj in geom.store.matter.values():
+        yield gdml.make_material_node(obj)
+
+def solid_nodes( geom ):
+    for obj in geom.store.shapes.values():
+        yield gdml.make_shape_node(obj)
+
+def volume_nodes( geom ):
+    for vol in ascending(geom.store.structure, geom.world):
+        assert vol
+        yield gdml.make_volume_node(vol, geom.store.structure)
+
+def setup_nodes( geom ):
+    yield etree.Element('world', ref=geom.world)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def serialise( node, depth ):
+    """
+    Return an element as it is in the pretty printed document at that depth.
+    """
+    text = etree.tostring(node, pretty_print=True).replace(b"'", b'"')
+    pad = indent*depth
+    return b''.join(pad+line for line in text.splitlines(True))
+
+def write_section( f, node, children ):
+    """
+    Write an element of the <gdml> element and its children one by one.
+    """
+    empty = serialise(node, 1)
+    opened = False
+    for child in children:
+        if child is None:
+            continue
+        if not opened:
+            f.write(empty[:-3] + b'>\n')
+            opened = True
+        f.write(serialise(child, 2))
+    if opened:
+        f.write(indent + b'</' + node.tag.encode() + b'>\n')
+    else:
+        f.write(empty)
+
+def stream( geom, f ):
+    """
+    Write the GDML of the geometry to the binary file f, element by element.
+    """
+    root = etree.Element('gdml')
+    root.set(xsi_location, 'http://service-spi.web.cern.ch/service-spi/app/releases/GDML/schema/gdml.xsd')
+    root.append(etree.Element('define'))
+    head = etree.tostring(root, pretty_print=True, xml_declaration=True).replace(b"'", b'"')
+    f.write(head[:head.index(b'<define')].rstrip(b' '))
+
+    write_section(f, etree.Element('define'), define_nodes(geom))
+    write_section(f, etree.Element('materials'), material_nodes(geom))
+    write_section(f, etree.Element('solids'), solid_nodes(geom))
+    write_section(f, etree.Element('structure'), volume_nodes(geom))
+    write_section(f, etree.Element('setup', name="Default", version="0"), setup_nodes(geom))
+    f.write(b'</gdml>\n')
+
+def write( geom, filename, level=None, threads=None ):
+    """
+    Write the GDML of the geometry to a file, the same as gegede's exporter,
+    compressed if the name ends in .gz or .zst (see duneggd.gdmlfile).
+    """
+    with gdmlfile.open_gdml(filename, 'wb', level, threads) as f:
+        stream(geom, f)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    import gegede.main
+    from duneggd import build
+
+    parser = argparse.ArgumentParser(description='Build a geometry and write its GDML element by element')
+    parser.add_argument('-w', '--world', required=True, help='World builder section')
+    parser.add_argument('-o', '--output', required=True, help='Output GDML file, compressed if it ends in .gz or .zst')
+    parser.add_argument('--check', action='store_true',
+                        help="Also export with gegede's exporter and check that the outputs are the same")
+    parser.add_argument('configs', nargs='+', help='Configuration files')
+    args = parser.parse_args()
+
+    cfg = gegede.main.parse_config(args.configs)
+    wbuilder = gegede.main.make_builder(cfg, args.world)
+    gegede.main.configure_builder(cfg, wbuilder)
+    geom = build.generate_geometry(wbuilder)
+    write(geom, args.output)
+
+    if args.check:
+        with gdmlfile.open_gdml(args.output) as f:
+            streamed = f.read()
+        exported = gdml.dumps(gdml.convert(geom))
+        if streamed != exported:
+            n = next((i for i, (a, b) in enumerate(zip(streamed, exported)) if a != b), min(len(streamed), len(exported)))
+            print('%s differs from the output of gegede at byte %d' % (args.output, n))
+            sys.exit(1)
+        print('%s is the same as the output of gegede (%d bytes)' % (args.output, len(streamed)))
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+'''
+Flat table of the placements of a geometry.
+
+geoInfo.C walks the nodes of a ROOT geometry with a TGeoIterator to print
+their global positions, one at a time and with ROOT.  A geotable has one row
+for every node of the geometry (every placement of every volume, down from the
+world) with its global transformation computed once, as NumPy columns:
+
+    parent, end     the row of the mother node, and the rows of the subtree
+                    of a node are row..end-1 (the rows are in the order of
+                    TGeoIterator, depth first)
+    depth           0 for the world
+    placement       index in placement_names, -1 for the world
+    volume          index in volume_names
+    material        index in material_names
+    copynumber
+    shape           index in shape_names, and shape_type in shape_types
+    transform       4x4, the point x of the volume is transform*(x,1) in the world
+    bbox_min/max    the box around the shape in the world
+
+with the names and 'world', 'unit' (of the lengths) and 'version'.  The
+placements of the daughters of assemblies are 'assembly placement/daughter
+placement', as in duneggd.locator, whose transformations of the daughters of
+every volume are accumulated down the tree one level at a time, all the nodes
+of the same volume together.
+
+The table is written by dunendggd-build --table next to the output as
+<output>.table.npz, uncompressed, and load() memory-maps its columns:
+
+    tab = geotable.load('foo.gdml.table.npz')
+    rows = geotable.rows(tab, 'volSTPlaneTarget')
+    centers = tab['transform'][rows, :3, 3]
+    geotable.path(tab, rows[0])                 # 'volWorld/volDetEnclosure_pos/...'
+
+    python -m duneggd.geotable -g foo.gdml.gz -o foo.table.npz
+    python -m duneggd.geotable -w STT -o stt.table.npz SAND_INNERVOLOPT2.cfg SAND_STT.cfg
+'''
+
+import time
+import struct
+import zipfile
+import argparse
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from gegede import Quantity as Q
+from duneggd import locator
+
+version = 1
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def table( geom, world=None, unit='cm' ):
+    """
+    Return the table of the nodes of a geometry (or of a GDML file) as a dict
+    of arrays, with its lengths in the unit given.
+    """
+    loc = locator.Locator(geom, world)
+    structure = loc.geom.store.structure
+    factor = Q(1, 'cm').to(unit).magnitude
+    top = loc.volume_index[loc.world]
+
+    # the number of nodes under every volume, itself included, and the row of
+    # its daughters after its own
+    sizes, offsets = {}, {}
+    def size( vol ):
+        if vol not in sizes:
+            mother = loc.mother(vol)
+            if mother is None:
+                sizes[vol] = 1
+            else:
+                n = np.array([size(v) for v in mother.volumes], dtype=np.int64)
+                offsets[vol] = 1 + np.cumsum(n) - n
+                sizes[vol] = 1 + int(n.sum())
+        return sizes[vol]
+    n = size(top)
+
+    parent = np.full(n, -1, dtype=np.int64)
+    depth = np.zeros(n, dtype=np.int32)
+    placement = np.full(n, -1, dtype=np.int32)
+    volume = np.full(n, top, dtype=np.int32)
+    copynumber = np.zeros(n, dtype=np.int32)
+    shape = np.full(n, loc.shape(structure[loc.world].shape), dtype=np.int32)
+    R = np.empty((n, 3, 3))
+    t = np.empty((n, 3))
+    R[0], t[0] = np.identity(3), 0.
+
+    level, lvl = {top: [np.zeros(1, dtype=np.int64)]}, 0
+    while level:
+        below = OrderedDict()
+        for vol, parts in level.items():
+            mother = loc.mother(vol)
+            if mother is None:
+                continue
+            rows = np.concatenate(parts)
+            k, d = len(rows), len(mother.placements)
+            child = (rows[:,None] + offsets[vol][None,:]).ravel()
+            dau = np.tile(np.arange(d), k)
+            # the point p of the world is R*(p-t) in the node, and R_d*(R*(p-t)-t_d)
+            # in a daughter placed by (R_d, t_d)
+            R[child] = np.einsum('dij,njk->ndik', mother.R, R[rows]).reshape(-1, 3, 3)
+            t[child] = (t[rows][:,None,:] + np.einsum('nji,dj->ndi', R[rows], mother.t)).reshape(-1, 3)
+            parent[child] = np.repeat(rows, d)
+            depth[child] = lvl + 1
+            placement[child] = mother.placements[dau]
+            volume[child] = mother.volumes[dau]
+            copynumber[child] = mother.copynumbers[dau]
+            shape[child] = mother.shapes[dau]
+            vols = mother.volumes[dau]
+            order = np.argsort(vols, kind='stable')
+            cuts = np.nonzero(np.diff(vols[order]))[0] + 1
+            for sel in np.split(order, cuts):
+                below.setdefault(vols[sel[0]], []).append(child[sel])
+        level = below
+        lvl += 1
+
+    transform = np.zeros((n, 4, 4))
+    transform[:,:3,:3] = R.transpose(0, 2, 1)
+    transform[:,:3,3] = t * factor
+    transform[:,3,3] = 1.
+    del R, t
+
+    # the bounding boxes of the shapes in the world
+    boxes = np.array([loc.solids.boundingBox(s) for s in loc.shapes]) * factor
+    lo, hi = boxes[shape,0], boxes[shape,1]
+    center = np.einsum('nij,nj->ni', transform[:,:3,:3], (lo + hi)/2) + transform[:,:3,3]
+    half = np.einsum('nij,nj->ni', np.abs(transform[:,:3,:3]), (hi - lo)/2)
+    del lo, hi
+
+    shape_types = sorted(set(type(loc.geom.store.shapes[s]).__name__ for s in loc.shapes))
+    shape_type = np.array([shape_types.index(type(loc.geom.store.shapes[s]).__name__) for s in loc.shapes],
+                          dtype=np.int32)[shape]
+    end = np.arange(n, dtype=np.int64) + np.array([sizes[v] for v in range(len(loc.volumes))], dtype=np.int64)[volume]
+    return dict(version=np.array(version), world=np.array(loc.world), unit=np.array(unit),
+                parent=parent, end=end, depth=depth, placement=placement, volume=volume,
+                material=np.asarray(loc.volume_material, dtype=np.int32)[volume],
+                copynumber=copynumber, shape=shape, shape_type=shape_type,
+                transform=transform, bbox_min=center - half, bbox_max=center + half,
+                placement_names=np.array(loc.placements), volume_names=np.array(loc.volumes),
+                material_names=np.array(loc.materials), shape_names=np.array(loc.shapes),
+                shape_types=np.array(shape_types))
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def write( tab, filename ):
+    """ an uncompressed .npz, which load() memory-maps """
+    np.savez(filename, **tab)
+
+def load( filename, mmap=True ):
+    """
+    Return the table of a .npz as a dict of arrays, memory-mapped unless
+    mmap is False (or they are compressed).
+    """
+    ret = {}
+    with zipfile.ZipFile(filename) as z:
+        infos = z.infolist()
+    with np.load(filename) as npz, open(filename, 'rb') as f:
+        for info in infos:
+            name = info.filename[:-len('.npy')]
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                ret[name] = npz[name]
+                continue
+            # the data of a stored member follows its local header, and
+            # the .npy header
+            f.seek(info.header_offset + 26)
+            skip = sum(struct.unpack('<HH', f.read(4)))
+            f.seek(info.header_offset + 30 + skip)
+            major = np.lib.format.read_magic(f)[0]
+            if major == 1:
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if not shape or 0 in shape or dtype.hasobject:
+                ret[name] = npz[name]
+                continue
+            ret[name] = np.memmap(filename, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                  order='F' if fortran else 'C')
+    return ret
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def path( tab, row ):
+    """ the path of placements of a node, from the world """
+    names = []
+    while row > 0:
+        names.append(str(tab['placement_names'][tab['placement'][row]]))
+        row = tab['parent'][row]
+    return '/'.join([str(tab['world'])] + names[::-1])
+
+def rows( tab, volume ):
+    """ the rows of the nodes of a logical volume """
+    index = np.nonzero(np.asarray(tab['volume_names']) == volume)[0]
+    if not len(index):
+        return np.zeros(0, dtype=np.int64)
+    return np.nonzero(np.asarray(tab['volume']) == index[0])[0]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    import gegede.main
+    from duneggd import build
+
+    parser = argparse.ArgumentParser(description='Write the table of the placements of a geometry')
+    parser.add_argument('-g', '--gdml', default=None, help='GDML file, instead of building the geometry')
+    parser.add_argument('-w', '--world', default=None, help='World builder section, or volume of the GDML')
+    parser.add_argument('--unit', default='cm', help='Unit of the lengths, default is cm')
+    parser.add_argument('-o', '--output', required=True, help='Output .npz')
+    parser.add_argument('configs', nargs='*', help='Configuration files')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    if args.gdml:
+        from duneggd import gdmlfile
+        geom, world = gdmlfile.load(args.gdml), args.world
+    else:
+        if not args.world or not args.configs:
+            parser.error('Give a GDML file or a world builder and configuration files')
+        cfg = gegede.main.parse_config(args.configs)
+        wbuilder = gegede.main.make_builder(cfg, args.world)
+        gegede.main.configure_builder(cfg, wbuilder)
+        geom, world = build.generate_geometry(wbuilder), None
+    print('geometry read in %.1f s' % (time.time() - t0))
+
+    t0 = time.time()
+    tab = table(geom, world, args.unit)
+    write(tab, args.output)
+    print('%d nodes in %.1f s' % (len(tab['parent']), time.time() - t0))
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+'''
+Vectorised point location.
+
+ArgonCube/TPCActive.py finds the TPC of a point from hardcoded centres and
+dimensions, one point at a time.  A Locator finds for a whole (N,3) NumPy
+array of points the deepest volume of the geometry which contains each one,
+the path of placements from the world down to it, their copy numbers and the
+material, from the geometry store or from a GDML file:
+
+    loc = locator.Locator(geom)                 # or Locator('foo.gdml.gz')
+    where = loc.locate(points, unit='mm')       # edep-sim positions
+    names = loc.volume_names(where)
+    tpc = loc.copy_of(where, 'volTPCActive')    # copy number, -1 outside
+    loc.path(where, 0)                          # 'volWorld/volDetEnclosure_pos/...'
+
+The points go down the tree one level at a time, all the points in the same
+logical volume together in its frame: for every mother the transformations of
+its daughters into their frame are precomputed as arrays, with a uniform grid
+of their bounding boxes, so that each point is only tested (with the point
+inside tests of duneggd.LocalTools.homogenise, as arrays) against the daughters
+of its cell, and the Python loops go over the shapes, not the points.  The
+daughters of assemblies are placed in the mother of the assembly, their
+placement is 'assembly placement/daughter placement' in the paths.
+
+Locating many points from the command line:
+
+    python -m duneggd.locator -g foo.gdml.gz -p points.npy --unit mm -o where.npz
+    python -m duneggd.locator -w Detector --random 1000000 ArgonCube/ArgonCube_2x2.cfg
+'''
+
+import time
+import argparse
+from collections import namedtuple, OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from gegede import Quantity as Q
+from duneggd.LocalTools import homogenise
+
+# a mother grids the bounding boxes of its daughters when it has more than
+# this many, with about cellsPerDaughter cells per daughter
+gridDaughters = 8
+cellsPerDaughter = 2
+
+# For each point: the index of its deepest volume in Locator.volumes and of its
+# material in Locator.materials (-1 outside the world), its depth (0 in the
+# world, -1 outside), and the indices in Locator.placements and copy numbers of
+# the placements from the world down (-1 below its depth)
+Location = namedtuple('Location', 'volume material depth placements copynumbers')
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def inPhi( x, y, sphi, dphi ):
+    if dphi >= homogenise.twopi:
+        return np.ones(len(x), dtype=bool)
+    return (np.arctan2(y, x) - sphi) % homogenise.twopi <= dphi
+
+def inside( solids, name, p ):
+    """
+    Solids.inside() for an (N,3) array of points in cm, an array of bools.
+    """
+    kind, d = solids.get(name)
+    x, y, z = p[:,0], p[:,1], p[:,2]
+    if kind in ('union', 'subtraction', 'intersection'):
+        ret = inside(solids, d['first'], p)
+        sel = ~ret if kind == 'union' else ret
+        q = (p[sel] - d['t']) @ np.asarray(d['R']).T
+        if len(q):
+            b = inside(solids, d['second'], q)
+            ret[sel] = b if kind != 'subtraction' else ~b
+        return ret
+
+    if kind in ('TwistedBox', 'TwistedTrd'):
+        a = -d['phitws'] * z / (2*d['dz'])
+        x, y = x*np.cos(a) - y*np.sin(a), x*np.sin(a) + y*np.cos(a)
+        kind = kind[7:].replace('Trd', 'Trapezoid')
+
+    if kind == 'Box':
+        return (np.abs(x) <= d['dx']) & (np.abs(y) <= d['dy']) & (np.abs(z) <= d['dz'])
+    if kind == 'Tubs':
+        r2 = x*x + y*y
+        return ((np.abs(z) <= d['dz']) & (d['rmin']**2 <= r2) & (r2 <= d['rmax']**2)
+                & inPhi(x, y, d['sphi'], d['dphi']))
+    if kind == 'Cone':
+        f = (z + d['dz']) / (2*d['dz'])
+        rmin = d['rmin1'] + (d['rmin2'] - d['rmin1'])*f
+        rmax = d['rmax1'] + (d['rmax2'] - d['rmax1'])*f
+        r2 = x*x + y*y
+        return ((np.abs(z) <= d['dz']) & (rmin**2 <= r2) & (r2 <= rmax**2)
+                & inPhi(x, y, d['sphi'], d['dphi']))
+    if kind == 'Sphere':
+        r = np.sqrt(x*x + y*y + z*z)
+        theta = np.arccos(np.divide(z, r, out=np.ones_like(r), where=r > 0))
+        return ((d['rmin'] <= r) & (r <= d['rmax']) & (d['stheta'] <= theta)
+                & (theta <= d['stheta'] + d['dtheta']) & inPhi(x, y, d['sphi'], d['dphi']))
+    if kind == 'Trapezoid':
+        f = (z + d['dz']) / (2*d['dz'])
+        return ((np.abs(z) <= d['dz']) & (np.abs(x) <= d['dx1'] + (d['dx2'] - d['dx1'])*f)
+                & (np.abs(y) <= d['dy1'] + (d['dy2'] - d['dy1'])*f))
+    if kind == 'PolyhedraRegular':
+        n = int(d['numsides'])
+        side = np.minimum((((np.arctan2(y, x) - d['sphi']) % homogenise.twopi) / (d['dphi']/n)).astype(int), n-1)
+        c = d['sphi'] + (side + 0.5)*d['dphi']/n
+        r = x*np.cos(c) + y*np.sin(c)
+        return ((np.abs(z) <= d['dz']) & inPhi(x, y, d['sphi'], d['dphi'])
+                & (d['rmin'] <= r) & (r <= d['rmax']))
+    if kind == 'EllipticalTube':
+        return (np.abs(z) <= d['dz']) & ((x/d['dx'])**2 + (y/d['dy'])**2 <= 1)
+    if kind == 'Ellipsoid':
+        zlo, zhi = solids.ellipsoidCuts(d)
+        return ((zlo <= z) & (z <= zhi)
+                & ((x/(2*d['dax']))**2 + (y/(2*d['dby']))**2 + (z/(2*d['dcz']))**2 <= 1))
+    if kind == 'Torus':
+        r2 = (np.sqrt(x*x + y*y) - d['rtor'])**2 + z*z
+        return ((d['rmin']**2 <= r2) & (r2 <= d['rmax']**2)
+                & inPhi(x, y, d['startphi'], d['deltaphi']))
+    if kind == 'Paraboloid':
+        r1, r2, dz = 2*d['drlo'], 2*d['drhi'], 2*d['ddz']
+        return (np.abs(z) <= dz) & (x*x + y*y <= (r2*r2 - r1*r1)/(2*dz)*z + (r2*r2 + r1*r1)/2)
+    raise ValueError('%s: no point inside test for %s shapes' % (name, kind))
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Mother(object):
+    """
+    The daughters of a logical volume as arrays: their placements, volumes,
+    shapes, copy numbers and transformations (the point p of the mother is
+    R*(p-t) in the daughter), and the grid of their bounding boxes.
+    """
+
+    def __init__( self, placements, volumes, shapes, copynumbers, R, t, lo, hi ):
+        self.placements = np.asarray(placements, dtype=np.int32)
+        self.volumes = np.asarray(volumes, dtype=np.int32)
+        self.shapes = np.asarray(shapes, dtype=np.int32)
+        self.copynumbers = np.asarray(copynumbers, dtype=np.int32)
+        self.R = np.asarray(R, dtype=float).reshape(-1, 3, 3)
+        self.t = np.asarray(t, dtype=float).reshape(-1, 3)
+        # the bounding boxes (lo, hi in their frame) in the mother, whose
+        # point R^T*c+t is the point c of the daughter
+        lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+        center = np.einsum('nji,nj->ni', self.R, (lo + hi)/2) + self.t
+        half = np.einsum('nji,nj->ni', np.abs(self.R), (hi - lo)/2)
+        self.lo, self.hi = center - half, center + half
+        self.cells = None
+        if len(self.placements) > gridDaughters:
+            self.make_grid()
+
+    def make_grid( self ):
+        """
+        The daughters of every cell, in order of placement: those of cell c are
+        items[offsets[c]:offsets[c+1]].
+        """
+        self.origin = self.lo.min(axis=0)
+        self.extent = extent = np.maximum(self.hi.max(axis=0) - self.origin, 1e-9)
+        # cubic cells, but for the directions thinner than one cell (planes)
+        target = cellsPerDaughter*len(self.placements)
+        free = np.ones(3, dtype=bool)
+        for i in range(3):
+            size = (np.prod(extent[free]) / target)**(1./free.sum())
+            thin = free & (extent < size)
+            if not thin.any() or thin.sum() == free.sum():
+                break
+            free &= ~thin
+        self.cells = np.where(free, np.clip(np.ceil(extent / size), 1, 4096), 1).astype(np.int64)
+        self.size = extent / self.cells
+        first = np.clip(np.floor((self.lo - self.origin) / self.size), 0, self.cells-1).astype(np.int64)
+        last = np.clip(np.floor((self.hi - self.origin) / self.size), 0, self.cells-1).astype(np.int64)
+        # the cells first..last of every daughter, z fastest
+        n = last - first + 1
+        count = np.prod(n, axis=1)
+        items = np.repeat(np.arange(len(n), dtype=np.int32), count)
+        k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        n, first = n[items], first[items]
+        ix, iy, iz = k // (n[:,1]*n[:,2]), (k // n[:,2]) % n[:,1], k % n[:,2]
+        cells = ((first[:,0] + ix)*self.cells[1] + first[:,1] + iy)*self.cells[2] + first[:,2] + iz
+        order = np.argsort(cells, kind='stable')
+        self.items = items[order]
+        self.offsets = np.searchsorted(cells[order], np.arange(np.prod(self.cells)+1))
+
+    def candidates( self, p ):
+        """
+        Return (points, daughters), the pairs of a point and a daughter whose
+        bounding box contains it, in order of point and then of daughter.
+        """
+        n = len(self.placements)
+        if self.cells is None:
+            pts = np.repeat(np.arange(len(p)), n)
+            dau = np.tile(np.arange(n, dtype=np.int32), len(p))
+        else:
+            u = p - self.origin
+            ok = np.all((u >= 0) & (u <= self.extent), axis=1)
+            pts = np.nonzero(ok)[0]
+            c = np.minimum(np.floor(u[ok] / self.size).astype(np.int64), self.cells-1)
+            cell = (c[:,0]*self.cells[1] + c[:,1])*self.cells[2] + c[:,2]
+            start, count = self.offsets[cell], self.offsets[cell+1] - self.offsets[cell]
+            pts = np.repeat(pts, count)
+            skip = np.repeat(np.cumsum(count) - count, count)
+            dau = self.items[np.repeat(start, count) + np.arange(len(pts)) - skip]
+        q = p[pts]
+        box = np.all((q >= self.lo[dau]) & (q <= self.hi[dau]), axis=1)
+        return pts[box], dau[box]
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Locator(object):
+    """
+    Locate arrays of points in the volumes of a geometry, or of a GDML file.
+    """
+
+    def __init__( self, geom, world=None ):
+        if np is None:
+            raise ImportError('The locator needs numpy')
+        if isinstance(geom, str):
+            from duneggd import gdmlfile
+            geom = gdmlfile.load(geom)
+        self.geom = geom
+        self.world = world or geom.world
+        self.solids = homogenise.Solids(geom)
+        self.factors = {}
+        self.transforms = {}
+        self.mothers = {}
+
+        self.volumes = []               # logical volumes, by index
+        self.volume_index = {}
+        self.materials = []
+        self.material_index = {}
+        self.volume_material = []       # volume index -> material index
+        self.shapes = []
+        self.shape_index = {}
+        self.placements = []            # names, 'assembly/daughter' in assemblies
+        self.placement_volume = []      # placement index -> volume index
+        self.depths = {}
+        self.volume(self.world)
+        if self.geom.store.structure[self.world].shape is None:
+            raise ValueError('The world %s is an assembly' % self.world)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def volume( self, name ):
+        """ index of a logical volume """
+        ret = self.volume_index.get(name)
+        if ret is None:
+            ret = self.volume_index[name] = len(self.volumes)
+            self.volumes.append(name)
+            material = self.geom.store.structure[name].material
+            if material not in self.material_index:
+                self.material_index[material] = len(self.materials)
+                self.materials.append(material)
+            self.volume_material.append(self.material_index[material])
+        return ret
+
+    def shape( self, name ):
+        ret = self.shape_index.get(name)
+        if ret is None:
+            ret = self.shape_index[name] = len(self.shapes)
+            self.shapes.append(name)
+        return ret
+
+    def depth( self, name ):
+        """ the number of levels of placements below a logical volume """
+        ret = self.depths.get(name)
+        if ret is None:
+            structure = self.geom.store.structure
+            vol = structure[name]
+            extra = 1 if vol.shape is not None else 0
+            ret = max([extra + self.depth(structure[p].volume) for p in vol.placements or []] or [0])
+            self.depths[name] = ret
+        return ret
+
+    def cm( self, q ):
+        """ a length in cm, Quantity.to() is slow for this many positions """
+        factor = self.factors.get(q.units)
+        if factor is None:
+            factor = self.factors[q.units] = Q(1, q.units).to('cm').magnitude
+        return q.magnitude * factor
+
+    def transform( self, pos, rot ):
+        """ (R, t) of a placement, in cm """
+        key = (pos, rot)
+        ret = self.transforms.get(key)
+        if ret is None:
+            structure = self.geom.store.structure
+            t = (0., 0., 0.)
+            if pos is not None:
+                p = structure[pos]
+                t = (self.cm(p.x), self.cm(p.y), self.cm(p.z))
+            R = homogenise.rotationMatrix(structure[rot] if rot is not None else None)
+            ret = self.transforms[key] = np.array(R), np.array(t)
+        return ret
+
+    def mother( self, vol ):
+        """ the Mother of the daughters of a logical volume, None without daughters """
+        if vol in self.mothers:
+            return self.mothers[vol]
+        structure = self.geom.store.structure
+        rows = []
+
+        def add( pnames, R0, t0, prefix ):
+            for pname in pnames or []:
+                place = structure[pname]
+                R, t = self.transform(place.pos, place.rot)
+                if prefix:
+                    # the mother point p is R*(R0*(p-t0)-t) = R*R0*(p-(t0+R0^T*t))
+                    R, t = R @ R0, t0 + R0.T @ t
+                daughter = structure[place.volume]
+                if daughter.shape is None:
+                    add(daughter.placements, R, t, prefix + pname + '/')
+                    continue
+                lo, hi = self.solids.boundingBox(daughter.shape)
+                index = len(self.placements)
+                self.placements.append(prefix + pname)
+                self.placement_volume.append(self.volume(place.volume))
+                rows.append((index, self.volume(place.volume), self.shape(daughter.shape),
+                             place.copynumber or 0, R, t, lo, hi))
+
+        add(structure[self.volumes[vol]].placements, None, None, '')
+        ret = Mother(*zip(*rows)) if rows else None
+        self.mothers[vol] = ret
+        return ret
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def locate( self, points, unit='cm' ):
+        """
+        Return the Location of an (N,3) array of points, in the unit given.
+        """
+        p = np.asarray(points, dtype=float).reshape(-1, 3)
+        factor = Q(1, unit).to('cm').magnitude
+        if factor != 1:
+            p = p * factor
+        n = len(p)
+        levels = self.depth(self.world)
+        volume = np.full(n, -1, dtype=np.int32)
+        depth = np.full(n, -1, dtype=np.int32)
+        placements = np.full((n, levels), -1, dtype=np.int32)
+        copynumbers = np.full((n, levels), -1, dtype=np.int32)
+
+        world = self.volume_index[self.world]
+        idx = np.nonzero(inside(self.solids, self.geom.store.structure[self.world].shape, p))[0]
+        level = {world: [(idx, p[idx])]}
+        lvl = 0
+        while level:
+            below = OrderedDict()
+            for vol, parts in level.items():
+                idx = np.concatenate([i for i, q in parts])
+                q = np.concatenate([q for i, q in parts])
+                volume[idx] = vol
+                depth[idx] = lvl
+                mother = self.mother(vol)
+                if mother is None:
+                    continue
+                pts, dau = mother.candidates(q)
+                local = np.einsum('nij,nj->ni', mother.R[dau], q[pts] - mother.t[dau])
+                ok = np.zeros(len(pts), dtype=bool)
+                shapes = mother.shapes[dau]
+                for s in np.unique(shapes):
+                    sel = np.nonzero(shapes == s)[0]
+                    ok[sel] = inside(self.solids, self.shapes[s], local[sel])
+                pts, dau, local = pts[ok], dau[ok], local[ok]
+                # a point in several daughters is in the first one placed, the
+                # pairs are by point and then by daughter
+                first = np.ones(len(pts), dtype=bool)
+                first[1:] = pts[1:] != pts[:-1]
+                pts, dau, local = pts[first], dau[first], local[first]
+                placements[idx[pts], lvl] = mother.placements[dau]
+                copynumbers[idx[pts], lvl] = mother.copynumbers[dau]
+                vols = mother.volumes[dau]
+                for v in np.unique(vols):
+                    sel = np.nonzero(vols == v)[0]
+                    below.setdefault(v, []).append((idx[pts[sel]], local[sel]))
+            level = below
+            lvl += 1
+
+        material = np.where(volume >= 0, np.asarray(self.volume_material, dtype=np.int32)[volume], -1)
+        return Location(volume, material, depth, placements, copynumbers)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def volume_names( self, where ):
+        """ array of the names of the deepest volumes, '' outside the world """
+        names = np.array(self.volumes + [''])
+        return names[where.volume]
+
+    def material_names( self, where ):
+        names = np.array(self.materials + [''])
+        return names[where.material]
+
+    def path( self, where, i ):
+        """ the path of placements of the point i, from the world """
+        if where.depth[i] < 0:
+            return ''
+        return '/'.join([self.world] + [self.placements[j] for j in where.placements[i,:where.depth[i]]])
+
+    def copy_of( self, where, volume ):
+        """
+        The copy number of the placement of a logical volume in the path of
+        every point, -1 where it is not in the path, e.g. the module of the
+        points in an ArgonCube TPC.
+        """
+        v = self.volume_index.get(volume, -2)
+        pv = np.asarray(self.placement_volume + [-1], dtype=np.int32)[where.placements]
+        hit = pv == v
+        level = np.argmax(hit, axis=1)
+        ret = np.take_along_axis(where.copynumbers, level[:,None], axis=1)[:,0]
+        return np.where(hit.any(axis=1), ret, -1)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    import gegede.main
+    from duneggd import build
+
+    parser = argparse.ArgumentParser(description='Locate points in the volumes of a geometry')
+    parser.add_argument('-g', '--gdml', default=None, help='GDML file, instead of building the geometry')
+    parser.add_argument('-w', '--world', default=None, help='World builder section, or volume of the GDML')
+    parser.add_argument('-p', '--points', default=None, help='.npy file of an (N,3) array of points')
+    parser.add_argument('--random', type=int, default=0,
+                        help='Locate this many random points in the box of the world instead')
+    parser.add_argument('--unit', default='cm', help='Unit of the points, default is cm')
+    parser.add_argument('-o', '--output', default=None, help='.npz file of the Location and the names')
+    parser.add_argument('configs', nargs='*', help='Configuration files')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    if args.gdml:
+        loc = Locator(args.gdml, args.world)
+    else:
+        if not args.world or not args.configs:
+            parser.error('Give a GDML file or a world builder and configuration files')
+        cfg = gegede.main.parse_config(args.configs)
+        wbuilder = gegede.main.make_builder(cfg, args.world)
+        gegede.main.configure_builder(cfg, wbuilder)
+        loc = Locator(build.generate_geometry(wbuilder))
+    print('geometry read in %.1f s' % (time.time() - t0))
+
+    if args.points:
+        points = np.load(args.points)
+    elif args.random:
+        lo, hi = loc.solids.boundingBox(loc.geom.store.structure[loc.world].shape)
+        factor = Q(1, 'cm').to(args.unit).magnitude
+        points = np.random.default_rng(0).uniform(lo, hi, (args.random, 3)) * factor
+    else:
+        parser.error('Give the points or a number of random points')
+
+    t0 = time.time()
+    where = loc.locate(points, args.unit)
+    dt = time.time() - t0
+    print('%d points located in %.2f s (%.2f us per point)' % (len(points), dt, 1e6*dt/max(len(points), 1)))
+    names, counts = np.unique(loc.volume_names(where), return_counts=True)
+    for i in np.argsort(-counts)[:20]:
+        print('%10d  %s' % (counts[i], names[i] or '(outside)'))
+
+    if args.output:
+        np.savez(args.output, volumes=np.array(loc.volumes), materials=np.array(loc.materials),
+                 placement_names=np.array(loc.placements), **where._asdict())
+
+
+if '__main__' == __name__:
+    main()
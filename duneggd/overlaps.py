@@ -0,0 +1,712 @@
+#!/usr/bin/env python
+'''
+Overlap check of a constructed geometry, without ROOT.
+
+checkOverlaps.C exports the GDML, imports it in ROOT and runs CheckOverlaps.
+OverlapChecker works on the gegede store instead.  An overlap is a property of
+a logical volume and its daughters, the same for every placement of it, so
+every volume with daughters is checked once, in its own frame:
+
+  - the bounding boxes of the daughters (homogenise.Solids) are put in a
+    uniform grid of cells, and only the daughters whose boxes share a cell
+    and overlap by more than the tolerance are compared,
+  - convex daughters (Box, Trapezoid, full PolyhedraRegular and Tubs
+    without a hole) are compared exactly with GJK on the shapes shrunk by
+    the tolerance, round daughters on parallel axes (Tubs with a hole
+    included) analytically,
+  - every daughter is checked to be inside its mother, exactly by the
+    support functions of the daughter against the faces of a convex mother
+    or analytically for round shapes on parallel axes,
+  - the other shapes (Booleans, Cones, partial Tubs...) are sampled on a
+    grid of <points> points in the common box, so thin overlaps between them
+    can be missed.
+
+The bounding boxes are those of the daughters in the frame of their mother,
+not bounding volumes of the placed nodes in the world: two nodes can only
+overlap in Geant4 if they are daughters of the same volume (or one is outside
+its mother, which is checked), so the check per volume finds the same
+overlaps as a world-space one without flattening the tree, and is done once
+for all the placements of a volume.
+
+The volumes are shared out to a process pool (fork only, serial elsewhere),
+of <jobs> processes; dunendggd-build --overlaps uses --overlap-jobs.
+
+The verdicts of a volume only depend on its shape and on the shapes and
+transformations of its daughters, which make its fingerprint.  A volume with
+the same fingerprint as one already checked (another module of the same kind,
+or the same volume in a previous build with <cachedir>) reuses its verdicts,
+so that after a change only the volumes it touched are checked again.
+The depth of an exact overlap is the largest shrinking of both shapes for
+which they still overlap, doubled; sampled overlaps have no depth.
+
+Example:
+
+    checker = OverlapChecker(geom, tolerance=1e-5)
+    found = checker.run()
+    print(checker.report())
+
+or from the command line, as gegede-cli:
+
+    python -m duneggd.overlaps -w World a.cfg b.cfg
+'''
+
+import os
+import sys
+import math
+import pickle
+import hashlib
+import argparse
+import itertools
+import multiprocessing
+from collections import namedtuple, defaultdict, OrderedDict, Counter
+
+from gegede import Quantity as Q
+from duneggd.LocalTools import homogenise
+
+# cm, the 1e-5 of checkOverlaps.C
+default_tolerance = 1e-5
+default_points = 1000
+version = 1
+
+Overlap = namedtuple('Overlap', 'mother kind first second depth')
+
+twopi = 2*math.pi
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def dot( a, b ):
+    return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+def sub( a, b ):
+    return (a[0]-b[0], a[1]-b[1], a[2]-b[2])
+
+def cross( a, b ):
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+def neg( a ):
+    return (-a[0], -a[1], -a[2])
+
+def rotate( R, u ):
+    """ R*u """
+    return (dot(R[0], u), dot(R[1], u), dot(R[2], u))
+
+def gjk( supa, supb, maxiter=64 ):
+    """
+    Return True if the convex shapes with support functions supa and supb
+    intersect, False if not, None if undecided.
+    """
+    def support( d ):
+        return sub(supa(d), supb(neg(d)))
+
+    def line( s ):
+        a, b = s
+        ab, ao = sub(b, a), neg(a)
+        if dot(ab, ao) > 0:
+            return [a, b], cross(cross(ab, ao), ab)
+        return [a], ao
+
+    def triangle( s ):
+        a, b, c = s
+        ab, ac, ao = sub(b, a), sub(c, a), neg(a)
+        abc = cross(ab, ac)
+        if dot(cross(abc, ac), ao) > 0:
+            if dot(ac, ao) > 0:
+                return [a, c], cross(cross(ac, ao), ac)
+            return line([a, b])
+        if dot(cross(ab, abc), ao) > 0:
+            return line([a, b])
+        if dot(abc, ao) > 0:
+            return [a, b, c], abc
+        return [a, c, b], neg(abc)
+
+    s = [support((1., 0., 0.))]
+    d = neg(s[0])
+    for i in range(maxiter):
+        if dot(d, d) == 0:
+            # the origin is on the simplex, the shapes touch
+            return True
+        p = support(d)
+        if dot(p, d) < 0:
+            return False
+        s = [p] + s
+        if len(s) == 2:
+            s, d = line(s)
+        elif len(s) == 3:
+            s, d = triangle(s)
+        else:
+            a, b, c, e = s
+            ab, ac, ae, ao = sub(b, a), sub(c, a), sub(e, a), neg(a)
+            if dot(cross(ab, ac), ao) > 0:
+                s, d = triangle([a, b, c])
+            elif dot(cross(ac, ae), ao) > 0:
+                s, d = triangle([a, c, e])
+            elif dot(cross(ae, ab), ao) > 0:
+                s, d = triangle([a, e, b])
+            else:
+                return True
+    return None
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Convex(object):
+    """
+    A convex shape shrunk by <shrink> cm, in the frame where the point p of
+    the shape is the point R*(p-t): a polyhedron (vertices and face planes
+    n.p <= h in its own frame) or a cylinder along its own z axis.
+    """
+
+    def __init__( self, kind, d, R, t, shrink=0. ):
+        self.R, self.t = R, t
+        self.verts = self.planes = None
+        self.radius = self.dz = None
+        e = shrink
+        if kind == 'Tubs':
+            self.radius, self.dz = d['rmax'] - e, d['dz'] - e
+            self.empty = self.radius <= 0 or self.dz <= 0
+            return
+        if kind == 'Box':
+            hx1 = hx2 = d['dx'] - e
+            hy1 = hy2 = d['dy'] - e
+            dz = d['dz'] - e
+        elif kind == 'Trapezoid':
+            hx1, hx2, hy1, hy2 = d['dx1'] - e, d['dx2'] - e, d['dy1'] - e, d['dy2'] - e
+            dz = d['dz'] - e
+        if kind in ('Box', 'Trapezoid'):
+            self.empty = min(hx1, hx2, hy1, hy2, dz) <= 0
+            self.verts = [(sx*hx, sy*hy, z) for z, hx, hy in ((-dz, hx1, hy1), (dz, hx2, hy2))
+                          for sx in (-1, 1) for sy in (-1, 1)]
+            self.planes = [((0., 0., 1.), dz), ((0., 0., -1.), dz)]
+            for s in (-1, 1):
+                for axis, h1, h2 in ((0, hx1, hx2), (1, hy1, hy2)):
+                    n = [0., 0., -(h2 - h1)]
+                    n[axis] = s*2*dz
+                    norm = math.sqrt(dot(n, n))
+                    n = (n[0]/norm, n[1]/norm, n[2]/norm)
+                    self.planes.append((n, (h1 + h2)/2 * 2*dz/norm))
+            return
+        # full PolyhedraRegular without a hole, rmax is the apothem
+        nsides = int(d['numsides'])
+        apothem, dz = d['rmax'] - e, d['dz'] - e
+        self.empty = apothem <= 0 or dz <= 0
+        r = apothem / math.cos(math.pi/nsides)
+        step = d['dphi']/nsides
+        self.verts = [(r*math.cos(d['sphi'] + k*step), r*math.sin(d['sphi'] + k*step), z)
+                      for k in range(nsides) for z in (-dz, dz)]
+        self.planes = [((0., 0., 1.), dz), ((0., 0., -1.), dz)]
+        for k in range(nsides):
+            c = d['sphi'] + (k + 0.5)*step
+            self.planes.append(((math.cos(c), math.sin(c), 0.), apothem))
+
+    def local_support( self, u ):
+        if self.verts is not None:
+            return max(self.verts, key=lambda v: dot(u, v))
+        rho = math.hypot(u[0], u[1])
+        z = self.dz if u[2] >= 0 else -self.dz
+        if rho == 0:
+            return (0., 0., z)
+        return (self.radius*u[0]/rho, self.radius*u[1]/rho, z)
+
+    def support( self, u ):
+        """ the point of the shape furthest along u, in the outer frame """
+        return homogenise.toFirst(self.R, self.t, self.local_support(rotate(self.R, u)))
+
+    def extent( self, u ):
+        """ max of u.p over the shape, u a unit vector of the outer frame """
+        return dot(u, self.support(u))
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class Piece(object):
+    """
+    A shape in the frame of a mother: the point p of the mother is the point
+    R*(p-t) of the shape, lo and hi are the corners of its box.
+    """
+
+    def __init__( self, shape, R, t, box ):
+        self.shape = shape
+        self.R, self.t = R, t
+        pts = [homogenise.toFirst(R, t, c) for c in homogenise.corners(*box)]
+        self.lo, self.hi = tuple(map(min, *pts)), tuple(map(max, *pts))
+
+    def to_local( self, p ):
+        return homogenise.toSecond(self.R, self.t, p)
+
+    def axis( self ):
+        """ the z axis of the shape in the mother frame """
+        return (self.R[2][0], self.R[2][1], self.R[2][2])
+
+class Daughter(Piece):
+    """
+    A placement in the frame of its mother, with the pieces its shape is the
+    union of (itself but for Boolean unions).
+    """
+
+    def __init__( self, name, volume, shape, R, t, box, pieces ):
+        Piece.__init__(self, shape, R, t, box)
+        self.name, self.volume = name, volume
+        self.pieces = pieces
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class OverlapChecker(object):
+    """
+    Overlap and extrusion check of the volumes of a gegede Geometry under
+    its world volume, see the module docstring.  run() returns the list of
+    Overlaps, tolerance is in cm.  With <cachedir>, the verdicts are kept
+    there per volume fingerprint for the next checks.
+    """
+
+    def __init__( self, geom, tolerance=default_tolerance, points=default_points, jobs=1, cachedir=None ):
+        self.geom = geom
+        self.tolerance = tolerance
+        self.points = points
+        self.jobs = jobs
+        self.cachedir = os.path.join(cachedir, 'overlaps') if cachedir else None
+        self.solids = homogenise.Solids(geom)
+        self.transforms = {}
+        self.factors = {}
+        self.verdicts = {}          # fingerprint -> verdicts
+        self.overlaps = []
+        self.checked = 0
+        self.skipped = []
+        self.stats = Counter()
+        if self.cachedir:
+            os.makedirs(self.cachedir, exist_ok=True)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def mothers( self ):
+        """
+        Return the names of the volumes with daughters under the world volume.
+        """
+        structure = self.geom.store.structure
+        ret, seen, todo = [], set([self.geom.world]), [self.geom.world]
+        while todo:
+            vol = structure[todo.pop()]
+            if vol.placements:
+                ret.append(vol.name)
+            for pname in vol.placements:
+                name = structure[pname].volume
+                if name not in seen:
+                    seen.add(name)
+                    todo.append(name)
+        return ret
+
+    def run( self ):
+        names = self.mothers()
+        if self.jobs > 1 and len(names) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            global _checker
+            _checker = self
+            # the largest volumes first
+            names.sort(key=lambda n: len(self.geom.store.structure[n].placements), reverse=True)
+            with multiprocessing.get_context('fork').Pool(self.jobs) as pool:
+                results = pool.map(_check_volume, names, chunksize=1)
+            _checker = None
+        else:
+            results = [self.check_volume(n) for n in names]
+        for found, skipped, status in results:
+            self.overlaps += found
+            self.skipped += skipped
+            self.stats[status] += 1
+        self.checked = len(names)
+        return self.overlaps
+
+    def report( self ):
+        lines = []
+        for o in self.overlaps:
+            depth = 'sampled' if o.depth is None else 'by %.4g cm' % o.depth
+            if o.kind == 'extrusion':
+                lines.append('extr: %s: %s sticks out %s' % (o.mother, o.first, depth))
+            else:
+                lines.append('ovlp: %s: %s overlaps %s %s' % (o.mother, o.first, o.second, depth))
+        reasons = OrderedDict()
+        for name, reason in self.skipped:
+            reasons.setdefault(reason, []).append(name)
+        for reason, names in reasons.items():
+            lines.append('skip: %s (%d, e.g. %s)' % (reason, len(names), names[0]))
+        lines.append('%d overlaps in %d volumes with daughters (tolerance %g cm), %d checked, %d reused'
+                     % (len(self.overlaps), self.checked, self.tolerance, self.stats['checked'], self.stats['reused']))
+        return '\n'.join(lines)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def transform( self, pos, rot ):
+        """ (R, t) of a placement, in cm """
+        key = (pos, rot)
+        ret = self.transforms.get(key)
+        if ret is None:
+            structure = self.geom.store.structure
+            t = (0., 0., 0.)
+            if pos is not None:
+                p = structure[pos]
+                t = (self.cm(p.x), self.cm(p.y), self.cm(p.z))
+            R = homogenise.rotationMatrix(structure[rot] if rot is not None else None)
+            ret = self.transforms[key] = R, t
+        return ret
+
+    def cm( self, q ):
+        """ a length in cm, Quantity.to() is slow for this many positions """
+        factor = self.factors.get(q.units)
+        if factor is None:
+            factor = self.factors[q.units] = Q(1, q.units).to('cm').magnitude
+        return q.magnitude * factor
+
+    def daughters( self, vol, skipped ):
+        structure = self.geom.store.structure
+        ret = []
+        for pname in vol.placements:
+            place = structure[pname]
+            shape = structure[place.volume].shape
+            try:
+                R, t = self.transform(place.pos, place.rot)
+                ret.append(Daughter(pname, place.volume, shape, R, t, self.solids.boundingBox(shape),
+                                    self.pieces(shape, R, t)))
+            except (ValueError, KeyError) as e:
+                skipped.append((pname, why(e)))
+        return ret
+
+    def pieces( self, shape, R, t ):
+        """
+        Return the Pieces of a shape placed by (R, t), its parts for a union.
+        """
+        kind, d = self.solids.get(shape)
+        if kind != 'union':
+            return [Piece(shape, R, t, self.solids.boundingBox(shape))]
+        # the point p of the mother is R*(p-t) of the first part and
+        # Rb*(R*(p-t)-tb) of the second one
+        Rb = d['R']
+        R2 = tuple(tuple(sum(Rb[i][k]*R[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+        return self.pieces(d['first'], R, t) + self.pieces(d['second'], R2, homogenise.toFirst(R, t, d['t']))
+
+    def fingerprint( self, vol ):
+        """
+        Return the fingerprint of the shapes and placements of a volume, None
+        if they are not all in the store.
+        """
+        structure = self.geom.store.structure
+        try:
+            parts = [self.solids.key(vol.shape)]
+            for pname in vol.placements:
+                place = structure[pname]
+                parts.append((self.solids.key(structure[place.volume].shape),) + self.transform(place.pos, place.rot))
+        except (ValueError, KeyError):
+            return None
+        return hashlib.sha1(repr((version, source_hash(), self.tolerance, self.points, parts)).encode()).hexdigest()
+
+    def load( self, key ):
+        try:
+            with open(os.path.join(self.cachedir, key+'.pkl'), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def save( self, key, verdicts ):
+        """
+        Atomically write the verdicts, the cache may be shared by parallel builds.
+        """
+        path = os.path.join(self.cachedir, key+'.pkl')
+        tmp = path+'.%d.tmp' % os.getpid()
+        with open(tmp, 'wb') as f:
+            pickle.dump(verdicts, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def check_volume( self, name ):
+        """
+        Return the Overlaps among the daughters of a volume and with it, the
+        (placement, reason) of the daughters which could not be checked, and
+        'reused' or 'checked'.
+        """
+        vol = self.geom.store.structure[name]
+        key = self.fingerprint(vol)
+        verdicts = None
+        if key is not None:
+            verdicts = self.verdicts.get(key)
+            if verdicts is None and self.cachedir:
+                verdicts = self.load(key)
+        if verdicts is not None:
+            # the verdicts refer to the placements by their index
+            self.verdicts[key] = verdicts
+            found = [Overlap(name, kind, vol.placements[i], None if j is None else vol.placements[j], depth)
+                     for kind, i, j, depth in verdicts]
+            return found, [], 'reused'
+
+        found, skipped = self.compute(vol)
+        if key is not None and not skipped:
+            index = dict((p, i) for i, p in enumerate(vol.placements))
+            verdicts = [(o.kind, index[o.first], index.get(o.second), o.depth) for o in found]
+            self.verdicts[key] = verdicts
+            if self.cachedir:
+                self.save(key, verdicts)
+        return found, skipped, 'checked'
+
+    def compute( self, vol ):
+        """
+        Check a volume, return its Overlaps and skipped daughters.
+        """
+        name = vol.name
+        found, skipped = [], []
+        daughters = self.daughters(vol, skipped)
+        for dau in daughters:
+            try:
+                depth = self.extrusion(vol.shape, dau)
+            except (ValueError, KeyError) as e:
+                skipped.append((dau.name, why(e)))
+                continue
+            if depth is not False:
+                found.append(Overlap(name, 'extrusion', dau.name, None, depth))
+        for i, j in self.candidates(daughters):
+            a, b = daughters[i], daughters[j]
+            try:
+                depth = self.overlap(a, b)
+            except (ValueError, KeyError) as e:
+                skipped.append((a.name + ' ' + b.name, why(e)))
+                continue
+            if depth is not False:
+                found.append(Overlap(name, 'overlap', a.name, b.name, depth))
+        return found, skipped
+
+    def candidates( self, daughters ):
+        """
+        Yield the pairs (i, j), i < j, of daughters whose boxes overlap by more
+        than the tolerance, found through a uniform grid of cells.
+        """
+        tol = self.tolerance
+        if len(daughters) < 2:
+            return
+        sizes = sorted(max(h - l for l, h in zip(d.lo, d.hi)) for d in daughters)
+        cell = max(sizes[len(sizes)//2], tol)
+        grid = defaultdict(list)
+        large = []
+        for i, d in enumerate(daughters):
+            lo = [int(math.floor(v/cell)) for v in d.lo]
+            hi = [int(math.floor(v/cell)) for v in d.hi]
+            ncells = (hi[0]-lo[0]+1) * (hi[1]-lo[1]+1) * (hi[2]-lo[2]+1)
+            if ncells > 64:
+                large.append(i)
+                continue
+            for key in itertools.product(*[range(l, h+1) for l, h in zip(lo, hi)]):
+                grid[key].append(i)
+        pairs = set()
+        for members in grid.values():
+            pairs.update(itertools.combinations(members, 2))
+        for i in large:
+            pairs.update((min(i, j), max(i, j)) for j in range(len(daughters)) if j != i)
+        for i, j in sorted(pairs):
+            if self.meet(daughters[i], daughters[j]):
+                yield i, j
+
+    def meet( self, a, b ):
+        """ True if the boxes of a and b overlap by more than the tolerance """
+        tol = self.tolerance
+        return all(min(a.hi[k], b.hi[k]) - max(a.lo[k], b.lo[k]) > tol for k in range(3))
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def convex( self, shape, hull=False ):
+        """
+        Return the kind and dims of a shape if Convex can describe it (or its
+        convex hull, for a Tubs or PolyhedraRegular with a hole), else None.
+        """
+        kind, d = self.solids.get(shape)
+        if kind in ('Box', 'Trapezoid'):
+            return kind, d
+        if kind in ('Tubs', 'PolyhedraRegular') and (d['rmin'] == 0 or hull) and d['dphi'] >= twopi:
+            return kind, d
+        return None
+
+    def round( self, shape ):
+        """ Return (rmin, rmax, dz) of a full Tubs, else None """
+        kind, d = self.solids.get(shape)
+        if kind == 'Tubs' and d['dphi'] >= twopi:
+            return d['rmin'], d['rmax'], d['dz']
+        return None
+
+    def overlap( self, a, b ):
+        """
+        Return the depth of the overlap of two daughters, None if sampled,
+        False if they do not overlap.
+        """
+        return worst(self.piece_overlap(pa, pb) for pa in a.pieces for pb in b.pieces if self.meet(pa, pb))
+
+    def piece_overlap( self, a, b ):
+        tol = self.tolerance
+        ra, rb = self.round(a.shape), self.round(b.shape)
+        if ra is not None and rb is not None and abs(dot(a.axis(), b.axis())) > 1 - 1e-12:
+            axis = a.axis()
+            dt = sub(b.t, a.t)
+            along = dot(dt, axis)
+            off = math.sqrt(max(dot(dt, dt) - along*along, 0.))
+            depth = min(ra[2] + rb[2] - abs(along), ra[1] + rb[1] - off)
+            if ra[0] > 0:
+                depth = min(depth, rb[1] + off - ra[0])
+            if rb[0] > 0:
+                depth = min(depth, ra[1] + off - rb[0])
+            return depth if depth > tol else False
+
+        ca, cb = self.convex(a.shape), self.convex(b.shape)
+        if ca is not None and cb is not None:
+            def meet( e ):
+                sa, sb = Convex(*(ca + (a.R, a.t, e))), Convex(*(cb + (b.R, b.t, e)))
+                if sa.empty or sb.empty:
+                    return False
+                return gjk(sa.support, sb.support)
+            hit = meet(tol/2)
+            if hit is False:
+                return False
+            if hit is True:
+                lo, hi = tol/2, max(max(h - l for l, h in zip(d.lo, d.hi)) for d in (a, b))
+                for i in range(40):
+                    mid = (lo + hi)/2
+                    if meet(mid):
+                        lo = mid
+                    else:
+                        hi = mid
+                return 2*lo
+
+        lo = tuple(map(max, a.lo, b.lo))
+        hi = tuple(map(min, a.hi, b.hi))
+        inside = self.solids.inside
+        for p in self.grid(lo, hi):
+            if inside(a.shape, a.to_local(p)) and inside(b.shape, b.to_local(p)):
+                # not where the shapes just touch
+                if all(inside(a.shape, a.to_local(q)) and inside(b.shape, b.to_local(q)) for q in self.around(p)):
+                    return None
+        return False
+
+    def extrusion( self, mother, dau ):
+        """
+        Return how far a daughter sticks out of its mother's shape, None if
+        sampled, False if it does not.
+        """
+        return worst(self.piece_extrusion(mother, p) for p in dau.pieces)
+
+    def piece_extrusion( self, mother, dau ):
+        tol = self.tolerance
+        rm, rd = self.round(mother), self.round(dau.shape)
+        if rm is not None and rd is not None and abs(dau.R[2][2]) > 1 - 1e-12:
+            off = math.hypot(dau.t[0], dau.t[1])
+            depth = max(abs(dau.t[2]) + rd[2] - rm[2], off + rd[1] - rm[1])
+            if rm[0] > 0 and off + rm[0] > rd[0]:
+                # the daughter reaches into the hole of the mother
+                depth = max(depth, min(rm[0] - (off - rd[1]), off + rm[0] - rd[0]))
+            return depth if depth > tol else False
+
+        cm, cd = self.convex(mother), self.convex(dau.shape, hull=True)
+        if cm is not None and cd is not None:
+            shape = Convex(*(cd + (dau.R, dau.t)))
+            hull = Convex(*(cm + (homogenise.rotationMatrix(None), (0., 0., 0.))))
+            if hull.planes is not None:
+                depth = max(shape.extent(n) - h for n, h in hull.planes)
+            else:
+                depth = max(shape.extent((0., 0., 1.)), shape.extent((0., 0., -1.))) - hull.dz
+                if shape.verts is not None:
+                    pts = [homogenise.toFirst(dau.R, dau.t, v) for v in shape.verts]
+                else:
+                    # the rims of a tilted cylinder (a parallel one is round), sampled
+                    pts = [homogenise.toFirst(dau.R, dau.t, (shape.radius*math.cos(a), shape.radius*math.sin(a), z))
+                           for a in [k*twopi/256 for k in range(256)] for z in (-shape.dz, shape.dz)]
+                depth = max(depth, max(math.hypot(p[0], p[1]) for p in pts) - hull.radius)
+            return depth if depth > tol else False
+
+        lo, hi = self.solids.boundingBox(dau.shape)
+        inside = self.solids.inside
+        for p in self.grid(lo, hi):
+            if inside(dau.shape, p) and not inside(mother, homogenise.toFirst(dau.R, dau.t, p)):
+                if all(inside(dau.shape, q) and not inside(mother, homogenise.toFirst(dau.R, dau.t, q))
+                       for q in self.around(p)):
+                    return None
+        return False
+
+    def around( self, p ):
+        """ p and the points at the tolerance from it along the axes """
+        tol = self.tolerance
+        yield p
+        for k in range(3):
+            for s in (-tol, tol):
+                q = list(p)
+                q[k] += s
+                yield tuple(q)
+
+    def grid( self, lo, hi ):
+        """
+        Yield the centres of a grid of about <points> cells in the box (lo, hi)
+        shrunk by the tolerance.
+        """
+        tol = self.tolerance
+        lo = [l + tol for l in lo]
+        size = [h - l - tol for l, h in zip(lo, hi)]
+        if any(s <= 0 for s in size):
+            return
+        step = (size[0]*size[1]*size[2] / self.points)**(1./3)
+        n = [max(1, int(round(s/step))) for s in size]
+        for i in range(n[0]):
+            x = lo[0] + (i + 0.5)*size[0]/n[0]
+            for j in range(n[1]):
+                y = lo[1] + (j + 0.5)*size[1]/n[1]
+                for k in range(n[2]):
+                    yield (x, y, lo[2] + (k + 0.5)*size[2]/n[2])
+
+def worst( depths ):
+    """
+    The largest of depths, None if they are only None (sampled), False if
+    they are only False.
+    """
+    ret = False
+    for d in depths:
+        if d is None:
+            if ret is False:
+                ret = None
+        elif d is not False and (ret is None or ret is False or d > ret):
+            ret = d
+    return ret
+
+_source_hash = None
+
+def source_hash():
+    """
+    Hash of the sources the verdicts depend on, part of the fingerprints.
+    """
+    global _source_hash
+    if _source_hash is None:
+        h = hashlib.sha1()
+        for module in (sys.modules[__name__], homogenise):
+            with open(module.__file__, 'rb') as f:
+                h.update(f.read())
+        _source_hash = h.hexdigest()
+    return _source_hash
+
+def why( e ):
+    if isinstance(e, KeyError):
+        return 'no object %s in the store' % e
+    return str(e)
+
+_checker = None
+
+def _check_volume( name ):
+    return _checker.check_volume(name)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    import gegede.main
+    from duneggd import build
+    from duneggd import subtreecache
+
+    parser = argparse.ArgumentParser(description='Build a geometry and check its overlaps without ROOT')
+    parser.add_argument('-w', '--world', required=True, help='World builder section')
+    parser.add_argument('-t', '--tolerance', type=float, default=default_tolerance,
+                        help='Overlaps and extrusions up to this depth in cm are ignored, default is %(default)g')
+    parser.add_argument('-n', '--points', type=int, default=default_points,
+                        help='Points sampled per pair of shapes with no exact test, default is %(default)d')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of worker processes, default is the number of cores')
+    parser.add_argument('-c', '--cache', default=None, nargs='?', const=subtreecache.default_cache_dir,
+                        help='Reuse the verdicts of the volumes which did not change from this directory, default is %(const)s')
+    parser.add_argument('configs', nargs='+', help='Configuration files')
+    args = parser.parse_args()
+
+    cfg = gegede.main.parse_config(args.configs)
+    wbuilder = gegede.main.make_builder(cfg, args.world)
+    gegede.main.configure_builder(cfg, wbuilder)
+    geom = build.generate_geometry(wbuilder)
+    checker = OverlapChecker(geom, args.tolerance, args.points, args.jobs or multiprocessing.cpu_count(), args.cache)
+    found = checker.run()
+    print(checker.report())
+    if found:
+        sys.exit(1)
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+'''
+Per-builder profile of the construction of a geometry.
+
+While a BuildProfiler is active, the construct() method of every builder class
+in the tree is wrapped to record, for each builder, the wall and CPU time, the
+memory allocated (tracemalloc) and the number of materials, shapes, volumes and
+placements it added to the store.  The report follows the builder hierarchy
+with self and inclusive (self + sub-builders) numbers, as text or as JSON.
+
+Nothing is wrapped when no profiler is active, so a normal build costs nothing.
+
+Example:
+
+    with BuildProfiler(wbuilder) as prof:
+        gegede.builder.construct(wbuilder, geom)
+    print(prof.report())
+    prof.save('geometry.profile.json')
+
+or from the command line, as gegede-cli:
+
+    python -m duneggd.profiling -w World -o profile.json a.cfg b.cfg
+'''
+
+import json
+import time
+import itertools
+import functools
+import tracemalloc
+from collections import OrderedDict
+
+counters = ['matter', 'shapes', 'volumes', 'placements']
+timers = ['wall', 'cpu', 'alloc', 'peak']
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def walk( builder, seen=None ):
+    """
+    Yield (builder, parent, depth) over the builder tree, depth first as
+    gegede.builder.construct() goes, a shared builder only once.
+    """
+    seen = set() if seen is None else seen
+    todo = [(builder, None, 0)]
+    while todo:
+        b, parent, depth = todo.pop()
+        if id(b) in seen:
+            continue
+        seen.add(id(b))
+        yield b, parent, depth
+        todo += reversed([(c, b, depth+1) for c in b.builders.values()])
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+class BuildProfiler(object):
+    """
+    Context manager profiling the construct() of the builders under a
+    world builder.  With memory=False tracemalloc is not used (it slows
+    the construction by about 2x).
+    """
+
+    def __init__( self, wbuilder, memory=True ):
+        self.wbuilder = wbuilder
+        self.memory = memory
+        self.records = OrderedDict()    # builder name -> dict of self numbers
+        self.wrapped = []
+        self.stack = []
+        self.peak = 0                   # traced peak before the last reset_peak()
+        self.total = None
+
+    def __enter__( self ):
+        classes = []
+        for b, parent, depth in walk(self.wbuilder):
+            # wrap the class which defines the construct() the builder runs
+            for k in type(b).__mro__:
+                if 'construct' in k.__dict__:
+                    if k not in classes:
+                        classes.append(k)
+                    break
+        for k in classes:
+            orig = k.__dict__['construct']
+            setattr(k, 'construct', self.wrap(orig))
+            self.wrapped.append((k, orig))
+
+        self.tracing = self.memory and not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+        self.t0, self.c0 = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__( self, *exc ):
+        self.total = OrderedDict([('wall', time.perf_counter() - self.t0),
+                                  ('cpu', time.process_time() - self.c0)])
+        if self.memory:
+            self.total['peak'] = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if self.tracing:
+            tracemalloc.stop()
+        for k, orig in reversed(self.wrapped):
+            setattr(k, 'construct', orig)
+        self.wrapped = []
+        return False
+
+    def wrap( self, construct ):
+        profiler = self
+
+        @functools.wraps(construct)
+        def profiled_construct( builder, geom, *args, **kwds ):
+            # a construct() calling its base class' one is counted once
+            if profiler.stack and profiler.stack[-1]['builder'] is builder:
+                return construct(builder, geom, *args, **kwds)
+            return profiler.measure(construct, builder, geom, *args, **kwds)
+        return profiled_construct
+
+    def measure( self, construct, builder, geom, *args, **kwds ):
+        """
+        Run one construct() and add its numbers to the builder's record.
+        A construct() run from within another one (e.g. the ND-GAr ECAL
+        calling its layer builders) is subtracted from the self numbers of
+        the caller, which keeps the peak it had before.
+        """
+        parent = self.stack[-1] if self.stack else None
+        frame = {'builder': builder, 'peak': 0,
+                 'nested': OrderedDict((k, 0) for k in ['wall', 'cpu', 'alloc'] + counters)}
+        self.stack.append(frame)
+        nstruct = len(geom.store.structure)
+        before = (len(geom.store.matter), len(geom.store.shapes))
+        if self.memory:
+            mem0, peak0 = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak0)
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], peak0)
+            tracemalloc.reset_peak()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            return construct(builder, geom, *args, **kwds)
+        finally:
+            self.stack.pop()
+            total = OrderedDict([('wall', time.perf_counter() - t0), ('cpu', time.process_time() - c0),
+                                 ('alloc', 0), ('matter', len(geom.store.matter) - before[0]),
+                                 ('shapes', len(geom.store.shapes) - before[1]),
+                                 ('volumes', 0), ('placements', 0)])
+            for obj in itertools.islice(geom.store.structure.values(), nstruct, None):
+                kind = type(obj).__name__
+                if kind == 'Volume':
+                    total['volumes'] += 1
+                elif kind == 'Placement':
+                    total['placements'] += 1
+            if self.memory:
+                mem, peak = tracemalloc.get_traced_memory()
+                total['alloc'] = mem - mem0
+                peak = max(frame['peak'], peak)
+                if parent is not None:
+                    parent['peak'] = max(parent['peak'], peak)
+
+            rec = self.records.get(builder.name)
+            if rec is None:
+                rec = OrderedDict([('class', type(builder).__module__+'.'+type(builder).__name__),
+                                   ('calls', 0)] + [(k, 0) for k in timers + counters])
+                self.records[builder.name] = rec
+            rec['calls'] += 1
+            for k, v in total.items():
+                rec[k] += v - frame['nested'][k]
+                if parent is not None:
+                    parent['nested'][k] += v
+            if self.memory:
+                rec['peak'] = max(rec['peak'], peak - mem0)
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def tree( self ):
+        """
+        Return the list of builder entries in hierarchy order, with their self
+        and inclusive numbers.  Builders which did not run construct() (e.g.
+        taken from a SubtreeCache) have calls == 0.
+        """
+        entries = []
+        for b, parent, depth in walk(self.wbuilder):
+            rec = self.records.get(b.name)
+            if rec is None:
+                rec = OrderedDict([('class', type(b).__module__+'.'+type(b).__name__),
+                                   ('calls', 0)] + [(k, 0) for k in timers + counters])
+            entries.append(OrderedDict([('name', b.name), ('parent', parent.name if parent else None),
+                                        ('depth', depth), ('class', rec['class']), ('calls', rec['calls']),
+                                        ('self', OrderedDict((k, rec[k]) for k in timers + counters)),
+                                        ('inclusive', None),
+                                        ('children', list(b.builders.keys()))]))
+
+        # sum up from the leaves, a shared builder counts under its first parent
+        byname = OrderedDict((e['name'], e) for e in entries)
+        for e in reversed(entries):
+            inc = OrderedDict(e['self'])
+            for c in e['children']:
+                child = byname[c]
+                if child['parent'] != e['name'] or child['inclusive'] is None:
+                    continue
+                for k in inc:
+                    if k == 'peak':
+                        inc[k] = max(inc[k], child['inclusive'][k])
+                    else:
+                        inc[k] += child['inclusive'][k]
+            e['inclusive'] = inc
+        return entries
+
+    def to_json( self ):
+        return OrderedDict([('world', self.wbuilder.name), ('memory', self.memory),
+                            ('total', self.total), ('builders', self.tree())])
+
+    def save( self, filename ):
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+    def report( self, top=15 ):
+        """
+        Return a text report: the builder hierarchy, then the <top> builders
+        by self wall time.
+        """
+        entries = self.tree()
+        mb = 1024.*1024.
+        head = '%-44s %9s %9s %9s %9s %9s %7s %7s %8s' % ('builder', 'wall [s]', 'self [s]', 'cpu [s]',
+                                                      'alloc MB', 'peak MB', 'shapes', 'volumes', 'placemnt')
+        lines = [head]
+        for e in entries:
+            inc, own = e['inclusive'], e['self']
+            name = '  '*e['depth'] + e['name'] + ('' if e['calls'] else ' (not run)')
+            lines.append('%-44s %9.3f %9.3f %9.3f %9.1f %9.1f %7d %7d %8d' % (
+                name[:44], inc['wall'], own['wall'], inc['cpu'], inc['alloc']/mb, inc['peak']/mb,
+                inc['shapes'], inc['volumes'], inc['placements']))
+
+        lines += ['', 'top %d builders by self wall time:' % top]
+        ranked = sorted(entries, key=lambda e: e['self']['wall'], reverse=True)[:top]
+        for e in ranked:
+            own = e['self']
+            lines.append('  %-42s %9.3fs %9.1f MB %7d volumes %8d placements  %s' % (
+                e['name'][:42], own['wall'], own['alloc']/mb, own['volumes'], own['placements'], e['class']))
+        if self.total:
+            lines.append('')
+            lines.append('construction: %.2fs wall, %.2fs cpu' % (self.total['wall'], self.total['cpu'])
+                         + (', %.1f MB traced peak' % (self.total['peak']/mb) if 'peak' in self.total else ''))
+        return '\n'.join(lines)
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def main():
+    import argparse
+    import gegede.main
+    import gegede.builder
+    import gegede.construct
+
+    parser = argparse.ArgumentParser(description='Profile the construction of a dunendggd geometry')
+    parser.add_argument('-w', '--world', default='World', help='World builder section')
+    parser.add_argument('-o', '--output', default=None, help='Write the profile as JSON to this file')
+    parser.add_argument('--no-memory', action='store_true', help='Do not trace memory allocations')
+    parser.add_argument('configs', nargs='+', help='cfg files, as for gegede-cli')
+    args = parser.parse_args()
+
+    cfg = gegede.main.parse_config(args.configs)
+    wbuilder = gegede.main.make_builder(cfg, args.world)
+    gegede.main.configure_builder(cfg, wbuilder)
+    geom = gegede.construct.Geometry()
+    with BuildProfiler(wbuilder, memory=not args.no_memory) as prof:
+        gegede.builder.construct(wbuilder, geom)
+    print(prof.report())
+    if args.output:
+        prof.save(args.output)
+
+
+if '__main__' == __name__:
+    main()
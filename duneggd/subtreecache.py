@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+'''
+Content-addressed cache of constructed builder subtrees.
+
+Every builder gets a key made of its class (and the source of its modules and of
+LocalTools), its name, its configuration parameters and the keys of its
+sub-builders.  After a builder is constructed, the store entries (shapes,
+volumes, placements, positions, ...) it added are saved under its key together
+with its .volumes and data members.  A later build, possibly of another variant,
+that meets the same key splices these entries back into the store instead of
+calling construct() for the whole subtree.
+
+A payload only holds the entries of its own builder and refers to the payloads
+of its sub-builders by key, so subtrees shared by many variants are stored once.
+The on-disk store is bounded in size, least recently used payloads are evicted
+first.
+
+Use it in place of gegede.builder.construct():
+
+    cache = SubtreeCache(cfg, '/path/to/cache')
+    cache.construct(wbuilder, geom)
+    print(cache.report())
+    cache.evict()
+'''
+
+import os
+import re
+import types
+import itertools
+import pickle
+import hashlib
+import inspect
+from collections import OrderedDict, namedtuple
+
+import gegede.builder
+from gegede import Quantity as Q
+
+version = 1
+default_cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'dunendggd')
+default_max_size = 2*1024**3
+
+# encoded values, module level so that they pickle
+QuantityRecord = namedtuple('QuantityRecord', 'magnitude units')
+StoreRef = namedtuple('StoreRef', 'category name')
+AutoRef = namedtuple('AutoRef', 'index')
+MethodRef = namedtuple('MethodRef', 'name')
+BuilderRef = namedtuple('BuilderRef', 'name')
+
+reserved_attrs = ('name', 'builders', 'volumes', '_configured', '_constructed')
+localtools_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'LocalTools')
+
+class Uncacheable(Exception):
+    '''
+    Raised when a subtree can not be saved, e.g. it holds objects that can not be encoded.
+    '''
+    pass
+
+#^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+def parse_size( size ):
+    """
+    Return the number of bytes from a string like "500MB" or "2GB".
+    """
+    size = str(size).strip().upper()
+    for suffix, factor in (('KB', 1024), ('MB', 1024**2), ('GB', 1024**3), ('TB', 1024**4), ('B', 1)):
+        if size.endswith(suffix):
+            return int(float(size[:-len(suffix)]) * factor)
+    return int(size)
+
+def find_builder( builder, name ):
+    """
+    Return the builder or sub-builder with the given name, or None.
+    """
+    todo = [builder]
+    while todo:
+        b = todo.pop(0)
+        if b.name == name:
+            return b
+        todo += b.builders.values()
+    return None
+
+class SubtreeCache(object):
+    '''
+    A cache of builder subtrees for one build, backed by a directory of payloads.
+    '''
+    def __init__(self, cfg, cachedir=default_cache_dir, maxsize=default_max_size):
+        self.cfg = cfg
+        self.cachedir = cachedir
+        self.maxsize = maxsize
+        os.makedirs(self.cachedir, exist_ok=True)
+
+        self.keys = {}             # id(builder) -> key
+        self.available = set()     # keys that are on disk
+        self.stats = OrderedDict() # builder name -> 'hit', 'miss' or 'uncacheable'
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._sources = {}
+        self._classes = {}
+        self._units = {}
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def source_hash( self, klass ):
+        """
+        Return the hash of the sources the builder class depends on.
+        """
+        if klass in self._sources:
+            return self._sources[klass]
+        files = set(os.path.join(localtools_dir, f) for f in os.listdir(localtools_dir) if f.endswith('.py'))
+        for k in inspect.getmro(klass):
+            if k.__module__.startswith('gegede') or k is object:
+                continue
+            try:
+                files.add(inspect.getsourcefile(k))
+            except TypeError:
+                pass
+        h = hashlib.sha256()
+        for f in sorted(f for f in files if f):
+            h.update(open(f, 'rb').read())
+        self._sources[klass] = h.hexdigest()
+        return self._sources[klass]
+
+    def config_repr( self, value ):
+        """
+        Return a stable representation of a configuration value.
+        """
+        if isinstance(value, Q):
+            return 'Q(%r,%r)' % (value.magnitude, str(value.units))
+        if isinstance(value, dict):
+            return '{%s}' % ','.join('%r:%s' % (k, self.config_repr(v)) for k, v in sorted(value.items()))
+        if isinstance(value, (list, tuple)):
+            return '[%s]' % ','.join(self.config_repr(v) for v in value)
+        if isinstance(value, type):
+            return value.__module__+'.'+value.__name__
+        return repr(value)
+
+    def key( self, builder ):
+        """
+        Return the key of the builder subtree.
+        """
+        if id(builder) in self.keys:
+            return self.keys[id(builder)]
+        klass = type(builder)
+        h = hashlib.sha256()
+        h.update(('%d %s.%s %s\n' % (version, klass.__module__, klass.__name__, builder.name)).encode())
+        h.update(self.source_hash(klass).encode())
+        h.update(self.config_repr(self.cfg.get(builder.name, dict())).encode())
+        for other in builder.builders.values():
+            h.update(self.key(other).encode())
+        self.keys[id(builder)] = h.hexdigest()
+        return self.keys[id(builder)]
+
+    def path( self, key ):
+        return os.path.join(self.cachedir, key+'.pkl')
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def construct( self, builder, geom ):
+        """
+        Construct the builder and its sub-builders, the same as
+        gegede.builder.construct() but going through the cache.
+        """
+        self._construct(builder, geom)
+
+    def _construct( self, builder, geom ):
+        """
+        Return the (volume, #placements, #params) records of the volumes made
+        by the subtree, used to notice when a builder modifies the volumes of
+        its sub-builders.
+        """
+        if hasattr(builder, '_constructed'):
+            return []
+        key = self.key(builder)
+
+        tree = self.load_tree(builder)
+        if tree is not None:
+            return self.apply_tree(tree, geom)
+
+        records = []
+        for other in builder.builders.values():
+            records += self._construct(other, geom)
+
+        marks = [len(s) for s in geom.store]
+        builder.construct(geom)
+        builder._constructed = True
+        self.stats[builder.name] = 'miss'
+
+        patches = []
+        for i, (vol, nplacements, nparams) in enumerate(records):
+            if len(vol.placements) != nplacements or len(vol.params) != nparams:
+                patches.append(vol)
+                records[i] = (vol, len(vol.placements), len(vol.params))
+
+        entries = []
+        for icat, store in enumerate(geom.store):
+            for index, obj in enumerate(itertools.islice(store.values(), marks[icat], None), marks[icat]):
+                entries.append((icat, index, obj))
+                if type(obj).__name__ == 'Volume':
+                    records.append((obj, len(obj.placements), len(obj.params)))
+
+        children = [self.key(other) for other in builder.builders.values()]
+        if any(k not in self.available for k in children):
+            self.stats[builder.name] = 'uncacheable'
+            return records
+        try:
+            payload = self.encode_payload(builder, geom, entries, patches, children)
+        except Uncacheable as e:
+            print('SubtreeCache: can not save %s: %s' % (builder.name, e))
+            self.stats[builder.name] = 'uncacheable'
+            return records
+        self.save(key, payload)
+        return records
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def encode_payload( self, builder, geom, entries, patches, children ):
+        """
+        Return the payload of the builder, made of plain python objects.
+        """
+        # objects named automatically by gegede (e.g. "Position000123") are
+        # renamed on restore, so refer to them by their index in the payload
+        autos = {}
+        for i, (icat, index, obj) in enumerate(entries):
+            if obj.name == '%s%06d' % (type(obj).__name__, index):
+                autos[obj.name] = i
+        self._autos = autos
+        self._builder = builder
+        self._geom = geom
+
+        enc_entries = []
+        for icat, index, obj in entries:
+            name = AutoRef(autos[obj.name]) if obj.name in autos else obj.name
+            enc_entries.append((icat, type(obj).__name__, name, self.encode(tuple(obj[1:]), False)))
+        enc_patches = [(self.encode(vol.name, False), self.encode(list(vol.placements), False),
+                        self.encode(list(vol.params), False)) for vol in patches]
+        attrs = {}
+        for k, v in builder.__dict__.items():
+            if k not in reserved_attrs:
+                attrs[k] = self.encode(v)
+        volumes = [self.encode(v) for v in builder.volumes.values()]
+        return dict(version=version, builder=builder.name, children=children, entries=enc_entries,
+                    patches=enc_patches, volumes=volumes, attrs=attrs)
+
+    autoname = re.compile(r'^[A-Z][A-Za-z0-9]*\d{6}$')
+
+    def encode( self, value, objects=True ):
+        """
+        Encode a value.  With <objects>, store objects are encoded as references.
+        """
+        if value is None or isinstance(value, (bool, int, float, complex)):
+            return value
+        if isinstance(value, str):
+            if value in self._autos:
+                return AutoRef(self._autos[value])
+            if self.autoname.match(value) and any(value in s for s in self._geom.store):
+                raise Uncacheable('refers to automatically named "%s" of another builder' % value)
+            return value
+        if isinstance(value, Q):
+            return QuantityRecord(self.encode(value.magnitude), str(value.units))
+        if objects and isinstance(value, tuple) and hasattr(value, '_fields'):
+            for icat, store in enumerate(self._geom.store):
+                if store.get(value.name) is value:
+                    return StoreRef(icat, self.encode(value.name))
+        if isinstance(value, types.MethodType) and value.__self__ is self._builder:
+            return MethodRef(value.__func__.__name__)
+        if isinstance(value, gegede.builder.Builder):
+            if find_builder(self._builder, value.name) is not value:
+                raise Uncacheable('refers to builder %s out of its subtree' % value.name)
+            return BuilderRef(value.name)
+        if type(value) in (list, tuple, set):
+            return type(value)(self.encode(v, objects) for v in value)
+        if type(value) in (dict, OrderedDict):
+            return type(value)((self.encode(k, objects), self.encode(v, objects)) for k, v in value.items())
+        if type(value).__module__ == 'numpy':
+            return value
+        raise Uncacheable('can not encode %s' % type(value).__name__)
+
+    def decode( self, value, names, geom, builder ):
+        """
+        Decode a value encoded by encode(), <names> maps AutoRef indices to names.
+        """
+        t = type(value)
+        if t is QuantityRecord:
+            units = self._units.get(value.units)
+            if units is None:
+                units = self._units[value.units] = Q(1, value.units).units
+            return Q(self.decode(value.magnitude, names, geom, builder), units)
+        if t is AutoRef:
+            return names[value.index]
+        if t is StoreRef:
+            return geom.store[value.category][self.decode(value.name, names, geom, builder)]
+        if t is MethodRef:
+            return getattr(builder, value.name)
+        if t is BuilderRef:
+            return find_builder(builder, value.name)
+        if t in (list, tuple, set):
+            return t(self.decode(v, names, geom, builder) for v in value)
+        if t in (dict, OrderedDict):
+            return t((self.decode(k, names, geom, builder), self.decode(v, names, geom, builder))
+                     for k, v in value.items())
+        return value
+
+    def make_class( self, geom, icat, typename ):
+        """
+        Return the namedtuple class gegede uses for this kind of object.
+        """
+        k = (icat, typename)
+        if k not in self._classes:
+            category = geom.store._fields[icat]
+            fields = [p[0] for p in geom.schema[category][typename]]
+            self._classes[k] = namedtuple(typename, ['name'] + fields)
+        return self._classes[k]
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def load( self, key ):
+        """
+        Return the payload of the key or None.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            payload = pickle.loads(data)
+        except Exception:
+            return None
+        if payload.get('version') != version:
+            return None
+        self.bytes_read += len(data)
+        self.available.add(key)
+        os.utime(path)  # for the LRU eviction
+        return payload
+
+    def save( self, key, payload ):
+        """
+        Atomically write the payload, the cache may be shared by parallel builds.
+        """
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        tmp = self.path(key)+'.%d.tmp' % os.getpid()
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+        self.bytes_written += len(data)
+        self.available.add(key)
+
+    def load_tree( self, builder ):
+        """
+        Return the payloads of the whole subtree as (builder, payload, subtrees),
+        or None if any of them is missing.
+        """
+        if hasattr(builder, '_constructed'):
+            return (builder, None, [])
+        payload = self.load(self.key(builder))
+        if payload is None:
+            return None
+        subtrees = []
+        for other in builder.builders.values():
+            sub = self.load_tree(other)
+            if sub is None:
+                return None
+            subtrees.append(sub)
+        return (builder, payload, subtrees)
+
+    def apply_tree( self, tree, geom ):
+        """
+        Splice a subtree loaded by load_tree() into the store.
+        """
+        builder, payload, subtrees = tree
+        if payload is None or hasattr(builder, '_constructed'):
+            return []
+        volumes = []
+        for sub in subtrees:
+            volumes += [r[0] for r in self.apply_tree(sub, geom)]
+
+        # gegede names unnamed objects after the size of the store when they are made
+        entries = payload['entries']
+        counts = [len(s) for s in geom.store]
+        names = []
+        for icat, typename, name, fields in entries:
+            if type(name) is AutoRef:
+                name = '%s%06d' % (typename, counts[icat])
+            names.append(name)
+            counts[icat] += 1
+
+        for (icat, typename, name, fields), newname in zip(entries, names):
+            store = geom.store[icat]
+            if store is geom.store.matter and newname in store:
+                # the materials are global, another subtree may have defined them first
+                continue
+            if newname in store:
+                raise ValueError('Instance "%s" of type %s already in store' % (newname, typename))
+            klass = self.make_class(geom, icat, typename)
+            obj = klass(newname, *self.decode(fields, names, geom, builder))
+            store[newname] = obj
+            if typename == 'Volume':
+                volumes.append(obj)
+
+        for name, placements, params in payload['patches']:
+            vol = geom.store.structure[self.decode(name, names, geom, builder)]
+            vol.placements[:] = self.decode(placements, names, geom, builder)
+            vol.params[:] = self.decode(params, names, geom, builder)
+
+        for k, v in payload['attrs'].items():
+            setattr(builder, k, self.decode(v, names, geom, builder))
+        for v in payload['volumes']:
+            vol = self.decode(v, names, geom, builder)
+            builder.volumes[vol.name] = vol
+        builder._constructed = True
+        self.stats[builder.name] = 'hit'
+
+        return [(vol, len(vol.placements), len(vol.params)) for vol in volumes]
+
+    #^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^~^
+    def evict( self ):
+        """
+        Remove the least recently used payloads until the store fits in maxsize.
+        Return the number of removed payloads.
+        """
+        files = []
+        for f in os.listdir(self.cachedir):
+            if not f.endswith('.pkl'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cachedir, f))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        total = sum(f[1] for f in files)
+        removed = 0
+        for mtime, size, f in sorted(files):
+            if total <= self.maxsize:
+                break
+            try:
+                os.remove(os.path.join(self.cachedir, f))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def summary( self ):
+        """
+        Return a one line summary of the hits and misses.
+        """
+        values = list(self.stats.values())
+        return '%d hit / %d miss / %d uncacheable' % (values.count('hit'), values.count('miss'),
+                                                      values.count('uncacheable'))
+
+    def report( self ):
+        """
+        Return a text report of the cache usage of every builder.
+        """
+        lines = ['SubtreeCache %s' % self.cachedir]
+        for name, status in self.stats.items():
+            lines.append('  %-12s %s' % (status, name))
+        lines.append('  %s, %.1f MB read, %.1f MB written' % (self.summary(), self.bytes_read/1024.**2,
+                                                            self.bytes_written/1024.**2))
+        return '\n'.join(lines)
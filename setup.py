@@ -14,5 +14,11 @@ setup(name = 'dunendggd',
         "pint >= 0.5.1",      # for units
         "lxml >= 3.3.5",      # for GDML export],
       ],
+      entry_points = {
+        'console_scripts': [
+          'dunendggd-build = duneggd.build:main',
+          'dunendggd-benchmark = duneggd.benchmark:main',
+        ],
+      },
   )
 
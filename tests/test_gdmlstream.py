@@ -0,0 +1,41 @@
+'''
+The streamed GDML must be byte for byte the output of gegede's exporter.
+'''
+
+import io
+import os
+
+import pytest
+import gegede.main
+from gegede.export import gdml
+
+from duneggd import build, gdmlstream, gdmlfile
+
+def variant_configs( name ):
+    return next(v for v in build.read_manifest() if v.name == name).configs
+
+geometries = [
+    ('empty hall', 'World', variant_configs('empty')),
+    ('2x2', 'Detector', [os.path.join(build.config_dir, 'ArgonCube', 'ArgonCube_2x2.cfg')]),
+]
+
+def build_geometry( world, configs ):
+    cfg = gegede.main.parse_config(configs)
+    wbuilder = gegede.main.make_builder(cfg, world)
+    gegede.main.configure_builder(cfg, wbuilder)
+    return build.generate_geometry(wbuilder)
+
+@pytest.mark.parametrize('world,configs', [g[1:] for g in geometries], ids=[g[0] for g in geometries])
+def test_same_as_gegede( world, configs, tmp_path, monkeypatch ):
+    monkeypatch.chdir(build.config_dir)
+    geom = build_geometry(world, configs)
+    exported = gdml.dumps(gdml.convert(geom))
+
+    f = io.BytesIO()
+    gdmlstream.stream(geom, f)
+    assert f.getvalue() == exported
+
+    output = str(tmp_path / 'out.gdml.gz')
+    gdmlstream.write(geom, output)
+    with gdmlfile.open_gdml(output) as f:
+        assert f.read() == exported
@@ -0,0 +1,45 @@
+'''
+Overlap verdicts are reused by fingerprint, whatever the names.
+'''
+
+from gegede import Quantity as Q
+import gegede.construct
+
+from duneggd import overlaps
+from duneggd.LocalTools import homogenise
+
+def module( geom, name ):
+    """ a box with two overlapping daughters, all shapes named after the module """
+    shape = geom.shapes.Box(name+'_box', dx=Q('1m'), dy=Q('1m'), dz=Q('1m'))
+    inner = geom.shapes.Box(name+'_inner', dx=Q('30cm'), dy=Q('30cm'), dz=Q('30cm'))
+    vol = geom.structure.Volume(name, material='Air', shape=shape)
+    dau = geom.structure.Volume(name+'_dau', material='Air', shape=inner)
+    for i, x in enumerate(['-20cm', '20cm']):
+        pos = geom.structure.Position(name+'_pos%d' % i, x=Q(x), y=Q('0cm'), z=Q('0cm'))
+        vol.placements.append(geom.structure.Placement(name+'_place%d' % i, volume=dau, pos=pos).name)
+    return vol
+
+def test_same_solid_same_key():
+    geom = gegede.construct.Geometry()
+    geom.shapes.Box('a', dx=Q('1m'), dy=Q('2m'), dz=Q('3m'))
+    geom.shapes.Box('b', dx=Q('1m'), dy=Q('2m'), dz=Q('3m'))
+    geom.shapes.Box('c', dx=Q('1m'), dy=Q('2m'), dz=Q('4m'))
+    solids = homogenise.Solids(geom)
+    assert solids.key('a') == solids.key('b')
+    assert solids.key('a') != solids.key('c')
+
+def test_identical_modules_share_verdicts():
+    geom = gegede.construct.Geometry()
+    world = geom.structure.Volume('World', material='Air',
+                                  shape=geom.shapes.Box('World_box', dx=Q('10m'), dy=Q('10m'), dz=Q('10m')))
+    for name, x in [('moduleA', '-3m'), ('moduleB', '3m')]:
+        pos = geom.structure.Position(name+'_pos', x=Q(x), y=Q('0m'), z=Q('0m'))
+        world.placements.append(geom.structure.Placement(name+'_place', volume=module(geom, name), pos=pos).name)
+    geom.set_world(world)
+
+    checker = overlaps.OverlapChecker(geom)
+    found = checker.run()
+    assert checker.stats['checked'] == 2    # World and the first module
+    assert checker.stats['reused'] == 1
+    assert sorted((o.mother, o.first, o.second) for o in found) == [
+        ('moduleA', 'moduleA_place0', 'moduleA_place1'), ('moduleB', 'moduleB_place0', 'moduleB_place1')]